@@ -0,0 +1,31 @@
+import threading
+from collections import deque
+from typing import Any, List
+
+class DropOldestChannel:
+    """
+    Bounded thread-safe FIFO for live updates. put() never blocks: when full, the
+    oldest item is dropped, so a slow consumer only ever loses stale progress.
+    """
+    def __init__(self, maxlen: int = 64):
+        self._items: deque = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def put(self, item: Any) -> bool:
+        """Append item; returns True if the channel was empty (the consumer may need waking)."""
+        with self._lock:
+            was_empty = not self._items
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            return was_empty
+
+    def drain(self) -> List[Any]:
+        with self._lock:
+            items = list(self._items)
+            self._items.clear()
+            return items
+
+    def __len__(self) -> int:
+        return len(self._items)
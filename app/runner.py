@@ -1,20 +1,179 @@
+import heapq, itertools, threading, queue, time
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional
+from core.comfy_client import JobCancelled
+from app.channel import DropOldestChannel
+from core.backends import make_client
 
-import threading, queue, tempfile, os
-from typing import List, Dict, Any
-from core.comfy_client import ComfyClient
+@dataclass
+class Job:
+    id: str
+    graph: dict
+    priority: int = 0
+    poll_interval: float = 0.5
+    max_wait: Optional[float] = 600
+    use_memo: bool = True
+    status: str = "queued"            # queued | running | done | failed | cancelled
+    prompt_id: Optional[str] = None
+    error: Optional[str] = None
+    meta: Optional[dict] = None       # workflow/tokens/seed kept with the run in the RunStore
+    completion: Optional[dict] = None # the client's completion report (mode, memo note, ...)
+    created: float = field(default_factory=time.time)
+    finished: Optional[float] = None
+    cancel: threading.Event = field(default_factory=threading.Event, repr=False)
 
 class Runner:
-    def __init__(self):
-        self.q: "queue.Queue[list[dict]]" = queue.Queue()
-        self.client = ComfyClient()
+    """
+    Job scheduler in front of ComfyClient. Jobs are ordered by priority (higher first,
+    FIFO within a priority) and at most max_in_flight prompts are submitted at once,
+    so the next one is already queued on the backend when the current one finishes.
+    Finished jobs are reported on self.q as (job_id, artifacts); failures and
+    cancellations report an empty list and leave the reason on the Job, which
+    the consumer collects with take(job_id) (dropping it from self.jobs). Live
+    socket events of running jobs (executing node, step progress, previews) go
+    to self.progress as (job_id, event), dropping the oldest when the UI lags.
+    With a core.trace.Tracer, each job's phases are recorded as spans: pending
+    (local queue), the client's submit..collect, decode (post_process) and run.
+    With a core.runs.RunStore, every finished job is recorded there (with its
+    meta and phase timings) before post_process, so artifacts already point
+    into the store when they are decoded.
+    """
+    def __init__(self, max_in_flight: int = 2, client=None, on_result=None, post_process=None,
+                 on_progress=None, preview_decoder=None, progress_maxlen: int = 64, tracer=None, store=None):
+        self.q: "queue.Queue[tuple[str, list[dict]]]" = queue.Queue()
+        self.progress = DropOldestChannel(progress_maxlen)
+        self.on_result = on_result  # optional callback after each result is queued (e.g. wake the UI)
+        self.post_process = post_process  # optional fn(artifacts) run on the worker thread (e.g. decode)
+        self.on_progress = on_progress  # optional callback when self.progress becomes non-empty
+        self.preview_decoder = preview_decoder  # optional fn(event) run on the worker for preview events
+        self.client = client or make_client()  # ComfyClient or BackendPool
+        self.tracer = tracer
+        self.store = store
+        self.jobs: Dict[str, Job] = {}
+        self._heap: List[tuple[int, int, Job]] = []
+        self._seq = itertools.count(1)
+        self._cv = threading.Condition()
+        for i in range(max(1, max_in_flight)):
+            threading.Thread(target=self._worker, name=f"runner-{i}", daemon=True).start()
 
-    def run_async(self, graph: dict, poll_interval=0.5, max_wait=600):
-        threading.Thread(target=self._worker, args=(graph, poll_interval, max_wait), daemon=True).start()
+    def run_async(self, graph: dict, poll_interval=0.5, max_wait=600, use_memo=True, priority: int = 0,
+                  meta: dict | None = None) -> str:
+        """Queue graph; meta (workflow, tokens, seed) is stored with the run when there is a store."""
+        with self._cv:
+            seq = next(self._seq)
+            job = Job(f"job-{seq}", graph, priority, poll_interval, max_wait, use_memo, meta=meta)
+            self.jobs[job.id] = job
+            heapq.heappush(self._heap, (-priority, seq, job))
+            self._cv.notify()
+        return job.id
 
-    def _worker(self, graph: dict, poll_interval, max_wait):
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job. Returns False if it already finished."""
+        with self._cv:
+            job = self.jobs.get(job_id)
+            if job is None or job.status in ("done", "failed", "cancelled"):
+                return False
+            job.cancel.set()
+            if job.status == "queued":
+                self._heap = [item for item in self._heap if item[2] is not job]
+                heapq.heapify(self._heap)
+                self._finish(job, "cancelled", [])
+        return True
+
+    def cancel_all(self) -> int:
+        with self._cv:
+            ids = [j.id for j in self.jobs.values() if j.status in ("queued", "running")]
+        return sum(self.cancel(i) for i in ids)
+
+    def take(self, job_id: str) -> Optional[Job]:
+        """Remove and return a finished job once its result was drained from self.q (None if unknown or active)."""
+        with self._cv:
+            job = self.jobs.get(job_id)
+            if job is None or job.status in ("queued", "running"):
+                return None
+            return self.jobs.pop(job_id)
+
+    def active(self) -> List[Job]:
+        """Queued and running jobs, oldest first."""
+        with self._cv:
+            return [j for j in self.jobs.values() if j.status in ("queued", "running")]
+
+    def _finish(self, job: Job, status: str, artifacts: list, error: str | None = None):
+        job.status, job.error = status, error
+        job.finished = time.time()
+        job.graph = None  # release the submitted graph
+        self.q.put((job.id, artifacts))
+        if self.on_result is not None:
+            self.on_result()
+
+    def _progress(self, job: Job, event: dict):
+        if event["type"] == "preview" and self.preview_decoder is not None:
+            try:
+                self.preview_decoder(event)
+            except Exception as e:
+                print("Preview decode failed:", e)
+                return
+        if self.progress.put((job.id, event)) and self.on_progress is not None:
+            self.on_progress()
+
+    def _record(self, job: Job, status: str, artifacts: list, timings: dict, error: str | None = None):
         try:
-            job = self.client.run_workflow(graph, poll_interval=poll_interval, max_wait=max_wait)
-            self.q.put(job["artifacts"])
+            self.store.record(job.graph, artifacts, status, prompt_id=job.prompt_id, error=error,
+                              timings=timings, created=job.created, **(job.meta or {}))
         except Exception as e:
-            print("Workflow failed:", e)
-            self.q.put([])
+            print("Run history record failed:", e)
+
+    def _spans(self, job: Job, timings: dict):
+        """on_span for one job: keeps the longest span of each phase and forwards to the tracer."""
+        def span(phase, start, end=None, **fields):
+            end = time.time() if end is None else end
+            timings[phase] = max(timings.get(phase, 0.0), round((end - start) * 1000, 3))
+            if self.tracer is not None:
+                self.tracer.span(job.id, phase, start, end, **fields)
+        return span
+
+    def _worker(self):
+        while True:
+            with self._cv:
+                while not self._heap:
+                    self._cv.wait()
+                _, _, job = heapq.heappop(self._heap)
+                job.status = "running"
+            picked = time.time()
+            timings = {}
+            span = self._spans(job, timings) if self.tracer or self.store else None
+            if span:
+                span("pending", job.created, picked)
+            try:
+                result = self.client.run_workflow(
+                    job.graph, poll_interval=job.poll_interval, max_wait=job.max_wait, use_memo=job.use_memo,
+                    on_submit=lambda pid, job=job: setattr(job, "prompt_id", pid), cancel=job.cancel,
+                    on_progress=lambda event, job=job: self._progress(job, event), on_span=span,
+                )
+                artifacts = result["artifacts"]
+                job.completion = result.get("completion")
+                if self.store is not None:
+                    self._record(job, "done", artifacts, timings)
+                if self.post_process is not None:
+                    t0 = time.time()
+                    try:
+                        self.post_process(artifacts)
+                    except Exception as e:
+                        print("Result post-processing failed:", e)
+                    if span:
+                        span("decode", t0)
+                with self._cv:
+                    self._finish(job, "done", artifacts)
+                if span:
+                    span("run", picked, job.finished, mode=result.get("completion", {}).get("mode"))
+            except JobCancelled:
+                if self.store is not None:
+                    self._record(job, "cancelled", [], timings)
+                with self._cv:
+                    self._finish(job, "cancelled", [])
+            except Exception as e:
+                print("Workflow failed:", e)
+                if self.store is not None:
+                    self._record(job, "failed", [], timings, str(e))
+                with self._cv:
+                    self._finish(job, "failed", [], str(e))
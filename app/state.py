@@ -8,11 +8,16 @@ class AppState:
     last_seed: Optional[int] = None
     current_graph: Optional[dict] = None
     current_graph_path: Optional[str] = None
+    current_template: Any = None  # core.tokens.CompiledTemplate of current_graph
     saved_video_paths: List[str] = field(default_factory=list)
     overlay_text_lines: List[str] = field(default_factory=list)
     current_image_surface: Any = None  # pygame.Surface at runtime
-    current_audio_tempfile: Optional[str] = None
+    current_image: Any = None          # ui.images.DecodedImage behind current_image_surface
+    spooled_paths: List[str] = field(default_factory=list)  # spool files to drop on reset (not videos)
     busy: bool = False
+    progress: Dict[str, Any] = field(default_factory=dict)  # newest running job: job_id, node, label, value, max
+    preview_surface: Any = None        # latest live preview frame (pygame.Surface)
+    show_timings: bool = False         # per-phase p50/p95 overlay (F3)
 
 @dataclass
 class PickerState:
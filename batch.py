@@ -0,0 +1,150 @@
+"""
+Headless batch runner: render token sweeps without a display.
+
+    python batch.py SamplePygameWorkflow.json rows.jsonl --jobs 4 --out batch_out
+    python batch.py my.json rows.csv --grid STEPS=20,30 --grid CFG=5,7.5
+
+Each row of the JSONL/CSV file is a {TOKEN: value} mapping for the %%TOKENS%% in the
+workflow; --grid values are expanded as a cartesian product over every row (or on
+their own when no rows file is given). Every variant gets its own folder under --out
+with the artifacts and a manifest.json; manifest.jsonl collects all of them.
+"""
+import argparse, csv, itertools, json, os, shutil, sys, time
+
+from app.runner import Runner
+from core.backends import make_client
+from core.prepare import prepare_graph
+from core.tokens import compile_template
+from core.trace import Tracer
+from core.workflow_io import load_workflow_graph, ensure_dir
+
+WORKFLOW_DIR = "workflows"
+
+def read_rows(path: str) -> list[dict]:
+    if path.lower().endswith(".csv"):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            return [dict(r) for r in csv.DictReader(f)]
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                rows.append(json.loads(line))
+    return rows
+
+def expand_grid(rows: list[dict], grid: list[str]) -> list[dict]:
+    axes = []
+    for spec in grid:
+        name, _, vals = spec.partition("=")
+        if not name or not vals:
+            raise SystemExit(f"bad --grid '{spec}', expected NAME=v1,v2,...")
+        axes.append([(name.strip(), v) for v in vals.split(",")])
+    if not axes:
+        return rows
+    return [{**row, **dict(combo)} for row in (rows or [{}]) for combo in itertools.product(*axes)]
+
+def resolve_workflow(path: str) -> str:
+    if os.path.exists(path):
+        return path
+    return os.path.join(WORKFLOW_DIR, path)
+
+def save_artifacts(arts: list[dict], dest: str) -> list[dict]:
+    ensure_dir(dest)
+    saved = []
+    for i, a in enumerate(arts):
+        name = f"{i:03d}-{os.path.basename(a['filename'])}"
+        target = os.path.join(dest, name)
+        if a.get("path"):
+            shutil.move(a["path"], target)
+        else:
+            with open(target, "wb") as f:
+                f.write(a["bytes"])
+        size = os.path.getsize(target)
+        saved.append({"file": name, "kind": a["kind"], "mimetype": a["mimetype"], "node_id": a["node_id"], "bytes": size})
+    return saved
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Run a workflow once per row of token values, without a display.")
+    ap.add_argument("workflow", help=f"API-format workflow JSON (path, or name under {WORKFLOW_DIR}/)")
+    ap.add_argument("rows", nargs="?", help="JSONL or CSV file of token values, one variant per row")
+    ap.add_argument("--grid", action="append", default=[], metavar="NAME=v1,v2", help="cartesian sweep axis (repeatable)")
+    ap.add_argument("--jobs", type=int, default=2, help="prompts in flight at once")
+    ap.add_argument("--out", default="batch_out", help="output directory")
+    ap.add_argument("--max-wait", type=float, default=3600, help="seconds to wait per job")
+    ap.add_argument("--no-memo", action="store_true", help="bypass run memoization")
+    ap.add_argument("--trace", metavar="FILE", help="append per-phase timing spans to this JSONL file")
+    args = ap.parse_args(argv)
+
+    base = load_workflow_graph(resolve_workflow(args.workflow))
+    template = compile_template(base)
+    known = set(template.names)
+    rows = expand_grid(read_rows(args.rows) if args.rows else [], args.grid)
+    if not rows:
+        raise SystemExit("nothing to run: give a rows file and/or --grid axes")
+    unknown = {k for r in rows for k in r} - known - {"SEED"}
+    if unknown:
+        print(f"warning: unknown tokens for this workflow (ignored): {', '.join(sorted(unknown))}", file=sys.stderr)
+
+    ensure_dir(args.out)
+    tracer = Tracer(args.trace) if args.trace else None
+    runner = Runner(max_in_flight=args.jobs, client=make_client(), tracer=tracer)
+    pending: dict[str, tuple[int, dict, int | None]] = {}
+    todo = iter(enumerate(rows))
+
+    def submit_next() -> bool:
+        # Graphs are built lazily so only a small window of variants is held in memory.
+        for i, values in todo:
+            g, seed = prepare_graph(base, {k: v for k, v in values.items() if v is not None}, template)
+            job_id = runner.run_async(g, max_wait=args.max_wait, use_memo=not args.no_memo)
+            pending[job_id] = (i, values, seed)
+            return True
+        return False
+
+    for _ in range(max(1, args.jobs) * 2):
+        if not submit_next():
+            break
+
+    start = time.time()
+    done = failed = total_bytes = 0
+    with open(os.path.join(args.out, "manifest.jsonl"), "a", encoding="utf-8") as manifest:
+        while pending:
+            job_id, arts = runner.q.get()
+            i, values, seed = pending.pop(job_id)
+            job = runner.take(job_id)
+            dest = os.path.join(args.out, f"row-{i:05d}")
+            status, error, saved = job.status, job.error, []
+            if status == "done":
+                try:
+                    saved = save_artifacts(arts, dest)
+                except OSError as e:  # one row's files (disk full, permissions) don't stop the sweep
+                    status, error = "failed", f"saving artifacts failed: {e}"
+            row_bytes = sum(s["bytes"] for s in saved)
+            record = {
+                "row": i, "values": values, "seed": seed, "job_id": job_id, "prompt_id": job.prompt_id,
+                "status": status, "error": error, "artifacts": saved, "finished_at": time.time(),
+            }
+            ensure_dir(dest)
+            with open(os.path.join(dest, "manifest.json"), "w", encoding="utf-8") as f:
+                json.dump(record, f, indent=2)
+            manifest.write(json.dumps(record) + "\n")
+            manifest.flush()
+            submit_next()
+
+            done += status == "done"
+            failed += status != "done"
+            total_bytes += row_bytes
+            elapsed = max(1e-9, time.time() - start)
+            print(f"[{done + failed}/{len(rows)}] row {i} {status}  "
+                  f"{(done + failed) * 60 / elapsed:.1f} jobs/min  {total_bytes / elapsed / 1e6:.2f} MB/s")
+
+    elapsed = max(1e-9, time.time() - start)
+    print(f"finished {done} ok, {failed} failed in {elapsed:.1f}s: "
+          f"{done * 60 / elapsed:.1f} jobs/min, {total_bytes / elapsed / 1e6:.2f} MB/s ({total_bytes} bytes)")
+    if tracer:
+        for phase, p50, p95, n in tracer.percentiles():
+            print(f"  {phase:<9} p50 {p50:9.1f} ms  p95 {p95:9.1f} ms  ({n})")
+        tracer.close()
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
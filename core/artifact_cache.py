@@ -0,0 +1,144 @@
+import os, json, shutil, threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+Key = Tuple[str, str, str]  # (filename, subfolder, type) as reported by ComfyUI
+
+def _key_str(key: Key, origin: str) -> str:
+    filename, subfolder, ftype = key
+    return f"{origin}|{ftype}/{subfolder}/{filename}"
+
+def _copy(src: str, dst: str):
+    # Never hard-link: spooled files are moved on into batch output and the run
+    # store, where an in-place edit would rewrite a shared inode and corrupt the blob.
+    shutil.copyfile(src, dst)
+
+class ArtifactCache:
+    """
+    Persistent, content-addressed store for downloaded /view files.
+
+    Keys (filename, subfolder, type), namespaced by the server origin they came
+    from, map to a sha256 blob plus the size/ETag/Last-Modified seen when it was
+    fetched; identical payloads share one blob. Blobs are evicted
+    least-recently-used once the total exceeds max_bytes. Thread-safe.
+    """
+    def __init__(self, root: str, max_bytes: int = 1 << 30):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.blob_dir = os.path.join(root, "blobs")
+        self.index_path = os.path.join(root, "index.json")
+        self.lock = threading.Lock()
+        self.keys: Dict[str, Dict[str, Any]] = {}              # key -> {hash, size, etag, last_modified}
+        self.blobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # hash -> {size, ext}; LRU first
+        self.total = 0
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._dirty = False
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._load()
+
+    # ---- public ----
+
+    def lookup(self, key: Key, origin: str = "") -> Optional[Dict[str, Any]]:
+        """Cached {hash, size, etag, last_modified} for key, or None."""
+        with self.lock:
+            entry = self.keys.get(_key_str(key, origin))
+            return dict(entry) if entry else None
+
+    def materialize(self, key: Key, dest: str, origin: str = "") -> bool:
+        """Copy the cached payload for key to dest; counts a hit. False if absent."""
+        with self.lock:
+            entry = self.keys.get(_key_str(key, origin))
+            blob = self.blobs.get(entry["hash"]) if entry else None
+            if blob is None:
+                return False
+            src = self._blob_path(entry["hash"], blob["ext"])
+            try:
+                _copy(src, dest)
+            except OSError:
+                self._drop_blob(entry["hash"])
+                return False
+            self.blobs.move_to_end(entry["hash"])
+            self.hits += 1
+            self.bytes_saved += blob["size"]
+            self._dirty = True
+            return True
+
+    def store(self, key: Key, src: str, digest: str, etag: str | None = None, origin: str = "",
+              last_modified: str | None = None) -> None:
+        """Record a freshly downloaded file (counts a miss); dedups by digest, then evicts."""
+        size = os.path.getsize(src)
+        ext = os.path.splitext(key[0])[1].lower()
+        with self.lock:
+            self.misses += 1
+            if digest not in self.blobs:
+                path = self._blob_path(digest, ext)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                try:
+                    _copy(src, path)
+                except OSError:
+                    return
+                self.blobs[digest] = {"size": size, "ext": ext}
+                self.total += size
+            self.blobs.move_to_end(digest)
+            self.keys[_key_str(key, origin)] = {"hash": digest, "size": size, "etag": etag,
+                                              "last_modified": last_modified}
+            self._dirty = True
+            self._evict()
+
+    def forget(self, key: Key, origin: str = "") -> None:
+        with self.lock:
+            if self.keys.pop(_key_str(key, origin), None) is not None:
+                self._dirty = True
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "hits": self.hits, "misses": self.misses, "bytes_saved": self.bytes_saved,
+                "bytes": self.total, "blobs": len(self.blobs), "keys": len(self.keys),
+            }
+
+    def flush(self) -> None:
+        """Persist the index if anything changed."""
+        with self.lock:
+            if not self._dirty:
+                return
+            data = {"keys": self.keys, "blobs": list(self.blobs.items())}
+            tmp = self.index_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.index_path)
+            self._dirty = False
+
+    # ---- internals ----
+
+    def _blob_path(self, digest: str, ext: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], digest + ext)
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for digest, blob in data.get("blobs", []):
+            if os.path.exists(self._blob_path(digest, blob.get("ext", ""))):
+                self.blobs[digest] = blob
+                self.total += int(blob.get("size", 0))
+        self.keys = {k: v for k, v in data.get("keys", {}).items() if v.get("hash") in self.blobs}
+        self._evict()  # budget may have shrunk since last run
+
+    def _drop_blob(self, digest: str):
+        blob = self.blobs.pop(digest, None)
+        if blob is None:
+            return
+        self.total -= blob["size"]
+        try: os.remove(self._blob_path(digest, blob["ext"]))
+        except OSError: pass
+        self.keys = {k: v for k, v in self.keys.items() if v["hash"] != digest}
+        self._dirty = True
+
+    def _evict(self):
+        while self.total > self.max_bytes and self.blobs:
+            self._drop_blob(next(iter(self.blobs)))
@@ -1,4 +1,4 @@
-
+import os, mmap
 from typing import List, Dict, Any
 
 def split_artifacts(arts: List[Dict[str, Any]]):
@@ -12,3 +12,29 @@ def split_artifacts(arts: List[Dict[str, Any]]):
         elif kind == "video": vids.append(a)
         else: others.append(a)
     return imgs, txts, auds, vids, others
+
+def artifact_bytes(a: Dict[str, Any]) -> bytes | memoryview:
+    """Payload of an artifact: inline bytes, or a read-only memory map of its spooled file."""
+    if a.get("bytes") is not None:
+        return a["bytes"]
+    path = a.get("path")
+    if not path or not os.path.getsize(path):
+        return b""
+    with open(path, "rb") as f:
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+def artifact_head(a: Dict[str, Any], n: int) -> str:
+    """First n bytes of an artifact as text, without reading the rest."""
+    data = a.get("bytes")
+    if data is None and a.get("path"):
+        try:
+            with open(a["path"], "rb") as f:
+                data = f.read(n)
+        except OSError:
+            data = b""
+    return str(bytes(data or b"")[:n], "utf-8", "ignore")
+
+def remove_spooled(paths: List[str]) -> None:
+    for p in paths:
+        try: os.remove(p)
+        except OSError: pass
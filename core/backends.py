@@ -0,0 +1,143 @@
+import os, threading, time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from core.comfy_client import ComfyClient, SubmitFailed
+from core.memo import graph_hash
+
+@dataclass
+class Backend:
+    client: ComfyClient
+    healthy: bool = True
+    failures: int = 0
+    queue_depth: int = 0          # running + pending at the last check
+    assigned: int = 0             # submissions since the last check
+    vram_free: int = 0
+    checked_at: float = 0.0
+
+    @property
+    def base_url(self) -> str:
+        return self.client.base_url
+
+    @property
+    def load(self) -> int:
+        return self.queue_depth + self.assigned
+
+class BackendPool:
+    """
+    Spreads submissions over several ComfyUI servers. A monitor thread reads each
+    server's /queue depth and /system_stats every check_interval seconds; servers
+    failing max_failures checks in a row (or a submission) leave the rotation until
+    a check succeeds again. Each job runs start to finish on one backend's
+    ComfyClient, so its artifacts are downloaded from the server that made them.
+    Drop-in for ComfyClient wherever only run_workflow is needed (e.g. Runner).
+    """
+    def __init__(self, base_urls: List[str], auth: tuple[str, str] | None = None, check_interval: float = 5.0,
+                 max_failures: int = 2, **client_kwargs):
+        if not base_urls:
+            raise ValueError("BackendPool needs at least one base URL")
+        first = ComfyClient(base_urls[0], auth=auth, **client_kwargs)
+        # One artifact cache and memo shared by every backend (keys are namespaced per origin).
+        shared = dict(client_kwargs, cache=first.cache, memo=first.memo)
+        self.backends = [Backend(first)] + [Backend(ComfyClient(u, auth=auth, **shared)) for u in base_urls[1:]]
+        self.check_interval = check_interval
+        self.max_failures = max_failures
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        threading.Thread(target=self._monitor, name="backend-monitor", daemon=True).start()
+
+    @property
+    def cache(self):
+        return self.backends[0].client.cache
+
+    @property
+    def memo(self):
+        return self.backends[0].client.memo
+
+    def pick(self) -> Backend:
+        """Least-loaded healthy backend (ties go to the one with most free VRAM)."""
+        with self.lock:
+            healthy = [b for b in self.backends if b.healthy]
+            if not healthy:
+                raise RuntimeError("no healthy ComfyUI backends: " + ", ".join(b.base_url for b in self.backends))
+            best = min(healthy, key=lambda b: (b.load, -b.vram_free))
+            best.assigned += 1
+            return best
+
+    def run_workflow(self, workflow_graph: dict, use_memo: bool = True, on_submit=None, **kwargs) -> Dict[str, Any]:
+        """
+        Run on the best backend; if it can't be reached to submit (SubmitFailed), mark it
+        down and fail over to the next. Errors after submission, timeouts included,
+        are the job's own and never take a backend out of the pool.
+        """
+        backend = self._memo_backend(workflow_graph) if use_memo else None
+        for _ in range(len(self.backends)):
+            backend = backend or self.pick()
+            try:
+                return backend.client.run_workflow(workflow_graph, use_memo=use_memo, on_submit=on_submit, **kwargs)
+            except SubmitFailed:
+                self._mark(backend, ok=False, hard=True)
+                backend = None
+        raise RuntimeError("no ComfyUI backend accepted the prompt")
+
+    def status(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [{"base_url": b.base_url, "healthy": b.healthy, "queue_depth": b.queue_depth,
+                     "assigned": b.assigned, "vram_free": b.vram_free} for b in self.backends]
+
+    def close(self):
+        self._stop.set()
+
+    # ---- internals ----
+
+    def _memo_backend(self, graph: dict) -> Optional[Backend]:
+        # A memoized run must be replayed against the server that holds its files.
+        if self.memo is None:
+            return None
+        with self.memo.lock:
+            hit = self.memo.entries.get(graph_hash(graph))
+        if not hit:
+            return None
+        with self.lock:
+            for b in self.backends:
+                if b.base_url == hit.get("base_url") and b.healthy:
+                    return b
+        return None
+
+    def _mark(self, b: Backend, ok: bool, hard: bool = False):
+        with self.lock:
+            if ok:
+                b.failures, b.healthy = 0, True
+            else:
+                b.failures += 1
+                if hard or b.failures >= self.max_failures:
+                    b.healthy = False
+
+    def _check(self, b: Backend):
+        c = b.client
+        try:
+            stats = c.get_json("/system_stats", timeout=min(5, c.timeout))
+            qd = c.get_json("/queue", timeout=min(5, c.timeout))
+            devices = stats.get("devices") or []
+        except Exception:
+            self._mark(b, ok=False)
+            return
+        with self.lock:
+            b.queue_depth = len(qd.get("queue_running", [])) + len(qd.get("queue_pending", []))
+            b.assigned = 0
+            b.vram_free = sum(int(d.get("vram_free") or 0) for d in devices)
+            b.checked_at = time.time()
+        self._mark(b, ok=True)
+
+    def _monitor(self):
+        while not self._stop.is_set():
+            for b in list(self.backends):
+                self._check(b)
+            self._stop.wait(self.check_interval)
+
+def make_client(**kwargs):
+    """ComfyClient for COMFY_BASE_URL, or a BackendPool when COMFY_BASE_URLS lists several servers."""
+    urls = [u.strip() for u in (os.getenv("COMFY_BASE_URLS") or "").split(",") if u.strip()]
+    if len(urls) > 1:
+        return BackendPool(urls, **kwargs)
+    return ComfyClient(urls[0] if urls else None, **kwargs)
@@ -1,10 +1,25 @@
-
 import os
+import re
+import json
+import hashlib
+import math
+import queue
+import random
+import struct
 import time
 import uuid
-import requests
+import asyncio
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass
 from typing import Any, List, Dict, Tuple
 
+import aiohttp
+
+from core.artifact_cache import ArtifactCache
+from core.memo import RunMemo, graph_hash
+
 _EXT_KIND = {
     ".png": ("image", "image/png"),
     ".jpg": ("image", "image/jpeg"),
@@ -23,6 +38,78 @@ _EXT_KIND = {
     ".csv": ("text", "text/csv"),
 }
 
+# Binary /ws frames: 4-byte big-endian event type, then the payload.
+_PREVIEW_IMAGE = 1                  # payload: 4-byte image type, then the encoded image
+_PREVIEW_IMAGE_WITH_METADATA = 4    # payload: 4-byte JSON length, JSON, then the encoded image
+_PREVIEW_FORMATS = {1: "jpeg", 2: "png"}
+
+_DROPPED = object()  # queued to every waiter when the shared socket closes
+
+@dataclass
+class _Polled:
+    future: asyncio.Future
+    submitted: float
+    interval: float               # the caller's poll_interval: the fastest it wants to be polled
+    position: int | None = None   # -1 running, 0.. place among pending, None not in the queue
+    since: float = 0.0            # when position last changed
+    checked: float = 0.0          # start of the last round that covered it
+
+class JobCancelled(Exception):
+    """Raised by run_workflow when its cancel event is set."""
+
+class _OutputsGone(Exception):
+    """A memoized run's files no longer exist (404 from /view, or the cache lost a blob)."""
+
+class SubmitFailed(Exception):
+    """Raised by run_workflow when the server could not be reached to submit the prompt (nothing was queued)."""
+
+def parse_preview(raw: bytes) -> Dict[str, Any] | None:
+    """Decode a binary /ws frame into {"type": "preview", "format", "data", ...}, or None."""
+    if len(raw) < 8:
+        return None
+    (event,) = struct.unpack(">I", raw[:4])
+    if event == _PREVIEW_IMAGE:
+        (fmt,) = struct.unpack(">I", raw[4:8])
+        return {"type": "preview", "format": _PREVIEW_FORMATS.get(fmt, "jpeg"), "data": raw[8:]}
+    if event == _PREVIEW_IMAGE_WITH_METADATA:
+        (n,) = struct.unpack(">I", raw[4:8])
+        try:
+            meta = json.loads(raw[8:8 + n])
+        except ValueError:
+            return None
+        mime = str(meta.get("image_type", "image/jpeg"))
+        return {"type": "preview", "format": mime.split("/")[-1], "data": raw[8 + n:],
+                "prompt_id": meta.get("prompt_id"), "node": meta.get("node_id")}
+    return None
+
+def _unchanged(cached: Dict[str, Any], headers) -> bool:
+    """Whether a 200 /view response is the cached version: its ETag, or else its Last-Modified, matches."""
+    etag, modified = headers.get("ETag"), headers.get("Last-Modified")
+    if cached.get("etag") and etag:
+        return etag == cached["etag"]
+    return bool(cached.get("last_modified")) and modified == cached["last_modified"]
+
+def _report_ws_reader(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        print("WebSocket reader failed:", task.exception())
+
+def history_failure(prompt_id: str, entry: dict) -> Exception | None:
+    """
+    JobCancelled (interrupted) or RuntimeError (errored) for a history entry whose
+    status is not a success, else None. Entries without a status (older servers)
+    count as finished.
+    """
+    status = entry.get("status") or {}
+    if status.get("status_str", "success") == "success":
+        return None
+    messages = [m for m in status.get("messages") or [] if isinstance(m, (list, tuple)) and len(m) > 1]
+    if any(m[0] == "execution_interrupted" for m in messages):
+        return JobCancelled(f"ComfyUI job {prompt_id} was interrupted.")
+    detail = next((m[1] for m in messages if m[0] == "execution_error"), None)
+    if isinstance(detail, dict):
+        detail = detail.get("exception_message", detail)
+    return RuntimeError(f"ComfyUI job {prompt_id} failed: {detail or status.get('status_str')}")
+
 def _guess_kind_mime(filename: str) -> Tuple[str, str]:
     name = filename.lower()
     for ext, pair in _EXT_KIND.items():
@@ -30,140 +117,765 @@ def _guess_kind_mime(filename: str) -> Tuple[str, str]:
             return pair
     return ("binary", "application/octet-stream")
 
-class ComfyClient:
+class AsyncComfyClient:
     """
-    HTTP client for ComfyUI. Collects artifacts from history (files),
-    UI text snippets, and deterministic disk fallbacks under output/.
+    asyncio client for ComfyUI. Collects artifacts from history (files), UI text
+    snippets, and deterministic disk fallbacks under output/. Files are streamed
+    into spool_dir and referenced by "path"; inline text artifacts carry "bytes".
+    Use core.artifacts.artifact_bytes to read either.
+
+    One aiohttp session (connection pool of max_connections) and one /ws socket
+    serve every prompt of the client: socket messages are routed to the waiting
+    run_workflow() call by prompt_id, so hundreds of prompts can be awaited on a
+    single event loop. Without the socket, one shared poller tracks every pending
+    prompt with a single /queue request per round (see _poll_loop). Use an
+    instance from one event loop only; close() when done.
     """
-    def __init__(self, base_url: str | None = None, auth: tuple[str, str] | None = None, timeout=60):
+    def __init__(self, base_url: str | None = None, auth: tuple[str, str] | None = None, timeout=60,
+                 use_websocket: bool = True, download_workers: int = 8, spool_dir: str | None = None,
+                 cache_dir: str | None = None, cache_max_bytes: int | None = None,
+                 memo_entries: int | None = None, cache: ArtifactCache | None = None, memo: RunMemo | None = None,
+                 max_connections: int = 64, poll_max_interval: float = 5.0):
         self.base_url = (base_url or os.getenv("COMFY_BASE_URL") or "http://127.0.0.1:8188").rstrip("/")
-        self.session = requests.Session()
-        if auth:
-            self.session.auth = auth
+        self.spool_dir = spool_dir or os.path.join(tempfile.gettempdir(), "pg_comfy_spool")
+        # Persistent artifact cache; COMFY_CACHE_MAX_BYTES=0 (or cache_max_bytes=0) disables it.
+        if cache_max_bytes is None:
+            cache_max_bytes = int(os.getenv("COMFY_CACHE_MAX_BYTES") or 1 << 30)
+        cache_dir = cache_dir or os.getenv("COMFY_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "pg_comfy", "artifacts")
+        if cache is None and cache_max_bytes > 0:
+            cache = ArtifactCache(cache_dir, cache_max_bytes)
+        self.cache = cache  # may be shared between clients (see core.backends)
+        # Opt-in whole-run memoization (COMFY_MEMO_ENTRIES > 0): identical graphs reuse past outputs.
+        if memo_entries is None:
+            memo_entries = int(os.getenv("COMFY_MEMO_ENTRIES") or 0)
+        if memo is None and memo_entries > 0:
+            memo = RunMemo(os.path.join(cache_dir, "memo.json"), memo_entries)
+        self.memo = memo
+        self.download_workers = max(1, int(download_workers))  # concurrent downloads per prompt
+        self.max_connections = max_connections
+        self.auth = aiohttp.BasicAuth(*auth) if auth else None
         self.timeout = timeout
+        self.use_websocket = use_websocket
+        self.client_id = str(uuid.uuid4())
+        self._session = None
+        self._ws = None
+        self._ws_lock = None
+        self._ws_task = None
+        self._waiters: Dict[str, asyncio.Queue] = {}
+        self._early: "OrderedDict[str, list]" = OrderedDict()  # messages that beat their waiter
+        self._gone: deque = deque(maxlen=256)                  # finished prompts; late messages are dropped
+        self.poll_max_interval = poll_max_interval
+        self._polled: Dict[str, _Polled] = {}
+        self._poll_task = None
+        self._poll_wake = None
 
     def _url(self, path: str) -> str:
         return f"{self.base_url}{path}"
 
-    def run_workflow(self, workflow_graph: dict, poll_interval=0.5, max_wait: float | None = None) -> Dict[str, Any]:
-        client_id = str(uuid.uuid4())
-        r = self.session.post(
+    def _ws_url(self) -> str:
+        scheme, rest = self.base_url.split("://", 1)
+        return f"{'wss' if scheme == 'https' else 'ws'}://{rest}/ws?clientId={self.client_id}"
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections), auth=self.auth,
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=self.timeout, sock_read=self.timeout))
+        return self._session
+
+    async def close(self):
+        if self._ws is not None:
+            await self._ws.close()
+        await self._stop_ws_reader()
+        if self._session is not None:
+            await self._session.close()
+
+    async def run_workflow(self, workflow_graph: dict, poll_interval=0.5, max_wait: float | None = None,
+                           use_memo: bool = True, on_submit=None, cancel=None, on_progress=None,
+                           on_span=None) -> Dict[str, Any]:
+        """
+        Submit the graph and wait for it to finish. Completion is event-driven over
+        the /ws socket when available (history is then fetched once); otherwise, or
+        if the socket drops, the client's shared poller watches it, every
+        poll_interval seconds at the fastest.
+
+        With memoization enabled, a graph whose canonical hash was already run
+        returns that run's artifacts (through the artifact cache) without
+        submitting (straight from the artifact cache when it holds every file).
+        use_memo=False bypasses the lookup and refreshes the entry. Only runs whose
+        history status is "success" and that produced artifacts are memoized; an
+        errored or interrupted run raises instead. The entry is dropped only when
+        its files are gone (404, or evicted from the cache); if they can't be
+        fetched for another reason the graph simply runs again, and the result's
+        completion["memo"] says why.
+
+        on_submit(prompt_id) is called once the prompt is queued. Setting cancel (a
+        threading.Event or asyncio.Event), or cancelling the task, removes the
+        prompt from the server queue (or interrupts it); the former raises
+        JobCancelled. on_progress(event) receives live socket events while it
+        runs: {"type": "executing", "node"}, {"type": "progress", "value", "max",
+        "node"} and {"type": "preview", "format", "data"} (encoded preview bytes).
+
+        on_span(phase, start, end, **fields) receives phase timings (time.time()
+        values): submit, queue and execute (socket only), wait (polling), history,
+        one download per file (file, bytes) and collect (files, bytes).
+        """
+        memo_key = graph_hash(workflow_graph) if self.memo else None
+        memo_note = None  # why a memo hit was not served; reported in the result's completion
+        if memo_key and use_memo:
+            hit = self.memo.get(memo_key)
+            if hit and hit.get("base_url", self.base_url) == self.base_url:
+                try:
+                    artifacts = await self._replay(hit, workflow_graph, on_span)
+                    if not artifacts:
+                        raise _OutputsGone("no artifacts")
+                    return {"prompt_id": hit["prompt_id"], "outputs": hit["outputs"], "artifacts": artifacts,
+                            "completion": {"mode": "memo", "graph_hash": memo_key}, "base_url": self.base_url}
+                except _OutputsGone as e:
+                    self.memo.invalidate(memo_key)
+                    memo_note = f"memoized outputs gone ({e}), ran again"
+                except aiohttp.ClientResponseError as e:
+                    if e.status == 404:
+                        self.memo.invalidate(memo_key)
+                        memo_note = "memoized outputs gone from the server, ran again"
+                    else:
+                        memo_note = f"memoized outputs unavailable (HTTP {e.status}), ran again"
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    # transport trouble: the entry stays valid for the next run
+                    memo_note = f"memoized outputs unavailable ({e or type(e).__name__}), ran again"
+
+        if cancel is not None and cancel.is_set():
+            raise JobCancelled("cancelled before submission")
+        # Connect before submitting so the completion message can't be missed.
+        ws = await self._open_ws()
+        span = on_span or (lambda *a, **kw: None)
+        started = []
+        t0 = time.time()
+        try:
+            prompt_id = await self._submit(workflow_graph)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            raise SubmitFailed(f"{self.base_url}: {e or type(e).__name__}") from e
+        start = time.time()
+        span("submit", t0, start)
+        waiter = self._register(prompt_id) if ws else None
+        try:
+            if on_submit is not None:
+                on_submit(prompt_id)
+            entry, completion = None, {"mode": "poll"}
+            if waiter is not None:
+                entry, done_at = await self._wait_ws(waiter, prompt_id, start, max_wait, cancel, on_progress,
+                                                     on_start=lambda: started.append(time.time()))
+                if done_at is not None:
+                    if started:
+                        span("queue", start, started[0])
+                        span("execute", started[0], done_at)
+                    else:
+                        span("wait", start, done_at, mode="websocket")
+                    # Estimated dead time a poll loop would have added after completion.
+                    elapsed = done_at - start
+                    polls = max(1, math.ceil(elapsed / poll_interval)) if poll_interval > 0 else 1
+                    completion = {
+                        "mode": "websocket", "elapsed": elapsed,
+                        "latency_saved": max(0.0, polls * poll_interval - elapsed),
+                        "polls_avoided": polls,
+                    }
+                    if entry is None:
+                        t0 = time.time()
+                        entry = await self._history_entry(prompt_id)
+                        span("history", t0, time.time())
+            if entry is None:
+                t0 = time.time()
+                entry = await self._poll_history(prompt_id, start, poll_interval, max_wait, cancel)
+                span("wait", t0, time.time(), mode="poll")
+        except asyncio.CancelledError:
+            try:
+                await self.cancel(prompt_id)
+            except Exception as e:
+                print("Cancel request failed:", e)
+            raise
+        finally:
+            if waiter is not None:
+                self._unregister(prompt_id)
+
+        outputs = entry.get("outputs", {})
+        ui = entry.get("ui", {})
+        artifacts = await self.collect_artifacts(outputs, ui, workflow_graph, on_span)
+        if memo_key and artifacts and (entry.get("status") or {}).get("status_str") == "success":
+            self.memo.put(memo_key, {"prompt_id": prompt_id, "outputs": outputs, "ui": ui, "base_url": self.base_url})
+        if memo_note:
+            completion["memo"] = memo_note
+        return {"prompt_id": prompt_id, "outputs": outputs, "artifacts": artifacts, "completion": completion,
+                "base_url": self.base_url}
+
+    async def get_json(self, path: str, timeout: float | None = None) -> Any:
+        """GET a JSON endpoint (e.g. /queue, /system_stats); raises on HTTP errors."""
+        t = aiohttp.ClientTimeout(total=timeout or self.timeout)
+        async with self.session.get(self._url(path), timeout=t) as r:
+            r.raise_for_status()
+            return await r.json(content_type=None)
+
+    async def cancel(self, prompt_id: str) -> None:
+        """Delete a queued prompt; interrupt it if it is the one currently executing."""
+        running = set()
+        try:
+            q = await self.get_json("/queue")
+            running = {item[1] for item in q.get("queue_running", []) if len(item) > 1}
+        except Exception:
+            pass
+        path, body = ("/interrupt", {"prompt_id": prompt_id}) if prompt_id in running else ("/queue", {"delete": [prompt_id]})
+        async with self.session.post(self._url(path), json=body, timeout=aiohttp.ClientTimeout(total=self.timeout)) as r:
+            await r.read()
+
+    # ---- completion ----
+
+    async def _submit(self, workflow_graph: dict) -> str:
+        async with self.session.post(
             self._url("/prompt"),
-            json={"prompt": workflow_graph, "client_id": client_id},
-            timeout=self.timeout,
-        )
-        r.raise_for_status()
-        data = r.json()
+            json={"prompt": workflow_graph, "client_id": self.client_id},
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        ) as r:
+            r.raise_for_status()
+            data = await r.json(content_type=None)
         prompt_id = data.get("prompt_id")
         if not prompt_id:
             raise RuntimeError(f"No prompt_id in response: {data}")
+        return prompt_id
 
-        start = time.time()
-        while True:
-            h = self.session.get(self._url(f"/history/{prompt_id}"), timeout=self.timeout)
-            if h.status_code == 200:
-                entry = h.json().get(prompt_id)
+    async def _history_entry(self, prompt_id: str, check: bool = True) -> dict | None:
+        """prompt_id's finished history entry, or None; with check, a failed run raises (see history_failure)."""
+        async with self.session.get(self._url(f"/history/{prompt_id}"),
+                                    timeout=aiohttp.ClientTimeout(total=self.timeout)) as h:
+            if h.status == 200:
+                entry = (await h.json(content_type=None)).get(prompt_id)
                 if entry and "outputs" in entry:
-                    outputs = entry.get("outputs", {})
-                    ui = entry.get("ui", {})
-                    artifacts = self._collect_artifacts(outputs, ui, workflow_graph)
-                    return {"prompt_id": prompt_id, "outputs": outputs, "artifacts": artifacts}
+                    failure = history_failure(prompt_id, entry) if check else None
+                    if failure is not None:
+                        raise failure
+                    return entry
+        return None
+
+    async def _check_cancel(self, prompt_id: str, cancel):
+        if cancel is not None and cancel.is_set():
+            try:
+                await self.cancel(prompt_id)
+            except Exception as e:
+                print("Cancel request failed:", e)
+            raise JobCancelled(f"ComfyUI job {prompt_id} cancelled.")
+
+    async def _poll_history(self, prompt_id: str, start: float, poll_interval, max_wait: float | None, cancel=None) -> dict:
+        """Wait for prompt_id's history entry from the shared poller."""
+        w = _Polled(asyncio.get_running_loop().create_future(), start, max(0.01, poll_interval), since=time.time())
+        self._polled[prompt_id] = w
+        if self._poll_task is None or self._poll_task.done():
+            self._poll_wake = asyncio.Event()
+            self._poll_task = asyncio.get_running_loop().create_task(self._poll_loop())
+        else:
+            self._poll_wake.set()  # it may be due sooner than the current sleep
+        try:
+            while True:
+                await self._check_cancel(prompt_id, cancel)
+                remaining = None if max_wait is None else max_wait - (time.time() - start)
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"ComfyUI job {prompt_id} timed out.")
+                wait = 0.1 if cancel is not None else remaining
+                done, _ = await asyncio.wait({w.future}, timeout=wait if remaining is None else min(wait, remaining))
+                if done:
+                    return w.future.result()
+        finally:
+            self._polled.pop(prompt_id, None)
+
+    async def _poll_loop(self):
+        """
+        One polling round for every prompt in _polled: a /queue request gives each its
+        place; those no longer queued have their history fetched (in one /history
+        request when several finish together). Rounds are as fast as the most urgent
+        prompt wants: just submitted, next in line, or just left the queue means its
+        poll_interval; a prompt running (or gone without history) for t seconds is
+        polled every t/10, up to poll_max_interval, with jitter. A failed round (e.g.
+        a transient network error) is logged and retried with exponential backoff;
+        each waiter gives up only at its own max_wait (see _poll_history).
+        """
+        failures = 0
+        while self._polled:
+            self._poll_wake.clear()
+            timeout = self._poll_due() - time.time()
+            if timeout > 0:
+                try:
+                    await asyncio.wait_for(self._poll_wake.wait(), timeout)
+                    continue  # a prompt was added: recompute when the next round is due
+                except asyncio.TimeoutError:
+                    pass
+            if not self._polled:
+                return
+            try:
+                await self._poll_round()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                backoff = min(self.poll_max_interval, 0.25 * 2 ** failures) * random.uniform(0.8, 1.2)
+                print(f"Polling ComfyUI failed ({e!r}), retrying in {backoff:.1f}s")
+                await asyncio.sleep(backoff)
+
+    async def _poll_round(self):
+        q = await self.get_json("/queue")
+        running = {item[1] for item in q.get("queue_running", []) if len(item) > 1}
+        pending = [item[1] for item in sorted((i for i in q.get("queue_pending", []) if len(i) > 1), key=lambda i: i[0])]
+        places = {pid: i for i, pid in enumerate(pending)}
+        now, gone = time.time(), []
+        for pid, w in list(self._polled.items()):
+            w.checked = now
+            pos = -1 if pid in running else places.get(pid)
+            if pos != w.position:
+                w.position, w.since = pos, now
+            if pos is None:
+                gone.append(pid)
+        if not gone:
+            return
+        if len(gone) == 1:
+            found = {gone[0]: await self._history_entry(gone[0], check=False)}
+        else:
+            found = await self.get_json(f"/history?max_items={max(64, 2 * len(gone))}")
+            for pid in gone:
+                if pid not in found:
+                    found[pid] = await self._history_entry(pid, check=False)
+        for pid in gone:
+            entry, w = found.get(pid), self._polled.get(pid)
+            if entry and "outputs" in entry and w is not None and not w.future.done():
+                failure = history_failure(pid, entry)
+                if failure is not None:
+                    w.future.set_exception(failure)
+                else:
+                    w.future.set_result(entry)
 
-            if max_wait is not None and (time.time() - start) > max_wait:
+    def _poll_due(self) -> float:
+        """When the next round is due: the earliest of each prompt's last check + its delay."""
+        now, due = time.time(), math.inf
+        for w in self._polled.values():
+            if now - w.submitted < 2.0 or w.position == 0 or now - w.since < w.interval:
+                want = w.interval
+            else:
+                if w.position is None or w.position == -1:
+                    want = max(w.interval, (now - w.since) / 10)
+                else:
+                    want = w.interval * (1 + w.position)
+                want = min(self.poll_max_interval, want) * random.uniform(0.8, 1.2)
+            due = min(due, w.checked + want if w.checked else now)  # unchecked: right away
+        return due
+
+    async def _open_ws(self):
+        """The client's shared socket, connected on first use (None if unavailable)."""
+        if not self.use_websocket:
+            return None
+        if self._ws_lock is None:
+            self._ws_lock = asyncio.Lock()
+        async with self._ws_lock:
+            if self._ws is None or self._ws.closed:
+                await self._stop_ws_reader()  # the old socket's waiters are told before new ones register
+                try:
+                    self._ws = await self.session.ws_connect(self._ws_url(), timeout=aiohttp.ClientWSTimeout(ws_close=5),
+                                                             max_msg_size=0)
+                except Exception as e:
+                    print("WebSocket unavailable, polling /history instead:", e)
+                    self._ws = None
+                    return None
+                self._ws_task = asyncio.get_running_loop().create_task(self._read_ws(self._ws))
+                self._ws_task.add_done_callback(_report_ws_reader)
+        return self._ws
+
+    async def _stop_ws_reader(self):
+        task, self._ws_task = self._ws_task, None
+        if task is not None and not task.done():
+            task.cancel()
+            await asyncio.wait([task])
+
+    async def _read_ws(self, ws):
+        """Route socket messages to waiters by prompt_id until the socket closes."""
+        running = None  # prompt executing now: binary previews and old progress messages carry no id
+        try:
+            async for msg in ws:
+                if msg.type == aiohttp.WSMsgType.BINARY:
+                    event = parse_preview(msg.data)
+                    if event is not None:
+                        self._dispatch(event.get("prompt_id") or running, event)
+                    continue
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                try:
+                    m = json.loads(msg.data)
+                except ValueError:
+                    continue
+                mtype, data = m.get("type"), m.get("data") or {}
+                pid = data.get("prompt_id")
+                if mtype == "executing":
+                    running = pid if data.get("node") is not None else None
+                elif mtype == "progress" and pid is None:
+                    pid = running
+                self._dispatch(pid, (mtype, data))
+        except Exception as e:
+            print("WebSocket dropped, falling back to polling:", e)
+        finally:
+            if self._ws is ws:
+                self._ws = None
+            for q in self._waiters.values():
+                q.put_nowait(_DROPPED)
+
+    def _dispatch(self, prompt_id, item):
+        if prompt_id is None or prompt_id in self._gone:
+            return
+        q = self._waiters.get(prompt_id)
+        if q is not None:
+            q.put_nowait(item)
+            return
+        self._early.setdefault(prompt_id, []).append(item)
+        if len(self._early) > 256:
+            self._early.popitem(last=False)
+
+    def _register(self, prompt_id: str) -> asyncio.Queue:
+        q = self._waiters[prompt_id] = asyncio.Queue()
+        for item in self._early.pop(prompt_id, ()):
+            q.put_nowait(item)
+        if self._ws is None:
+            q.put_nowait(_DROPPED)  # closed between submit and now
+        return q
+
+    def _unregister(self, prompt_id: str):
+        self._waiters.pop(prompt_id, None)
+        self._gone.append(prompt_id)
+
+    async def _wait_ws(self, waiter: asyncio.Queue, prompt_id: str, start: float, max_wait: float | None, cancel=None,
+                       on_progress=None, idle_check: float = 30.0, tick: float = 0.5,
+                       on_start=None) -> tuple[dict | None, float | None]:
+        """
+        Wait on the messages routed to prompt_id until it finishes. Returns (history entry or
+        None, completion time); completion time is None if the socket failed and polling must
+        take over. If nothing arrives for idle_check seconds, history is checked once in case the
+        completion message was missed. With a cancel event, it is checked every tick seconds.
+        on_start() is called once when the server starts executing the prompt.
+        """
+        last_heard = time.time()
+        while True:
+            await self._check_cancel(prompt_id, cancel)
+            remaining = None if max_wait is None else max_wait - (time.time() - start)
+            if remaining is not None and remaining <= 0:
                 raise TimeoutError(f"ComfyUI job {prompt_id} timed out.")
-            time.sleep(poll_interval)
+            wait = tick if cancel is not None else idle_check
+            try:
+                item = await asyncio.wait_for(waiter.get(), wait if remaining is None else min(wait, remaining))
+            except asyncio.TimeoutError:
+                if time.time() - last_heard >= idle_check:
+                    last_heard = time.time()
+                    entry = await self._history_entry(prompt_id)
+                    if entry is not None:
+                        return entry, time.time()
+                continue
+            if item is _DROPPED:
+                return None, None
+            last_heard = time.time()
+            if isinstance(item, dict):  # decoded preview frame
+                if on_progress is not None:
+                    on_progress(item)
+                continue
+            mtype, data = item
+            if mtype == "progress":
+                if on_progress is not None:
+                    on_progress({"type": "progress", "value": data.get("value"), "max": data.get("max"),
+                                 "node": data.get("node")})
+                continue
+            if on_start is not None and mtype in ("execution_start", "executing"):
+                on_start()
+                on_start = None
+            if mtype == "executing" and data.get("node") is not None and on_progress is not None:
+                on_progress({"type": "executing", "node": data["node"]})
+            if mtype == "execution_error":
+                raise RuntimeError(f"ComfyUI job {prompt_id} failed: {data.get('exception_message', data)}")
+            if mtype == "execution_interrupted":
+                raise JobCancelled(f"ComfyUI job {prompt_id} was interrupted.")
+            if mtype == "execution_success" or (mtype == "executing" and data.get("node") is None):
+                return None, time.time()
 
-    # ---- internals ----
+    # ---- artifacts ----
+
+    async def _replay(self, hit: dict, graph: dict, on_span=None) -> List[Dict[str, Any]]:
+        """
+        Artifacts of a memoized run. When the artifact cache holds every file they are
+        copied from it without contacting the server; otherwise they are collected
+        as usual. Raises _OutputsGone if the cache loses a blob meanwhile.
+        """
+        arts, pending = plan_artifacts(hit["outputs"], hit.get("ui"), graph)
+        keys = {i: (arts[i]["filename"], arts[i]["subfolder"], arts[i]["type"]) for i, _ in pending}
+        if not self.cache or any(self.cache.lookup(k, self.base_url) is None for k in keys.values()):
+            return await self.collect_artifacts(hit["outputs"], hit.get("ui"), graph, on_span)
+        t0 = time.time()
+        for i, key in keys.items():
+            path = self._spool_path(key[0])
+            if not self.cache.materialize(key, path, self.base_url):
+                for a in arts:
+                    if a.get("path"):
+                        try: os.remove(a["path"])
+                        except OSError: pass
+                raise _OutputsGone(f"{key[0]} evicted from the artifact cache")
+            arts[i]["path"] = path
+        if on_span is not None:
+            size = sum(os.path.getsize(a["path"]) if a.get("path") else len(a.get("bytes") or b"") for a in arts)
+            on_span("collect", t0, time.time(), files=len(arts), bytes=size, source="cache")
+        return arts
+
+    async def collect_artifacts(self, outputs: dict, ui: dict | None = None, graph: dict | None = None,
+                                on_span=None) -> List[Dict[str, Any]]:
+        """Artifacts of a finished prompt's history outputs/ui; files are downloaded concurrently."""
+        t0 = time.time()
+        arts, pending = plan_artifacts(outputs, ui, graph)
+        arts = await self._download_many(arts, pending, on_span)
+        if on_span is not None:
+            size = sum(os.path.getsize(a["path"]) if a.get("path") else len(a.get("bytes") or b"") for a in arts)
+            on_span("collect", t0, time.time(), files=len(arts), bytes=size)
+        return arts
+
+    def _spool_path(self, filename: str) -> str:
+        os.makedirs(self.spool_dir, exist_ok=True)
+        safe = re.sub(r"[^A-Za-z0-9._-]", "_", os.path.basename(filename)) or "file"
+        return os.path.join(self.spool_dir, f"{uuid.uuid4().hex[:12]}-{safe}")
 
-    def _download_file(self, filename: str, subfolder: str, ftype: str) -> bytes:
-        resp = self.session.get(
+    async def _download_file(self, filename: str, subfolder: str, ftype: str) -> str:
+        """
+        Stream /view into the spool directory and return the file path.
+        Cached files are revalidated (If-None-Match / If-Modified-Since) and copied
+        from the cache without reading the body when the ETag or Last-Modified
+        still matches; otherwise the body is downloaded and hashed, and an
+        unchanged payload dedupes onto its existing blob.
+        """
+        key = (filename, subfolder or "", ftype or "output")
+        cached = self.cache.lookup(key, self.base_url) if self.cache else None
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        path = self._spool_path(filename)
+        part = path + ".part"
+        async with self.session.get(
             self._url("/view"),
-            params={"filename": filename, "subfolder": subfolder or "", "type": ftype or "output"},
-            timeout=self.timeout,
-        )
-        resp.raise_for_status()
-        return resp.content
-
-    def _collect_artifacts(self, outputs: dict, ui: dict | None, graph: dict | None) -> List[Dict[str, Any]]:
-        arts: List[Dict[str, Any]] = []
-        seen: set[tuple[str, str, str]] = set()
-
-        # 1) Files registered in history
-        for node_id, node_out in outputs.items():
-            if not isinstance(node_out, dict):
-                continue
-            for key, value in node_out.items():
-                if isinstance(value, list) and value and isinstance(value[0], dict) and "filename" in value[0]:
-                    for item in value:
-                        fn = item.get("filename"); sub = item.get("subfolder", ""); typ = item.get("type", "output")
-                        if not fn:
-                            continue
-                        sig = (fn, sub, typ)
-                        if sig in seen:
-                            continue
-                        seen.add(sig)
-                        raw = self._download_file(fn, sub, typ)
-                        kind, mime = _guess_kind_mime(fn)
-                        arts.append({
-                            "node_id": node_id, "key": key, "filename": fn, "subfolder": sub,
-                            "type": typ, "kind": kind, "mimetype": mime, "bytes": raw
-                        })
+            params={"filename": key[0], "subfolder": key[1], "type": key[2]}, headers=headers,
+        ) as resp:
+            if cached and (resp.status == 304 or (resp.status == 200 and _unchanged(cached, resp.headers))):
+                if self.cache.materialize(key, path, self.base_url):
+                    return path
+                self.cache.forget(key, self.base_url)
+                if resp.status == 304:
+                    return await self._download_file(filename, subfolder, ftype)
+            resp.raise_for_status()
+            digest = hashlib.sha256()
+            try:
+                with open(part, "wb") as f:
+                    async for chunk in resp.content.iter_chunked(1 << 20):
+                        digest.update(chunk)
+                        f.write(chunk)
+                os.replace(part, path)
+            except BaseException:
+                try: os.remove(part)
+                except OSError: pass
+                raise
+            etag, modified = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+        if self.cache:
+            self.cache.store(key, path, digest.hexdigest(), etag, self.base_url, last_modified=modified)
+        return path
+
+    async def _download_many(self, arts: List[Dict[str, Any]], pending: List[Tuple[int, bool]],
+                             on_span=None) -> List[Dict[str, Any]]:
+        """
+        Fill arts[i]["path"] for every (i, optional) in pending, download_workers at a time.
+        Order is preserved; failed optional downloads are dropped, a failed required one raises.
+        """
+        slots = asyncio.Semaphore(self.download_workers)
 
-                # Strings in outputs (rare, but some nodes do this)
-                elif isinstance(value, str) and ("text" in key.lower() or key.lower() in ("string", "value")):
+        async def fetch(i):
+            a = arts[i]
+            async with slots:
+                t0 = time.time()
+                path = await self._download_file(a["filename"], a["subfolder"], a["type"])
+            if on_span is not None:
+                on_span("download", t0, time.time(), file=a["filename"], bytes=os.path.getsize(path))
+            return path
+
+        failed = set()
+        try:
+            results = await asyncio.gather(*(fetch(i) for i, _ in pending), return_exceptions=True)
+            for (i, optional), res in zip(pending, results):
+                if isinstance(res, BaseException):
+                    if not optional:
+                        raise res
+                    failed.add(i)
+                else:
+                    arts[i]["path"] = res
+        finally:
+            if self.cache:
+                self.cache.flush()
+        return [a for i, a in enumerate(arts) if i not in failed]
+
+def plan_artifacts(outputs: dict, ui: dict | None, graph: dict | None) -> Tuple[List[Dict[str, Any]], List[Tuple[int, bool]]]:
+    """
+    Artifact records for a history entry, in order, plus (index, optional) for each
+    record whose file still has to be downloaded (its "path" is None until then).
+    """
+    arts: List[Dict[str, Any]] = []
+    seen: set[tuple[str, str, str]] = set()
+    pending: List[Tuple[int, bool]] = []  # (index into arts, optional) awaiting download
+
+    # 1) Files registered in history
+    for node_id, node_out in outputs.items():
+        if not isinstance(node_out, dict):
+            continue
+        for key, value in node_out.items():
+            if isinstance(value, list) and value and isinstance(value[0], dict) and "filename" in value[0]:
+                for item in value:
+                    fn = item.get("filename"); sub = item.get("subfolder", ""); typ = item.get("type", "output")
+                    if not fn:
+                        continue
+                    sig = (fn, sub, typ)
+                    if sig in seen:
+                        continue
+                    seen.add(sig)
+                    kind, mime = _guess_kind_mime(fn)
+                    pending.append((len(arts), False))
+                    arts.append({
+                        "node_id": node_id, "key": key, "filename": fn, "subfolder": sub,
+                        "type": typ, "kind": kind, "mimetype": mime, "path": None
+                    })
+
+            # Strings in outputs (rare, but some nodes do this)
+            elif isinstance(value, str) and ("text" in key.lower() or key.lower() in ("string", "value")):
+                arts.append({
+                    "node_id": node_id, "key": key, "filename": f"{node_id}-{key}.txt",
+                    "subfolder": "", "type": "ui", "kind": "text", "mimetype": "text/plain",
+                    "bytes": value.encode("utf-8", "replace"), "path": None
+                })
+            elif isinstance(value, list) and value and isinstance(value[0], dict) and "text" in value[0]:
+                for i, item in enumerate(value):
+                    txt = str(item.get("text", ""))
                     arts.append({
-                        "node_id": node_id, "key": key, "filename": f"{node_id}-{key}.txt",
+                        "node_id": node_id, "key": f"{key}[{i}]", "filename": f"{node_id}-{key}-{i}.txt",
                         "subfolder": "", "type": "ui", "kind": "text", "mimetype": "text/plain",
-                        "bytes": value.encode("utf-8", "replace")
+                        "bytes": txt.encode("utf-8", "replace"), "path": None
                     })
-                elif isinstance(value, list) and value and isinstance(value[0], dict) and "text" in value[0]:
-                    for i, item in enumerate(value):
-                        txt = str(item.get("text", ""))
-                        arts.append({
-                            "node_id": node_id, "key": f"{key}[{i}]", "filename": f"{node_id}-{key}-{i}.txt",
-                            "subfolder": "", "type": "ui", "kind": "text", "mimetype": "text/plain",
-                            "bytes": txt.encode("utf-8", "replace")
-                        })
 
-        # 2) UI section text (ShowText-style nodes)
-        if isinstance(ui, dict):
-            for node_id, items in ui.items():
-                if not isinstance(items, list):
-                    items = [items]
-                for i, item in enumerate(items):
-                    txt = None
-                    if isinstance(item, dict):
-                        txt = item.get("text") or item.get("content") or item.get("prompt")
-                    elif isinstance(item, str):
-                        txt = item
-                    if txt:
+    # 2) UI section text (ShowText-style nodes)
+    if isinstance(ui, dict):
+        for node_id, items in ui.items():
+            if not isinstance(items, list):
+                items = [items]
+            for i, item in enumerate(items):
+                txt = None
+                if isinstance(item, dict):
+                    txt = item.get("text") or item.get("content") or item.get("prompt")
+                elif isinstance(item, str):
+                    txt = item
+                if txt:
+                    arts.append({
+                        "node_id": str(node_id), "key": f"ui[{i}]", "filename": f"{node_id}-ui-{i}.txt",
+                        "subfolder": "", "type": "ui", "kind": "text", "mimetype": "text/plain",
+                        "bytes": txt.encode("utf-8", "replace"), "path": None
+                    })
+
+    # 3) Deterministic fallbacks using graph (pysssss savers with root_dir/output)
+    if graph:
+        for gid, gnode in graph.items():
+            ctype = gnode.get("class_type", "")
+            inputs = gnode.get("inputs", {})
+            if ctype in ("SaveText|pysssss", "SaveAudio|pysssss", "SaveVideo|pysssss"):
+                root = inputs.get("root_dir", "")
+                rel = inputs.get("file", "")
+                if root == "output" and isinstance(rel, str) and rel and "/" in rel:
+                    sub, fn = rel.rsplit("/", 1)
+                    sig = (fn, sub, "output")
+                    if sig not in seen:
+                        seen.add(sig)
+                        kind, mime = _guess_kind_mime(fn)
+                        pending.append((len(arts), True))  # may not exist; dropped on failure
                         arts.append({
-                            "node_id": str(node_id), "key": f"ui[{i}]", "filename": f"{node_id}-ui-{i}.txt",
-                            "subfolder": "", "type": "ui", "kind": "text", "mimetype": "text/plain",
-                            "bytes": txt.encode("utf-8", "replace")
+                            "node_id": gid, "key": "fallback", "filename": fn, "subfolder": sub,
+                            "type": "output", "kind": kind, "mimetype": mime, "path": None
                         })
 
-        # 3) Deterministic fallbacks using graph (pysssss savers with root_dir/output)
-        if graph:
-            for gid, gnode in graph.items():
-                ctype = gnode.get("class_type", "")
-                inputs = gnode.get("inputs", {})
-                if ctype in ("SaveText|pysssss", "SaveAudio|pysssss", "SaveVideo|pysssss"):
-                    root = inputs.get("root_dir", "")
-                    rel = inputs.get("file", "")
-                    if root == "output" and isinstance(rel, str) and rel and "/" in rel:
-                        sub, fn = rel.rsplit("/", 1)
-                        sig = (fn, sub, "output")
-                        if sig not in seen:
-                            try:
-                                raw = self._download_file(fn, sub, "output")
-                                kind, mime = _guess_kind_mime(fn)
-                                arts.append({
-                                    "node_id": gid, "key": "fallback", "filename": fn, "subfolder": sub,
-                                    "type": "output", "kind": kind, "mimetype": mime, "bytes": raw
-                                })
-                                seen.add(sig)
-                            except Exception:
-                                pass
+    return arts, pending
 
-        return arts
+_loop = None
+_loop_lock = threading.Lock()
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """Event loop on a daemon thread shared by every synchronous ComfyClient."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="comfy-loop", daemon=True).start()
+        return _loop
+
+class ComfyClient:
+    """
+    Blocking front of AsyncComfyClient (same arguments and results). Calls run on a
+    shared background event loop; callbacks (on_submit, on_progress, on_span) are
+    relayed back and run on the calling thread, as with a plain blocking client.
+    """
+    def __init__(self, base_url: str | None = None, **kwargs):
+        self.aclient = AsyncComfyClient(base_url, **kwargs)
+        self.loop = _background_loop()
+
+    @property
+    def base_url(self) -> str:
+        return self.aclient.base_url
+
+    @property
+    def cache(self) -> ArtifactCache | None:
+        return self.aclient.cache
+
+    @property
+    def memo(self) -> RunMemo | None:
+        return self.aclient.memo
+
+    @property
+    def timeout(self):
+        return self.aclient.timeout
+
+    def run_workflow(self, workflow_graph: dict, poll_interval=0.5, max_wait: float | None = None,
+                     use_memo: bool = True, on_submit=None, cancel=None, on_progress=None,
+                     on_span=None) -> Dict[str, Any]:
+        """See AsyncComfyClient.run_workflow; cancel is a threading.Event."""
+        calls = queue.SimpleQueue()
+        relay = lambda fn: (lambda *a, **kw: calls.put((fn, a, kw))) if fn is not None else None
+        return self._call(self.aclient.run_workflow(
+            workflow_graph, poll_interval, max_wait, use_memo, relay(on_submit), cancel,
+            relay(on_progress), relay(on_span)), calls)
+
+    def collect_artifacts(self, outputs: dict, ui: dict | None = None, graph: dict | None = None,
+                          on_span=None) -> List[Dict[str, Any]]:
+        calls = queue.SimpleQueue()
+        relay = (lambda *a, **kw: calls.put((on_span, a, kw))) if on_span is not None else None
+        return self._call(self.aclient.collect_artifacts(outputs, ui, graph, relay), calls)
+
+    def get_json(self, path: str, timeout: float | None = None) -> Any:
+        return self._call(self.aclient.get_json(path, timeout))
+
+    def cancel(self, prompt_id: str) -> None:
+        self._call(self.aclient.cancel(prompt_id))
+
+    def close(self):
+        self._call(self.aclient.close())
+
+    # ---- internals ----
+
+    def _call(self, coro, calls: queue.SimpleQueue | None = None):
+        fut = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        if calls is None:
+            return fut.result()
+        fut.add_done_callback(lambda _: calls.put(None))
+        while True:
+            item = calls.get()
+            if item is None:
+                return fut.result()
+            fn, a, kw = item
+            try:
+                fn(*a, **kw)
+            except BaseException:
+                fut.cancel()
+                raise
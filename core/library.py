@@ -0,0 +1,245 @@
+import os, json, hashlib, threading
+from typing import Any, Dict, List, Optional
+
+from core.tokens import find_specs
+from core.workflow_io import load_workflow_graph
+
+try:
+    from watchdog.observers import Observer  # optional; without it refresh() re-stats the tree
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+def default_index_path(root: str) -> str:
+    cache_dir = os.getenv("COMFY_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "pg_comfy", "artifacts")
+    tag = hashlib.sha1(os.path.abspath(root).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(cache_dir, f"workflows-{tag}.json")
+
+def fuzzy_score(query: str, text: str) -> Optional[int]:
+    """
+    Subsequence match of query in text (both lowercase). Higher is better; None if
+    some character is missing. Runs of consecutive characters and matches at the
+    start of a path segment/word score extra, gaps cost a little.
+    """
+    score, pos, prev = 0, 0, -2
+    for ch in query:
+        i = text.find(ch, pos)
+        if i < 0:
+            return None
+        if i == prev + 1:
+            score += 5
+        elif i == 0 or text[i - 1] in "/\\ _-.()":
+            score += 3
+        else:
+            score -= min(3, i - pos)
+        prev, pos = i, i + 1
+    return score - len(text) // 16
+
+class _Changes(FileSystemEventHandler):
+    def __init__(self, index: "WorkflowIndex"):
+        self.index = index
+
+    def on_any_event(self, event):
+        with self.index.lock:
+            if event.is_directory:
+                self.index._needs_walk = True
+            else:
+                for p in (getattr(event, "src_path", None), getattr(event, "dest_path", None)):
+                    if p:
+                        self.index._dirty.add(os.fsdecode(p))
+
+class WorkflowIndex:
+    """
+    Persistent index of a workflows folder: relative path -> {mtime, size, tokens,
+    classes}. refresh() re-parses only files whose mtime/size changed (with watchdog
+    installed, only the paths it reported) and saves the index as JSON, so the
+    picker lists and filters thousands of workflows without touching the disk.
+    search() ranks paths by fuzzy_score; "%NAME" / "@Class" terms filter by token
+    or node class. on_change(full_paths) is called from the refreshing thread
+    with every file that changed or disappeared (e.g. to invalidate a WorkflowCache).
+    """
+    def __init__(self, root: str, index_path: str | None = None, watch: bool = True, exts=(".json",),
+                 on_change=None):
+        self.root = os.path.abspath(root)
+        self.index_path = index_path or default_index_path(root)
+        self.exts = tuple(exts)
+        self.on_change = on_change
+        self.lock = threading.RLock()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.version = 0              # bumped whenever entries change
+        self._items: List[str] | None = None
+        self._lower: Dict[str, str] = {}
+        self._dirty: set = set()
+        self._needs_walk = True
+        self._refreshing = False
+        self._observer = None
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("root") == self.root:
+                self.entries = data.get("entries", {})
+        except (OSError, ValueError):
+            pass
+        if watch and Observer is not None and os.path.isdir(self.root):
+            try:
+                self._observer = Observer()
+                self._observer.schedule(_Changes(self), self.root, recursive=True)
+                self._observer.daemon = True
+                self._observer.start()
+            except Exception as e:
+                print("Workflow folder watch unavailable, re-scanning instead:", e)
+                self._observer = None
+
+    @property
+    def items(self) -> List[str]:
+        with self.lock:
+            if self._items is None:
+                self._items = sorted(self.entries, key=str.lower)
+                self._lower = {rel: rel.lower() for rel in self._items}
+            return self._items
+
+    def get(self, rel: str) -> Dict[str, Any] | None:
+        with self.lock:
+            return self.entries.get(rel)
+
+    def refresh(self) -> int:
+        """Bring the index up to date with the folder; returns the number of changed entries."""
+        with self.lock:
+            walk = self._observer is None or self._needs_walk
+            dirty, self._dirty, self._needs_walk = self._dirty, set(), False
+            known = dict(self.entries)
+        if walk:
+            seen = self._walk()
+        else:
+            seen = {}
+            for full in dirty:
+                rel = os.path.relpath(full, self.root)
+                st = self._stat(full)
+                seen[rel] = st
+        updates, removed = {}, []
+        for rel, st in seen.items():
+            if st is None:
+                if rel in known:
+                    removed.append(rel)
+                continue
+            old = known.get(rel)
+            if old is None or old["mtime"] != st.st_mtime or old["size"] != st.st_size:
+                updates[rel] = self._describe(rel, st)
+        if walk:
+            removed += [rel for rel in known if rel not in seen]
+        if not updates and not removed:
+            return 0
+        with self.lock:
+            for rel in removed:
+                self.entries.pop(rel, None)
+            self.entries.update(updates)
+            self._items = None
+            self.version += 1
+            self._save()
+        if self.on_change is not None:
+            self.on_change([os.path.join(self.root, rel) for rel in (*updates, *removed)])
+        return len(updates) + len(removed)
+
+    def refresh_async(self, on_done=None) -> bool:
+        """refresh() on a background thread; on_done(changed) is called from that thread."""
+        with self.lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+
+        def work():
+            changed = 0
+            try:
+                changed = self.refresh()
+            except Exception as e:
+                print("Workflow index refresh failed:", e)
+            finally:
+                with self.lock:
+                    self._refreshing = False
+            if on_done is not None:
+                on_done(changed)
+
+        threading.Thread(target=work, name="workflow-index", daemon=True).start()
+        return True
+
+    def search(self, query: str, limit: int | None = None) -> List[str]:
+        terms = query.lower().split()
+        text_terms = [t for t in terms if t[0] not in "%@"]
+        tok_terms = [t[1:] for t in terms if t[0] == "%" and len(t) > 1]
+        cls_terms = [t[1:] for t in terms if t[0] == "@" and len(t) > 1]
+        scored = []
+        with self.lock:
+            if not terms:
+                return self.items[:limit]
+            for rel in self.items:
+                e = self.entries[rel]
+                if tok_terms and not all(any(t in n.lower() for n in e["tokens"]) for t in tok_terms):
+                    continue
+                if cls_terms and not all(any(t in c.lower() for c in e["classes"]) for t in cls_terms):
+                    continue
+                score = 0
+                for t in text_terms:
+                    s = fuzzy_score(t, self._lower[rel])
+                    if s is None:
+                        break
+                    score += s
+                else:
+                    scored.append((-score, self._lower[rel], rel))
+        scored.sort()
+        return [rel for _, _, rel in scored[:limit]]
+
+    def close(self):
+        if self._observer is not None:
+            self._observer.stop()
+
+    # ---- internals ----
+
+    def _stat(self, full: str):
+        if not full.lower().endswith(self.exts):
+            return None
+        try:
+            st = os.stat(full)
+        except OSError:
+            return None
+        return st if os.path.isfile(full) else None
+
+    def _walk(self) -> Dict[str, os.stat_result]:
+        seen, stack = {}, [self.root]
+        while stack:
+            d = stack.pop()
+            try:
+                it = os.scandir(d)
+            except OSError:
+                continue
+            with it:
+                for de in it:
+                    try:
+                        if de.is_dir():
+                            stack.append(de.path)
+                        elif de.name.lower().endswith(self.exts):
+                            seen[os.path.relpath(de.path, self.root)] = de.stat()
+                    except OSError:
+                        pass
+        return seen
+
+    def _describe(self, rel: str, st) -> Dict[str, Any]:
+        entry = {"mtime": st.st_mtime, "size": st.st_size, "tokens": [], "classes": [], "error": None}
+        try:
+            graph = load_workflow_graph(os.path.join(self.root, rel))
+            entry["tokens"] = [f"{s['name']}:{s['kind']}" for s in find_specs(graph)]
+            entry["classes"] = sorted({str(n.get("class_type")) for n in graph.values()
+                                       if isinstance(n, dict) and n.get("class_type")})
+        except Exception as e:
+            entry["error"] = str(e)
+        return entry
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+            tmp = self.index_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"root": self.root, "entries": self.entries}, f)
+            os.replace(tmp, self.index_path)
+        except OSError as e:
+            print("Could not save workflow index:", e)
@@ -0,0 +1,74 @@
+import os, json, hashlib, threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+def _normalize(v):
+    if isinstance(v, bool) or v is None or isinstance(v, str):
+        return v
+    if isinstance(v, float):
+        return int(v) if v.is_integer() else v
+    if isinstance(v, dict):
+        # _meta only carries editor titles; it never affects execution
+        return {str(k): _normalize(x) for k, x in v.items() if k != "_meta"}
+    if isinstance(v, (list, tuple)):
+        return [_normalize(x) for x in v]
+    return v
+
+def canonical_graph(graph: dict) -> str:
+    """Stable JSON for a fully substituted graph: sorted keys, 8.0 == 8, no _meta."""
+    return json.dumps(_normalize(graph), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+def graph_hash(graph: dict) -> str:
+    return hashlib.sha256(canonical_graph(graph).encode("utf-8")).hexdigest()
+
+class RunMemo:
+    """
+    Size-bounded LRU of graph hash -> finished history entry {prompt_id, outputs, ui}.
+    Persisted as JSON so identical runs are recalled across sessions. Thread-safe.
+    """
+    def __init__(self, path: str, max_entries: int = 256):
+        self.path = path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self._save()
+
+    def invalidate(self, key: str | None = None) -> None:
+        """Drop one entry, or everything when key is None."""
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+            self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
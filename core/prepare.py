@@ -0,0 +1,31 @@
+from typing import Dict, Any, Tuple
+from core.tokens import CompiledTemplate, compile_template
+from core.seed import apply_seed_policy
+
+def cow_graph(base_graph: dict, writable_nodes) -> dict:
+    """
+    Copy-on-write view of base_graph: a new top-level dict whose writable nodes get
+    their own node and inputs dicts, while every other node is shared with the base.
+    Only the writable nodes' inputs may be modified.
+    """
+    g = dict(base_graph)
+    for nid in writable_nodes:
+        node = g[nid]
+        g[nid] = {**node, "inputs": dict(node.get("inputs", {}))}
+    return g
+
+def prepare_graph(base_graph: dict, values: Dict[str, Any],
+                  template: CompiledTemplate | None = None) -> Tuple[dict, int | None]:
+    """
+    Copy base_graph, apply the seed policy and token values. Returns (graph, seed).
+    A %%SEED%% token left blank gets the generated seed; without one, the seed is
+    broadcast to every seed/noise_seed input. Pass the template compiled at load
+    time to skip rescanning the graph.
+    """
+    template = template or compile_template(base_graph)
+    g = cow_graph(base_graph, template.writable_nodes)
+    seed = apply_seed_policy(g, set(template.names), values.get("SEED"))
+    if "SEED" in template:
+        values = {**values, "SEED": seed}
+    template.apply(g, values)
+    return g, seed
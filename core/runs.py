@@ -0,0 +1,257 @@
+import os, json, shlex, shutil, sqlite3, threading, time, uuid
+from typing import Any, Dict, List, Tuple
+
+from core.memo import graph_hash
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    finished REAL NOT NULL,
+    workflow TEXT,
+    graph_hash TEXT,
+    seed INTEGER,
+    status TEXT NOT NULL,
+    prompt_id TEXT,
+    error TEXT,
+    timings TEXT,                 -- JSON {phase: ms}
+    thumb TEXT                    -- first image, relative to the store root
+);
+CREATE INDEX IF NOT EXISTS runs_created ON runs(created);
+CREATE INDEX IF NOT EXISTS runs_workflow ON runs(workflow, created);
+CREATE INDEX IF NOT EXISTS runs_hash ON runs(graph_hash);
+CREATE INDEX IF NOT EXISTS runs_seed ON runs(seed);
+CREATE TABLE IF NOT EXISTS tokens (
+    run INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    name TEXT NOT NULL COLLATE NOCASE,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tokens_value ON tokens(name, value, run);
+CREATE INDEX IF NOT EXISTS tokens_run ON tokens(run);
+CREATE TABLE IF NOT EXISTS artifacts (
+    run INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    kind TEXT,
+    filename TEXT,
+    path TEXT NOT NULL,           -- relative to the store root
+    size INTEGER,
+    PRIMARY KEY (run, seq)
+);
+"""
+
+_COLUMNS = "id, created, finished, workflow, seed, status, error, timings, thumb"
+
+def default_run_dir() -> str:
+    return os.getenv("COMFY_RUN_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "pg_comfy", "runs")
+
+class RunStore:
+    """
+    SQLite history of finished runs: workflow path, graph hash, token values, seed,
+    status, per-phase timings and artifact references. record() moves the run's
+    spooled files (and writes inline text) under root/files/, so rows only hold
+    paths. Runs are indexed by date, workflow and token value; search() pages
+    through them newest first with LIMIT/OFFSET, so tens of thousands of runs
+    browse without loading more than one page. Once the stored files exceed
+    max_bytes (COMFY_RUN_MAX_BYTES, default 2 GiB; 0 keeps everything) record()
+    deletes the oldest runs. Thread-safe.
+    """
+    def __init__(self, root: str | None = None, max_bytes: int | None = None):
+        self.root = os.path.abspath(root or default_run_dir())
+        if max_bytes is None:
+            max_bytes = int(os.getenv("COMFY_RUN_MAX_BYTES") or 2 << 30)
+        self.max_bytes = max_bytes
+        self.files_dir = os.path.join(self.root, "files")
+        self.lock = threading.Lock()
+        self.version = 0              # bumped on every record/delete
+        os.makedirs(self.files_dir, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(self.root, "runs.sqlite"), check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        self.db.executescript(SCHEMA)
+        self.total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+
+    def record(self, graph: dict | None, artifacts: List[Dict[str, Any]], status: str = "done",
+               workflow: str | None = None, tokens: Dict[str, Any] | None = None, seed: int | None = None,
+               prompt_id: str | None = None, error: str | None = None, timings: Dict[str, float] | None = None,
+               created: float | None = None) -> int:
+        """
+        Store one run. Each artifact's file is moved into the store and the dict is
+        updated in place: "path" points at the stored copy and "run" is the new id.
+        Older runs are then deleted until the store fits max_bytes again.
+        """
+        now = time.time()
+        day = os.path.join(self.files_dir, time.strftime("%Y-%m-%d", time.localtime(now)))
+        stored = []
+        for a in artifacts:
+            rel = self._keep(a, day)
+            if rel is not None:
+                stored.append((a, rel))
+        thumb = next((rel for a, rel in stored if a.get("kind") == "image"), None)
+        sizes = [_size(a["path"]) for a, _ in stored]
+        with self.lock, self.db:
+            run = self.db.execute(
+                "INSERT INTO runs (created, finished, workflow, graph_hash, seed, status, prompt_id, error, timings, thumb)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (created or now, now, workflow, graph_hash(graph) if graph else None, seed, status, prompt_id,
+                 error, json.dumps(timings) if timings else None, thumb)).lastrowid
+            self.db.executemany("INSERT INTO tokens (run, name, value) VALUES (?, ?, ?)",
+                                [(run, name, str(v)) for name, v in (tokens or {}).items()])
+            self.db.executemany(
+                "INSERT INTO artifacts (run, seq, kind, filename, path, size) VALUES (?, ?, ?, ?, ?, ?)",
+                [(run, i, a.get("kind"), a.get("filename"), rel, size)
+                 for i, ((a, rel), size) in enumerate(zip(stored, sizes))])
+            self.total += sum(size or 0 for size in sizes)
+            self.version += 1
+        for a, _ in stored:
+            a["run"] = run
+        self._trim(keep=run)
+        return run
+
+    def search(self, query: str = "", offset: int = 0, limit: int = 50, workflow: str | None = None) -> List[Dict[str, Any]]:
+        """One page of runs matching query, newest first (see _where for the query terms)."""
+        where, args = self._where(query, workflow)
+        with self.lock:
+            rows = self.db.execute(
+                f"SELECT {_COLUMNS}, (SELECT COUNT(*) FROM artifacts WHERE run = runs.id) AS files"
+                f" FROM runs{where} ORDER BY created DESC, id DESC LIMIT ? OFFSET ?",
+                args + [limit, offset]).fetchall()
+        return [self._row(r) for r in rows]
+
+    def count(self, query: str = "", workflow: str | None = None) -> int:
+        where, args = self._where(query, workflow)
+        with self.lock:
+            return self.db.execute(f"SELECT COUNT(*) FROM runs{where}", args).fetchone()[0]
+
+    def get(self, run: int) -> Dict[str, Any] | None:
+        """A run with its token values and artifacts."""
+        with self.lock:
+            r = self.db.execute(f"SELECT {_COLUMNS}, graph_hash, prompt_id FROM runs WHERE id = ?", (run,)).fetchone()
+            if r is None:
+                return None
+            tokens = self.db.execute("SELECT name, value FROM tokens WHERE run = ?", (run,)).fetchall()
+        entry = self._row(r)
+        entry["tokens"] = {name: value for name, value in tokens}
+        entry["artifacts"] = self.artifacts(run)
+        return entry
+
+    def artifacts(self, run: int) -> List[Dict[str, Any]]:
+        """Stored artifacts of a run as collector-style dicts; files deleted since are skipped."""
+        with self.lock:
+            rows = self.db.execute("SELECT kind, filename, path FROM artifacts WHERE run = ? ORDER BY seq",
+                                   (run,)).fetchall()
+        out = []
+        for kind, filename, rel in rows:
+            path = os.path.join(self.root, rel)
+            if os.path.exists(path):
+                out.append({"kind": kind, "filename": filename, "path": path, "run": run})
+        return out
+
+    def delete(self, run: int) -> bool:
+        """Forget a run and remove its stored files."""
+        with self.lock, self.db:
+            files = self.db.execute("SELECT path, size FROM artifacts WHERE run = ?", (run,)).fetchall()
+            rels = [rel for rel, _ in files]
+            gone = self.db.execute("DELETE FROM runs WHERE id = ?", (run,)).rowcount > 0
+            if gone:
+                self.total -= sum(size or 0 for _, size in files)
+            self.version += gone
+        for rel in rels:
+            try: os.remove(os.path.join(self.root, rel))
+            except OSError: pass
+        return gone
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    # ---- internals ----
+
+    def _trim(self, keep: int):
+        """Delete the oldest runs with files (other than keep) while the stored files exceed max_bytes."""
+        while self.max_bytes and self.total > self.max_bytes:
+            with self.lock:
+                row = self.db.execute("SELECT id FROM runs WHERE id != ? AND id IN (SELECT run FROM artifacts)"
+                                      " ORDER BY created, id LIMIT 1", (keep,)).fetchone()
+            if row is None:
+                break
+            self.delete(row[0])
+
+    def _keep(self, a: Dict[str, Any], day: str) -> str | None:
+        """Move (or write) an artifact's payload into day/; returns its path relative to root."""
+        if not a.get("path") and a.get("bytes") is None:
+            return None
+        name = os.path.basename(a.get("filename") or "artifact")
+        dest = os.path.join(day, f"{uuid.uuid4().hex[:12]}-{name}")
+        try:
+            os.makedirs(day, exist_ok=True)
+            if a.get("path"):
+                try:
+                    os.replace(a["path"], dest)
+                except OSError:
+                    shutil.move(a["path"], dest)  # spool on another filesystem
+            else:
+                with open(dest, "wb") as f:
+                    f.write(a["bytes"])
+        except OSError as e:
+            print("Could not keep artifact in the run store:", e)
+            return None
+        a["path"] = dest
+        return os.path.relpath(dest, self.root)
+
+    def _where(self, query: str, workflow: str | None) -> Tuple[str, list]:
+        """
+        Terms: plain text matches the workflow path, %NAME=value an exact token value
+        (indexed), %NAME~text a token value containing text, seed=N, and >YYYY-MM-DD /
+        <YYYY-MM-DD bound the date. Quote a term to include spaces (%PROMPT="a cat",
+        "%PROMPT=a cat"). workflow restricts to one path (indexed).
+        """
+        clauses, args = [], []
+        if workflow is not None:
+            clauses.append("workflow = ?"); args.append(workflow)
+        for t in _terms(query):
+            if t[0] == "%" and "=" in t:
+                name, value = t[1:].split("=", 1)
+                clauses.append("id IN (SELECT run FROM tokens WHERE name = ? AND value = ?)"); args += [name, value]
+            elif t[0] == "%" and "~" in t:
+                name, value = t[1:].split("~", 1)
+                clauses.append("id IN (SELECT run FROM tokens WHERE name = ? AND instr(value, ?) > 0)"); args += [name, value]
+            elif t[0] == "%" and len(t) > 1:
+                clauses.append("id IN (SELECT run FROM tokens WHERE name = ?)"); args.append(t[1:])
+            elif t.lower().startswith("seed=") and t[5:].isdigit():
+                clauses.append("seed = ?"); args.append(int(t[5:]))
+            elif t[0] in "<>" and _day(t[1:]) is not None:
+                clauses.append("created >= ?" if t[0] == ">" else "created < ?"); args.append(_day(t[1:]))
+            else:
+                clauses.append("workflow LIKE ? ESCAPE '\\'")
+                args.append("%" + t.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), args
+
+    def _row(self, r) -> Dict[str, Any]:
+        entry = dict(r)
+        entry["timings"] = json.loads(entry["timings"]) if entry["timings"] else {}
+        if entry.get("thumb"):
+            entry["thumb"] = os.path.join(self.root, entry["thumb"])
+        return entry
+
+def _terms(query: str) -> List[str]:
+    """Shell-style split of a search query (quotes group words, backslashes are literal); plain split if a quote is unbalanced."""
+    lex = shlex.shlex(query, posix=True)
+    lex.whitespace_split, lex.escape, lex.commenters = True, "", ""
+    try:
+        return [t for t in lex if t]
+    except ValueError:
+        return query.split()
+
+def _day(text: str) -> float | None:
+    try:
+        return time.mktime(time.strptime(text, "%Y-%m-%d"))
+    except ValueError:
+        return None
+
+def _size(path: str) -> int | None:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
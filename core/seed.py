@@ -1,6 +1,8 @@
 
 import secrets
 
+SEED_KEYS = ("seed", "noise_seed")
+
 def random_u32() -> int:
     return secrets.randbits(32)
 
@@ -8,7 +10,7 @@ def set_seed_on_all_nodes(graph: dict, seed: int) -> int:
     count = 0
     for node in graph.values():
         inputs = node.get("inputs", {})
-        for key in ("seed", "noise_seed"):
+        for key in SEED_KEYS:
             if key in inputs:
                 inputs[key] = int(seed)
                 count += 1
@@ -1,6 +1,7 @@
 
 import re
 from typing import List, Dict, Any, Optional
+from core.seed import SEED_KEYS
 
 # %%NAME%%, %%NAME:ml%%, %%NAME:int%%, %%NAME:float%%, %%NAME:choice[a,b]%% (choice reserved for future)
 TOKEN_RE = re.compile(r"%%([A-Za-z0-9_]+)(?::([A-Za-z0-9_]+)(?:\[[^%]*\])?)?%%")
@@ -35,10 +36,8 @@ def apply_token_values(graph: dict, values: Dict[str, Any]) -> None:
     Replace tokens in string inputs across the graph.
     Exact-match tokens get type coercion based on kind (if discovered).
     Embedded tokens always replaced as string.
+    For repeated runs of one workflow, compile_template(graph).apply() avoids the scan.
     """
-    # Build a map name->(raw token, kind). If multiple forms exist, prefer the first found.
-    specs = { spec["name"]: spec for spec in find_specs(graph) }
-
     for node in graph.values():
         inputs = node.get("inputs", {})
         for k, v in list(inputs.items()):
@@ -65,3 +64,63 @@ def apply_token_values(graph: dict, values: Dict[str, Any]) -> None:
                     return str(values[n])
                 return mx.group(0)  # leave unknowns untouched
             inputs[k] = TOKEN_RE.sub(_repl, v)
+
+class CompiledTemplate:
+    """
+    Token index built once per loaded workflow. Every string input that holds a
+    token becomes a site: exact sites (the input *is* the token) are written with
+    type coercion, embedded sites are pre-split into literal/token parts. apply()
+    then writes values straight into those inputs without any regex scanning.
+    """
+    def __init__(self, graph: dict):
+        self.specs: List[Dict[str, Any]] = find_specs(graph)
+        self.names: List[str] = [s["name"] for s in self.specs]
+        self.kinds: Dict[str, str] = {s["name"]: s["kind"] for s in self.specs}
+        # (node_id, input_key, exact_name, exact_kind, parts); parts alternate literal, (name, raw)
+        self.sites: List[tuple] = []
+        for node_id, node in graph.items():
+            inputs = node.get("inputs", {}) if isinstance(node, dict) else {}
+            for k, v in inputs.items():
+                if not isinstance(v, str) or "%%" not in v:
+                    continue
+                m = TOKEN_RE.fullmatch(v)
+                if m:
+                    self.sites.append((node_id, k, m.group(1), (m.group(2) or "str").lower(), None))
+                    continue
+                parts, pos = [], 0
+                for mx in TOKEN_RE.finditer(v):
+                    parts.append(v[pos:mx.start()])
+                    parts.append((mx.group(1), mx.group(0)))
+                    pos = mx.end()
+                if parts:
+                    parts.append(v[pos:])
+                    self.sites.append((node_id, k, None, None, parts))
+        # Nodes apply() or the seed broadcast may write to; everything else is read-only per run.
+        self.writable_nodes = {site[0] for site in self.sites} | {
+            nid for nid, node in graph.items()
+            if isinstance(node, dict) and any(key in node.get("inputs", {}) for key in SEED_KEYS)
+        }
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.kinds
+
+    def apply(self, graph: dict, values: Dict[str, Any]) -> None:
+        """Same result as apply_token_values on the graph this template was built from."""
+        for node_id, k, name, kind, parts in self.sites:
+            inputs = graph[node_id]["inputs"]
+            if parts is None:
+                if name in values:
+                    val = values[name]
+                    inputs[k] = _coerce(val, kind) if isinstance(val, str) else val
+                continue
+            out = []
+            for i, p in enumerate(parts):
+                if i % 2 == 0:
+                    out.append(p)
+                else:
+                    n, raw = p
+                    out.append(str(values[n]) if n in values else raw)
+            inputs[k] = "".join(out)
+
+def compile_template(graph: dict) -> CompiledTemplate:
+    return CompiledTemplate(graph)
@@ -0,0 +1,82 @@
+import json, math, threading, time
+from collections import deque
+from typing import Any, Callable, Dict, List, Tuple
+
+# Phases in job order (the HUD overlay lists them this way; unknown phases go last).
+PHASES = ("pending", "submit", "queue", "execute", "wait", "history", "download", "collect",
+          "decode", "run", "display", "total")
+
+class Tracer:
+    """
+    Per-job phase timings. span() records {"ts", "job", "phase", "ms", ...fields},
+    appends it as one line to the JSONL file at path (if any), keeps the last
+    window durations of each phase for percentiles(), and hands the span to every
+    hook, e.g. to forward it to a metrics system. Thread-safe; hooks run on the
+    recording thread (often a worker) and should return quickly.
+    """
+    def __init__(self, path: str | None = None, window: int = 200):
+        self.path = path
+        self.window = window
+        self.lock = threading.Lock()
+        self.hooks: List[Callable[[Dict[str, Any]], None]] = []
+        self.version = 0              # bumped on every span (cheap change check for the HUD)
+        self._recent: Dict[str, deque] = {}
+        self._file = None
+        if path:
+            try:
+                self._file = open(path, "a", encoding="utf-8")
+            except OSError as e:
+                print("Trace file unavailable, spans are kept in memory only:", e)
+
+    def add_hook(self, fn: Callable[[Dict[str, Any]], None]):
+        with self.lock:
+            self.hooks.append(fn)
+
+    def remove_hook(self, fn: Callable[[Dict[str, Any]], None]):
+        with self.lock:
+            if fn in self.hooks:
+                self.hooks.remove(fn)
+
+    def span(self, job: str, phase: str, start: float, end: float | None = None, **fields) -> Dict[str, Any]:
+        """Record phase of job from start to end (time.time() values; end defaults to now)."""
+        end = time.time() if end is None else end
+        span = {"ts": round(start, 6), "job": job, "phase": phase, "ms": round((end - start) * 1000, 3), **fields}
+        with self.lock:
+            recent = self._recent.get(phase)
+            if recent is None:
+                recent = self._recent[phase] = deque(maxlen=self.window)
+            recent.append(span["ms"])
+            self.version += 1
+            if self._file is not None:
+                self._file.write(json.dumps(span) + "\n")
+                self._file.flush()
+            hooks = list(self.hooks)
+        for fn in hooks:
+            try:
+                fn(span)
+            except Exception as e:
+                print("Trace hook failed:", e)
+        return span
+
+    def percentiles(self) -> List[Tuple[str, float, float, int]]:
+        """(phase, p50 ms, p95 ms, samples) over each phase's recent spans, in PHASES order."""
+        with self.lock:
+            recent = {phase: sorted(d) for phase, d in self._recent.items() if d}
+        order = {p: i for i, p in enumerate(PHASES)}
+        out = []
+        for phase in sorted(recent, key=lambda p: (order.get(p, len(order)), p)):
+            ms = recent[phase]
+            out.append((phase, _rank(ms, 0.50), _rank(ms, 0.95), len(ms)))
+        return out
+
+    def close(self):
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+# ---- internals ----
+
+def _rank(sorted_ms: List[float], q: float) -> float:
+    # nearest-rank percentile
+    return sorted_ms[max(0, math.ceil(q * len(sorted_ms)) - 1)]
@@ -0,0 +1,112 @@
+import os, threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, Tuple
+
+from core.tokens import CompiledTemplate, compile_template
+from core.workflow_io import load_workflow_graph
+
+class WorkflowCache:
+    """
+    Bounded LRU of parsed workflows: path -> (graph, CompiledTemplate), valid while
+    the file's mtime and size are unchanged. preload() parses on a background thread
+    so the picker can warm the highlighted entry and its neighbours; each call
+    cancels the queued preloads it no longer lists, so moving through the picker
+    never builds a backlog. load() then returns instantly, parses inline if its
+    preload had not started yet, or waits for a running one instead of parsing twice.
+    Cached graphs are shared: treat them as read-only (prepare_graph copies).
+    """
+    def __init__(self, max_entries: int = 16, workers: int = 1):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[tuple, dict, CompiledTemplate]]" = OrderedDict()
+        self._pending: Dict[str, Future] = {}
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="workflow-preload")
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, path: str) -> Tuple[dict, CompiledTemplate]:
+        """Parsed graph and token template for path (raises like load_workflow_graph)."""
+        path = os.path.abspath(path)
+        sig = _signature(path)
+        with self.lock:
+            hit = self._lookup(path, sig)
+            fut = self._pending.get(path) if hit is None else None
+        if hit is not None:
+            return hit
+        if fut is not None and fut.cancel():
+            with self.lock:
+                if self._pending.get(path) is fut:
+                    del self._pending[path]
+        elif fut is not None:
+            try:
+                fut.result()
+            except Exception:
+                pass  # parse again below so the caller gets the error
+            with self.lock:
+                hit = self._lookup(path, sig)
+            if hit is not None:
+                return hit
+        with self.lock:
+            self.misses += 1
+        return self._parse(path, sig)
+
+    def preload(self, paths: Iterable[str]):
+        """Queue paths for background parsing, dropping queued preloads of paths not listed (stale selection)."""
+        paths = list(dict.fromkeys(os.path.abspath(p) for p in paths))
+        with self.lock:
+            for p, fut in list(self._pending.items()):
+                if p not in paths and fut.cancel():
+                    del self._pending[p]
+        for p in paths:
+            try:
+                sig = _signature(p)
+            except OSError:
+                continue
+            with self.lock:
+                cached = self._entries.get(p)
+                if (cached is not None and cached[0] == sig) or p in self._pending:
+                    continue
+                self._pending[p] = self._pool.submit(self._preload_one, p, sig)
+
+    def invalidate(self, path: str | None = None):
+        with self.lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(path), None)
+
+    # ---- internals ----
+
+    def _lookup(self, path: str, sig: tuple):
+        # caller holds self.lock
+        cached = self._entries.get(path)
+        if cached is None or cached[0] != sig:
+            return None
+        self._entries.move_to_end(path)
+        self.hits += 1
+        return cached[1], cached[2]
+
+    def _parse(self, path: str, sig: tuple) -> Tuple[dict, CompiledTemplate]:
+        graph = load_workflow_graph(path)
+        template = compile_template(graph)
+        with self.lock:
+            self._entries[path] = (sig, graph, template)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return graph, template
+
+    def _preload_one(self, path: str, sig: tuple):
+        try:
+            self._parse(path, sig)
+        except Exception as e:
+            print("Workflow preload failed:", path, e)
+            raise
+        finally:
+            with self.lock:
+                self._pending.pop(path, None)
+
+def _signature(path: str) -> tuple:
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
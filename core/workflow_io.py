@@ -2,6 +2,11 @@
 import os, json
 from typing import List
 
+try:
+    import orjson  # optional, several times faster on large API graphs
+except ImportError:
+    orjson = None
+
 def ensure_dir(path: str):
     os.makedirs(path, exist_ok=True)
 
@@ -17,6 +22,11 @@ def scan_workflows(root_dir: str, exts={".json"}) -> List[str]:
     out.sort(key=str.lower)
     return out
 
+def parse_json(data: bytes):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode("utf-8"))
+
 def load_workflow_graph(path: str) -> dict:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with open(path, "rb") as f:
+        return parse_json(f.read())
@@ -1,17 +1,26 @@
 
-import os, tempfile, pygame
-from io import BytesIO
+import os, time, pygame
+from concurrent.futures import ThreadPoolExecutor
 
 from app.state import AppState
 from app.runner import Runner
-from core.workflow_io import ensure_dir, load_workflow_graph, scan_workflows
-from core.tokens import find_specs, apply_token_values
-from core.seed import random_u32, apply_seed_policy
-from core.artifacts import split_artifacts
-from ui.renderer import image_from_bytes, wrap_text
+from core.workflow_io import ensure_dir
+from core.library import WorkflowIndex
+from core.workflow_cache import WorkflowCache
+from core.tokens import compile_template
+from core.prepare import prepare_graph
+from core.artifacts import split_artifacts, artifact_head, remove_spooled
+from core.trace import Tracer
+from core.runs import RunStore
+from ui.renderer import wrap_text
+from ui.images import DecodedImage
+from ui.gallery import Gallery
+from ui.audio import AudioPlayer
+from ui.textview import TextViewer
 from ui.picker import WorkflowPicker
 from ui.form import InputsForm
-from ui.hud import draw_hud
+from ui.runs import RunBrowser
+from ui.hud import HudLayer, draw_progress, draw_timings
 
 pygame.init()
 try:
@@ -23,15 +32,34 @@ except Exception as e:
 SCREEN_W, SCREEN_H = 1280, 720
 WORKFLOW_DIR = "workflows"
 PICKER_ROWS = 18
+MAX_IN_FLIGHT = int(os.getenv("COMFY_MAX_IN_FLIGHT") or 2)
+MAX_FPS = 60
+THUMB_SIZE = 96
+MAX_FULL_IMAGES = 6  # gallery images kept decoded at full size
+PREVIEW_BOX = 256    # live preview frames are fitted to this box
+IDLE_WAIT_MS = 1000  # nothing to redraw: sleep in event.wait until input or a runner result
 
 # Keys
 RUN_KEY           = pygame.K_F5
+CANCEL_KEY        = pygame.K_F6
 PICKER_TOGGLE_KEY = pygame.K_F1
 INPUTS_FORM_KEY   = pygame.K_F2
+TIMINGS_KEY       = pygame.K_F3
+RUNS_KEY          = pygame.K_F4
 REFRESH_KEY       = pygame.K_r
+AUDIO_KEY         = pygame.K_a
+
+RESULT_EVENT = pygame.event.custom_type()  # posted by the runner thread when a job finishes
+IMAGE_READY_EVENT = pygame.event.custom_type()  # posted when a background rescale is done
+AUDIO_END_EVENT = pygame.event.custom_type()  # posted by the mixer when a clip finishes
+PROGRESS_EVENT = pygame.event.custom_type()  # posted when runner.progress has new events
+LIBRARY_EVENT = pygame.event.custom_type()  # posted when a background workflow index refresh ends
+RUNS_EVENT = pygame.event.custom_type()  # posted when a run history thumbnail is decoded
+THUMB_EVENT = pygame.event.custom_type()  # posted when a gallery thumbnail is ready
+RECALL_EVENT = pygame.event.custom_type()  # posted with a past run's artifacts, ready to show
 
 # Setup
-screen = pygame.display.set_mode((SCREEN_W, SCREEN_H))
+screen = pygame.display.set_mode((SCREEN_W, SCREEN_H), pygame.RESIZABLE)
 pygame.display.set_caption("Pygame ↔ ComfyUI (Modular)")
 clock = pygame.time.Clock()
 font  = pygame.font.SysFont(None, 24)
@@ -39,70 +67,228 @@ font_bold = pygame.font.SysFont(None, 24, bold=True)
 font_mono = pygame.font.SysFont("monospace", 20)
 
 state = AppState()
-runner = Runner()
-picker = WorkflowPicker(WORKFLOW_DIR, rows=PICKER_ROWS, font=font, font_bold=font_bold)
-form   = InputsForm(font=font, font_bold=font_bold, font_mono=font_mono, rows=12)
+def predecode(arts: list[dict]):
+    """
+    Runner worker thread: fit the first image to the window (and thumbnail it from
+    that decode), so the UI thread only wraps pixels. The other images are not
+    decoded here; the gallery thumbnails them as its strip scrolls into view.
+    """
+    w, h = screen.get_size()
+    for a in arts:
+        if a.get("kind") != "image":
+            continue
+        img = a["decoded"] = DecodedImage(a.get("path"), a.get("bytes"))
+        if img.prepare(w, h):
+            img.make_thumb(THUMB_SIZE)
+            break
+
+def decode_preview(event: dict):
+    """Runner worker thread: decode a live preview frame and fit it to PREVIEW_BOX."""
+    img = DecodedImage(data=event.pop("data"))
+    if img.prepare(PREVIEW_BOX, PREVIEW_BOX):
+        event["image"] = img
 
+tracer = Tracer(os.getenv("COMFY_TRACE") or None)  # COMFY_TRACE=trace.jsonl appends every span there
+try:
+    store = RunStore()  # run history in COMFY_RUN_DIR (default ~/.cache/pg_comfy/runs), capped at COMFY_RUN_MAX_BYTES
+except Exception as e:
+    print("Run history disabled:", e)
+    store = None
+runner = Runner(max_in_flight=MAX_IN_FLIGHT, post_process=predecode, preview_decoder=decode_preview,
+                on_result=lambda: pygame.event.post(pygame.event.Event(RESULT_EVENT)),
+                on_progress=lambda: pygame.event.post(pygame.event.Event(PROGRESS_EVENT)), tracer=tracer, store=store)
+decode_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="decode")
+hud    = HudLayer()
+gallery = Gallery(thumb=THUMB_SIZE, max_full=MAX_FULL_IMAGES, font=font, pool=decode_pool,
+                  on_thumb=lambda: pygame.event.post(pygame.event.Event(THUMB_EVENT)))
+player = AudioPlayer(AUDIO_END_EVENT)
+viewer = TextViewer(font=font_mono, font_bold=font_bold)
 ensure_dir(WORKFLOW_DIR)
+workflows = WorkflowCache()  # parsed graphs + templates, preloaded around the picker selection
+library = WorkflowIndex(WORKFLOW_DIR, on_change=lambda paths: [workflows.invalidate(p) for p in paths])
+picker = WorkflowPicker(WORKFLOW_DIR, rows=PICKER_ROWS, font=font, font_bold=font_bold, library=library,
+                        on_refresh=lambda: pygame.event.post(pygame.event.Event(LIBRARY_EVENT)), cache=workflows)
+form   = InputsForm(font=font, font_bold=font_bold, font_mono=font_mono, rows=12)
+browser = RunBrowser(store, font=font, font_bold=font_bold, pool=decode_pool,
+                     on_thumb=lambda: pygame.event.post(pygame.event.Event(RUNS_EVENT))) if store else None
+picker.refresh()  # warm the index while the window comes up
+
+def set_current_workflow(rel, graph, template=None):
+    state.current_graph = graph
+    state.current_graph_path = rel
+    # token index compiled once per load; HUD, form and runs all read from it
+    if template is None and graph is not None:
+        template = compile_template(graph)
+    state.current_template = template
+
+def refit_current_image(sync=False):
+    """Fit the selected gallery image to the window; new images/sizes are scaled on decode_pool."""
+    img = gallery.current
+    if img is None or img.failed:
+        return
+    gallery.touch(gallery.index)
+    w, h = screen.get_size()
+    surf = img.surface(w, h)
+    if surf is None and sync and img.prepare(w, h):
+        surf = img.surface(w, h)
+    if surf is not None:
+        state.current_image, state.current_image_surface = img, surf
+        return
+    def work():
+        if gallery.current is img:  # skip selections already browsed past
+            img.prepare(w, h)
+            pygame.event.post(pygame.event.Event(IMAGE_READY_EVENT))
+    decode_pool.submit(work)
+
+def node_label(job_id: str, node) -> str:
+    job = runner.jobs.get(job_id)
+    spec = (job.graph or {}).get(str(node)) if job else None
+    return f"{spec.get('class_type', 'node')} #{node}" if isinstance(spec, dict) else f"node {node}"
+
+def apply_progress(job_id: str, event: dict):
+    p = state.progress
+    if p.get("job_id") != job_id:  # the newest reporting job takes over the panel
+        p.clear()
+        p["job_id"] = job_id
+        state.preview_surface = None
+    node = event.get("node")
+    if event["type"] in ("executing", "progress") and node is not None and node != p.get("node"):
+        p.update(node=node, label=f"{job_id}: {node_label(job_id, node)}", value=None, max=None)
+    if event["type"] == "progress":
+        p["value"], p["max"] = event.get("value"), event.get("max")
+    elif event["type"] == "preview" and event.get("image") is not None:
+        state.preview_surface = event["image"].surface(PREVIEW_BOX, PREVIEW_BOX)
+
+def clear_progress(job_id: str) -> bool:
+    """Drop job_id's progress panel; True if one was shown (the area it covered needs a full redraw)."""
+    if state.progress.get("job_id") == job_id:
+        state.progress = {}
+        state.preview_surface = None
+        return True
+    return False
 
 def reset_visual_state():
     state.current_image_surface = None
+    state.current_image = None
+    gallery.clear()
     state.overlay_text_lines = []
-    if state.current_audio_tempfile and os.path.exists(state.current_audio_tempfile):
-        try: os.remove(state.current_audio_tempfile)
-        except Exception: pass
-    state.current_audio_tempfile = None
+    viewer.clear()
+    player.stop()
+    remove_spooled(state.spooled_paths)
+    state.spooled_paths = []
     state.saved_video_paths = []
 
 def process_artifacts_into_state(arts: list[dict]):
     imgs, txts, auds, vids, _ = split_artifacts(arts)
-    # image (first)
-    for a in imgs:
-        surf = image_from_bytes(a["bytes"], SCREEN_W, SCREEN_H)
-        if surf is not None:
-            state.current_image_surface = surf
-            break
-    # text overlay
+    # spooled files are already on disk; keep videos and files moved into the run store, drop the rest on the next reset
+    state.spooled_paths = [a["path"] for a in arts if a.get("path") and a["kind"] != "video" and "run" not in a]
+    # images: the first full-size fit normally comes from predecode on the worker; thumbnails are made as they are shown
+    gallery.set_images([a.get("decoded") or DecodedImage(a.get("path"), a.get("bytes")) for a in imgs])
+    while gallery.current is not None and gallery.current.failed and gallery.index < len(gallery.items) - 1:
+        gallery.index += 1
+    refit_current_image(sync=True)
+    # text: a short excerpt in the HUD (only the head of each file is read); T opens the viewer
     if txts:
-        joined = "\n\n".join([f"[{a['filename']}]\n" + a["bytes"].decode("utf-8", "replace") for a in txts])
+        viewer.set_artifacts(txts)
+        joined = "\n\n".join([f"[{a['filename']}]\n" + artifact_head(a, 801) for a in txts])
         excerpt = joined[:800] + ("…" if len(joined) > 800 else "")
-        state.overlay_text_lines = wrap_text(excerpt, font, max_width=SCREEN_W - 40)
-    # audio (first)
-    for a in auds:
-        try:
-            fd, path = tempfile.mkstemp(suffix=os.path.splitext(a["filename"])[1])
-            os.close(fd)
-            with open(path, "wb") as f:
-                f.write(a["bytes"])
-            state.current_audio_tempfile = path
-            try:
-                snd = pygame.mixer.Sound(state.current_audio_tempfile)
-                snd.play()
-            except Exception as e:
-                print("Audio saved but could not be played by mixer:", e, "->", state.current_audio_tempfile)
-        except Exception as e:
-            print("Failed handling audio:", e)
-        break
-    # videos
+        state.overlay_text_lines = ["(T: full text)"] + wrap_text(excerpt, font, max_width=screen.get_width() - 40)
+    # audio: every clip, back to back, played from the spool/inline bytes
+    player.play_all(auds)
+    # videos (already streamed to disk)
     for a in vids:
+        if a.get("path"):
+            state.saved_video_paths.append(a["path"])
+
+def recall_run(run_id: int, restore: bool):
+    """Show a past run's outputs (decoded on decode_pool); with restore, also load its workflow and token values."""
+    run = store.get(run_id)
+    if run is None:
+        return f"run #{run_id} is gone"
+    msg = f"run #{run_id}"
+    if restore and run["workflow"]:
         try:
-            fd, path = tempfile.mkstemp(suffix=os.path.splitext(a["filename"])[1])
-            os.close(fd)
-            with open(path, "wb") as f:
-                f.write(a["bytes"])
-            state.saved_video_paths.append(path)
+            set_current_workflow(run["workflow"], *workflows.load(os.path.join(WORKFLOW_DIR, run["workflow"])))
+            form.values.update(run["tokens"])
+            form.open_form(state.current_template)
+            form.close()
+            msg += f": loaded {run['workflow']} with its token values"
         except Exception as e:
-            print("Failed saving video:", e)
+            msg += f": workflow not loaded ({e})"
+    def work():
+        predecode(run["artifacts"])
+        pygame.event.post(pygame.event.Event(RECALL_EVENT, run=run, msg=msg))
+    decode_pool.submit(work)
+    return f"recalling run #{run_id}…"
+
+def draw_frame():
+    screen.fill((12, 12, 16))
+
+    if state.current_image_surface:
+        rect = state.current_image_surface.get_rect(center=screen.get_rect().center)
+        screen.blit(state.current_image_surface, rect)
+
+    hud.blit(screen)
+    gallery.draw(screen)
+    top = 16
+    if state.progress:
+        top = draw_progress(screen, font, state.progress, state.preview_surface).bottom + 8
+    if state.show_timings:
+        draw_timings(screen, font_mono, tracer.percentiles(), top)
+
+    # overlays
+    viewer.draw(screen)
+    if picker.open: picker.draw(screen)
+    if form.open:   form.draw(screen)
+    if browser is not None and browser.open: browser.draw(screen)
 
 running = True
 reset_visual_state()
+# Invalidation-driven rendering: frames are drawn only when dirty; full_redraw means
+# the whole window changed, otherwise only the HUD region is redrawn and updated.
+dirty, full_redraw = True, True
+last_hud_rect = None
+shown = None  # (job_id, created, finished) of a result whose first frame is not on screen yet
 
 while running:
-    for event in pygame.event.get():
+    events = pygame.event.get()
+    if not events and not dirty:
+        event = pygame.event.wait(IDLE_WAIT_MS)
+        events = ([event] if event.type != pygame.NOEVENT else []) + pygame.event.get()
+
+    for event in events:
         if event.type == pygame.QUIT:
             running = False; break
 
+        if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED):
+            dirty = full_redraw = True
+
+        if event.type == LIBRARY_EVENT and picker.open:
+            picker.sync()
+            dirty = full_redraw = True
+
+        if event.type == AUDIO_END_EVENT:
+            player.on_end()
+
+        if event.type == RUNS_EVENT and browser.open:
+            dirty = full_redraw = True
+
+        if event.type == THUMB_EVENT and gallery.open:
+            dirty = full_redraw = True
+
+        if event.type == RECALL_EVENT:
+            reset_visual_state()
+            process_artifacts_into_state(event.run["artifacts"])
+            state.last_seed = event.run["seed"]
+            state.status = event.msg + (" (no artifacts)" if not event.run["artifacts"] else "")
+            dirty = full_redraw = True
+
+        if event.type in (pygame.WINDOWSIZECHANGED, IMAGE_READY_EVENT):
+            refit_current_image()
+            dirty = full_redraw = True
+
         if event.type == pygame.KEYDOWN:
+            dirty = full_redraw = True
             mods = pygame.key.get_mods()
 
             # Inputs form has priority when open
@@ -121,93 +307,179 @@ while running:
                             rel = picker.items[picker.index]
                             path = os.path.join(WORKFLOW_DIR, rel)
                             try:
-                                state.current_graph = load_workflow_graph(path)
-                                state.current_graph_path = rel
+                                set_current_workflow(rel, *workflows.load(path))
                                 state.status = f"loaded: {rel}"
                                 # update form tokens
-                                form.open_form(state.current_graph)
+                                form.open_form(state.current_template)
                                 form.close()  # don't show by default
                             except Exception as e:
-                                state.current_graph = None
-                                state.current_graph_path = None
+                                set_current_workflow(None, None)
                                 state.status = f"load failed: {e}"
                         picker.close()
                     elif msg:
                         state.status = msg
                     continue
 
+            # Run history when open
+            if browser is not None and browser.open:
+                consumed, msg = browser.handle_key(event, mods, state.current_graph_path)
+                if consumed:
+                    if msg in ("select", "restore"):
+                        state.status = recall_run(browser.current["id"], msg == "restore")
+                        browser.close()
+                    elif msg:
+                        state.status = msg
+                    continue
+
+            # Text viewer (T toggles, scrolls while shown)
+            consumed, msg = viewer.handle_key(event)
+            if consumed:
+                if msg: state.status = msg
+                continue
+
+            # Gallery (G toggles, arrows browse while shown)
+            consumed, msg = gallery.handle_key(event)
+            if consumed:
+                if msg == "select":
+                    refit_current_image()
+                    state.status = f"image {gallery.index + 1}/{len(gallery.items)}"
+                elif msg:
+                    state.status = msg
+                continue
+
             # Commands
             if event.key == PICKER_TOGGLE_KEY:
                 state.status = picker.open_picker()
 
+            elif event.key == RUNS_KEY:
+                state.status = browser.open_browser() if browser is not None else "run history unavailable"
+
+            elif event.key == TIMINGS_KEY:
+                state.show_timings = not state.show_timings
+                state.status = "timings " + ("shown" if state.show_timings else "hidden")
+
             elif event.key == INPUTS_FORM_KEY:
                 if state.current_graph:
-                    state.status = form.open_form(state.current_graph)
+                    state.status = form.open_form(state.current_template)
                 else:
                     state.status = "load a workflow first (F1)"
 
-            elif event.key == RUN_KEY and not state.busy:
+            elif event.key == AUDIO_KEY:
+                # A skips to the next audio clip of the result, Shift+A stops playback
+                if mods & pygame.KMOD_SHIFT:
+                    player.stop()
+                    state.status = "audio stopped"
+                else:
+                    a = player.next()
+                    state.status = f"playing {a['filename']}" if a else "no more audio"
+
+            elif event.key == CANCEL_KEY:
+                # F6 cancels the newest queued/running job, Shift+F6 cancels all of them
+                active = runner.active()
+                if not active:
+                    state.status = "nothing to cancel"
+                elif mods & pygame.KMOD_SHIFT:
+                    state.status = f"cancelling {runner.cancel_all()} job(s)"
+                else:
+                    runner.cancel(active[-1].id)
+                    state.status = f"cancelling {active[-1].id}"
+
+            elif event.key == RUN_KEY:
                 if not state.current_graph and not state.current_graph_path:
-                    items = scan_workflows(WORKFLOW_DIR)
+                    if not library.items:
+                        library.refresh()
+                    items = library.items
                     if items:
                         rel = items[0]
-                        state.current_graph = load_workflow_graph(os.path.join(WORKFLOW_DIR, rel))
-                        state.current_graph_path = rel
+                        set_current_workflow(rel, *workflows.load(os.path.join(WORKFLOW_DIR, rel)))
                     else:
                         state.status = f"no workflows in '{WORKFLOW_DIR}' (press F1 to pick)"
                         continue
 
-                import copy
-                g = copy.deepcopy(state.current_graph or {})
-                reset_visual_state()
-                state.busy = True
+                # token values + seed policy on a copy of the loaded graph
+                g, state.last_seed = prepare_graph(state.current_graph or {}, form.values, state.current_template)
 
-                # 1) apply token values
-                apply_token_values(g, form.values)
+                # kept with the run in the history; SEED holds the seed actually used
+                names = state.current_template.names if state.current_template else []
+                tokens = {n: str(form.values.get(n, "")) for n in names}
+                if "SEED" in tokens:
+                    tokens["SEED"] = str(state.last_seed)
+                meta = {"workflow": state.current_graph_path, "tokens": tokens, "seed": state.last_seed}
 
-                # 2) seed policy
-                tokens_present = {spec["name"] for spec in (find_specs(g) or [])}
-                chosen_seed = apply_seed_policy(g, tokens_present, form.values.get("SEED"))
-                state.last_seed = chosen_seed
+                # Shift+F5 bypasses run memoization (when enabled); Ctrl+F5 jumps ahead of queued jobs
+                job_id = runner.run_async(g, poll_interval=0.5, max_wait=600,
+                                          use_memo=not (mods & pygame.KMOD_SHIFT),
+                                          priority=1 if mods & pygame.KMOD_CTRL else 0, meta=meta)
+                state.busy = True
+                state.status = f"{job_id} queued (seed {state.last_seed}), {len(runner.active())} in flight"
 
-                state.status = f"running… (seed {state.last_seed})"
-                runner.run_async(g, poll_interval=0.5, max_wait=600)
+    # Live progress (drained before results so a finished job's panel isn't revived)
+    for job_id, event in runner.progress.drain():
+        apply_progress(job_id, event)
+        dirty = full_redraw = True
 
     # Drain results
     try:
         while True:
-            arts = runner.q.get_nowait()
-            process_artifacts_into_state(arts)
-            state.busy = False
-            if not arts:
-                state.status = "done (no artifacts)"
+            job_id, arts = runner.q.get_nowait()
+            dirty = True
+            job = runner.take(job_id)
+            if clear_progress(job_id):
+                full_redraw = True
+            state.busy = bool(runner.active())
+            pending = f", {len(runner.active())} in flight" if state.busy else ""
+            if browser is not None and browser.open:
+                browser.sync()
+                full_redraw = True
+            if job is None or job.status == "done":
+                reset_visual_state()
+                process_artifacts_into_state(arts)
+                full_redraw = True
+                if job is not None:
+                    shown = (job_id, job.created, job.finished)
+                note = (job.completion or {}).get("memo") if job is not None else None
+                state.status = f"{job_id} done" + (" (no artifacts)" if not arts else "") + (f" ({note})" if note else "") + pending
+            elif job.status == "cancelled":
+                state.status = f"{job_id} cancelled" + pending
             else:
-                state.status = "done"
+                state.status = f"{job_id} failed: {job.error}" + pending
     except Exception:
         pass
 
-    # ---- Draw ----
-    screen.fill((12, 12, 16))
+    # ---- Draw (only when something changed) ----
+    if not dirty:
+        continue
 
-    if state.current_image_surface:
-        rect = state.current_image_surface.get_rect(center=screen.get_rect().center)
-        screen.blit(state.current_image_surface, rect)
-
-    draw_hud(
-        screen, font,
+    hud_rect = hud.prepare(
+        font,
         status=state.status,
         current_graph_path=state.current_graph_path,
-        form_tokens=[f["name"] for f in (find_specs(state.current_graph or {}) or [])],
+        form_tokens=state.current_template.names if state.current_template else [],
         last_seed=state.last_seed,
         saved_video_paths=state.saved_video_paths,
         overlay_text_lines=state.overlay_text_lines,
     )
+    if full_redraw or last_hud_rect is None or picker.open or form.open or (browser is not None and browser.open):
+        draw_frame()
+        pygame.display.flip()
+    else:
+        # Only the HUD changed: redraw and push the area it covered before and now.
+        region = hud_rect.union(last_hud_rect)
+        screen.set_clip(region)
+        draw_frame()
+        screen.set_clip(None)
+        pygame.display.update(region)
+    last_hud_rect = hud_rect
+    dirty = full_redraw = False
+    if shown is not None:
+        now = time.time()
+        tracer.span(shown[0], "display", shown[2], now)
+        tracer.span(shown[0], "total", shown[1], now)
+        shown = None
+        dirty = full_redraw = state.show_timings  # one more frame for the new percentiles
+    clock.tick(MAX_FPS)
 
-    # overlays
-    if picker.open: picker.draw(screen)
-    if form.open:   form.draw(screen)
-
-    pygame.display.flip()
-    clock.tick(60)
-
+tracer.close()
+if store is not None:
+    store.close()
 pygame.quit()
@@ -0,0 +1,23 @@
+import os, sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.fake_comfy import serve
+
+GRAPH = {"1": {"class_type": "SaveImage", "inputs": {"filename_prefix": "t"}}}
+
+@pytest.fixture
+def fake():
+    """(base_url, FakeComfy) of a fake server running 0.3 s jobs."""
+    httpd, comfy = serve(delay=0.3)
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", comfy
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.fixture
+def client_kwargs(tmp_path):
+    """ComfyClient arguments isolated under tmp_path, with the cache and memo off."""
+    return {"spool_dir": str(tmp_path / "spool"), "cache_dir": str(tmp_path / "cache"),
+            "cache_max_bytes": 0, "memo_entries": 0}
@@ -0,0 +1,58 @@
+import hashlib
+
+from core.artifact_cache import ArtifactCache
+
+def _file(tmp_path, name, data):
+    p = tmp_path / name
+    p.write_bytes(data)
+    return str(p), hashlib.sha256(data).hexdigest()
+
+def test_lru_eviction(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "c"), max_bytes=250)
+    keys = [(f"{i}.png", "", "output") for i in range(3)]
+    for i, key in enumerate(keys[:2]):
+        cache.store(key, *_file(tmp_path, f"f{i}", bytes([i]) * 100))
+    assert cache.materialize(keys[0], str(tmp_path / "out0"))  # 0 is now the most recently used
+    cache.store(keys[2], *_file(tmp_path, "f2", b"\x02" * 100))
+    assert cache.lookup(keys[1]) is None
+    assert cache.lookup(keys[0]) and cache.lookup(keys[2])
+    assert cache.stats()["bytes"] == 200
+
+def test_identical_payloads_share_a_blob(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "c"))
+    cache.store(("a.txt", "", "output"), *_file(tmp_path, "a", b"same"))
+    cache.store(("b.txt", "", "output"), *_file(tmp_path, "b", b"same"))
+    assert cache.stats()["blobs"] == 1 and cache.stats()["keys"] == 2
+
+def test_keys_are_namespaced_by_origin(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "c"))
+    key = ("a.png", "", "output")
+    cache.store(key, *_file(tmp_path, "a", b"x"), etag='"1"', origin="http://gpu1")
+    assert cache.lookup(key, "http://gpu2") is None
+    assert cache.lookup(key, "http://gpu1")["etag"] == '"1"'
+
+def test_index_survives_restart_and_smaller_budget(tmp_path):
+    root = str(tmp_path / "c")
+    cache = ArtifactCache(root)
+    for i in range(3):
+        cache.store((f"{i}.png", "", "output"), *_file(tmp_path, f"f{i}", bytes([i]) * 100), last_modified=f"day {i}")
+    cache.flush()
+    assert ArtifactCache(root).lookup(("0.png", "", "output"))["last_modified"] == "day 0"
+    smaller = ArtifactCache(root, max_bytes=150)
+    assert smaller.stats()["blobs"] == 1
+    assert smaller.lookup(("2.png", "", "output")) is not None
+
+def test_exported_files_do_not_share_the_blob(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "c"))
+    key = ("a.png", "", "output")
+    src, digest = _file(tmp_path, "a", b"original")
+    cache.store(key, src, digest)
+    out = str(tmp_path / "out")
+    assert cache.materialize(key, out)
+    for path in (src, out):  # edited in place after export
+        with open(path, "r+b") as f:
+            f.write(b"EDITED")
+    dest = str(tmp_path / "again")
+    assert cache.materialize(key, dest)
+    with open(dest, "rb") as f:
+        assert f.read() == b"original"
@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+from core.backends import BackendPool
+from tests.conftest import GRAPH
+from tools.fake_comfy import serve
+
+def _checked(pool, backends=None):
+    """Wait for the monitor's first check, so it doesn't overwrite loads set by the test."""
+    deadline = time.time() + 5
+    while not all(b.checked_at for b in backends or pool.backends) and time.time() < deadline:
+        time.sleep(0.01)
+
+def _close(pool):
+    pool.close()
+    for b in pool.backends:
+        b.client.close()
+
+def test_timeouts_keep_backends_in_the_pool(client_kwargs):
+    servers = [serve(delay=1.0) for _ in range(2)]
+    urls = [f"http://127.0.0.1:{httpd.server_address[1]}" for httpd, _ in servers]
+    pool = BackendPool(urls, check_interval=60, **client_kwargs)
+    try:
+        for _ in range(2):
+            with pytest.raises(TimeoutError):
+                pool.run_workflow(GRAPH, max_wait=0.2)
+        assert all(b["healthy"] for b in pool.status())
+        assert len(pool.run_workflow(GRAPH, max_wait=10)["artifacts"]) == 1
+    finally:
+        _close(pool)
+        for httpd, _ in servers:
+            httpd.shutdown()
+            httpd.server_close()
+
+def test_unreachable_backend_fails_over(fake, client_kwargs):
+    url, comfy = fake
+    pool = BackendPool(["http://127.0.0.1:1", url], check_interval=60, max_failures=99, **client_kwargs)
+    try:
+        _checked(pool, pool.backends[1:])
+        pool.backends[1].queue_depth = 5  # make the dead server the least loaded
+        result = pool.run_workflow(GRAPH, max_wait=10)
+        assert result["base_url"] == url
+        assert [b["healthy"] for b in pool.status()] == [False, True]
+    finally:
+        _close(pool)
+
+def test_picks_least_loaded(fake, client_kwargs):
+    url, _ = fake
+    other, _ = serve(delay=0.1)
+    pool = BackendPool([url, f"http://127.0.0.1:{other.server_address[1]}"], check_interval=60, **client_kwargs)
+    try:
+        _checked(pool)
+        pool.backends[0].queue_depth, pool.backends[1].queue_depth = 3, 1
+        assert [pool.pick() for _ in range(3)] == [pool.backends[1]] * 2 + [pool.backends[0]]  # then 3 vs 1+2: tie
+    finally:
+        _close(pool)
+        other.shutdown()
+        other.server_close()
@@ -0,0 +1,29 @@
+import json
+
+import batch
+
+def test_failed_save_marks_only_its_row(fake, tmp_path, monkeypatch, capsys):
+    url, comfy = fake
+    comfy.delay = 0.05
+    monkeypatch.setenv("COMFY_BASE_URL", url)
+    monkeypatch.delenv("COMFY_BASE_URLS", raising=False)
+    monkeypatch.setenv("COMFY_CACHE_MAX_BYTES", "0")
+    monkeypatch.setenv("COMFY_MEMO_ENTRIES", "0")
+    wf = tmp_path / "wf.json"
+    wf.write_text(json.dumps({"9": {"class_type": "SaveImage", "inputs": {"filename_prefix": "%%NAME%%"}}}))
+    real = batch.save_artifacts
+
+    def save(arts, dest):
+        if dest.endswith("row-00001"):
+            raise OSError("disk full")
+        return real(arts, dest)
+
+    monkeypatch.setattr(batch, "save_artifacts", save)
+    out = tmp_path / "out"
+    rc = batch.main([str(wf), "--grid", "NAME=a,b,c", "--grid", "OTHER=1", "--jobs", "1", "--out", str(out)])
+    assert rc == 1
+    rows = {r["row"]: r for r in map(json.loads, (out / "manifest.jsonl").read_text().splitlines())}
+    assert [rows[i]["status"] for i in range(3)] == ["done", "failed", "done"]
+    assert "disk full" in rows[1]["error"]
+    assert len(rows[2]["artifacts"]) == 1
+    assert "unknown tokens for this workflow (ignored): OTHER" in capsys.readouterr().err
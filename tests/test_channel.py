@@ -0,0 +1,28 @@
+import threading
+
+from app.channel import DropOldestChannel
+
+def test_drops_oldest_when_full():
+    ch = DropOldestChannel(maxlen=3)
+    for i in range(5):
+        ch.put(i)
+    assert ch.dropped == 2
+    assert ch.drain() == [2, 3, 4]
+    assert len(ch) == 0 and ch.drain() == []
+
+def test_put_reports_when_the_consumer_needs_waking():
+    ch = DropOldestChannel(maxlen=3)
+    assert ch.put("a") is True
+    assert ch.put("b") is False
+    ch.drain()
+    assert ch.put("c") is True
+
+def test_concurrent_producers_never_exceed_maxlen():
+    ch = DropOldestChannel(maxlen=8)
+    threads = [threading.Thread(target=lambda: [ch.put(i) for i in range(1000)]) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(ch.drain()) == 8
+    assert ch.dropped == 4000 - 8
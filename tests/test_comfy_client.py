@@ -0,0 +1,190 @@
+import asyncio, os, threading
+
+import aiohttp
+import pytest
+
+from core.comfy_client import AsyncComfyClient, ComfyClient, JobCancelled, _unchanged
+from tests.conftest import GRAPH
+
+def test_websocket_completion(fake, client_kwargs):
+    url, comfy = fake
+    client = ComfyClient(url, **client_kwargs)
+    result = client.run_workflow(GRAPH, poll_interval=0.05, max_wait=10)
+    assert result["completion"]["mode"] == "websocket"
+    assert result["completion"]["polls_avoided"] >= 1
+    [art] = result["artifacts"]
+    assert art["kind"] == "image" and os.path.getsize(art["path"]) > 0
+    assert comfy.requests["GET /queue"] == 0  # completion came from the socket, not polling
+    assert comfy.requests["GET /history/{id}"] == 1
+    client.close()
+
+def test_prompts_share_one_socket(fake, client_kwargs):
+    url, comfy = fake
+    client = ComfyClient(url, **client_kwargs)
+    first = client.run_workflow(GRAPH, max_wait=10)
+    second = client.run_workflow({"2": GRAPH["1"]}, max_wait=10)
+    assert first["prompt_id"] != second["prompt_id"]
+    assert [r["completion"]["mode"] for r in (first, second)] == ["websocket", "websocket"]
+    assert sum(len(c) for c in comfy.sockets.values()) == 1
+    client.close()
+
+def test_poll_completion(fake, client_kwargs):
+    url, _ = fake
+    client = ComfyClient(url, use_websocket=False, **client_kwargs)
+    result = client.run_workflow(GRAPH, poll_interval=0.05, max_wait=10)
+    assert result["completion"]["mode"] == "poll"
+    [art] = result["artifacts"]
+    assert art["kind"] == "image" and os.path.getsize(art["path"]) > 0
+    client.close()
+
+def test_shared_poller_survives_failed_round(fake, client_kwargs):
+    url, _ = fake
+
+    async def main():
+        client = AsyncComfyClient(url, use_websocket=False, **client_kwargs)
+        real, calls = client.get_json, []
+
+        async def flaky(path, timeout=None):
+            calls.append(path)
+            if len(calls) == 2:
+                raise ConnectionResetError("transient")
+            return await real(path, timeout)
+
+        client.get_json = flaky
+        try:
+            return await asyncio.gather(*(client.run_workflow(GRAPH, poll_interval=0.05, max_wait=20)
+                                          for _ in range(3)))
+        finally:
+            await client.close()
+
+    results = asyncio.run(main())
+    assert [len(r["artifacts"]) for r in results] == [1, 1, 1]
+
+def test_close_stops_the_socket_reader(fake, client_kwargs):
+    url, _ = fake
+    client = ComfyClient(url, **client_kwargs)
+    client.run_workflow(GRAPH, max_wait=10)
+    task = client.aclient._ws_task
+    assert task is not None and not task.done()
+    client.close()
+    assert task.done() and client.aclient._ws_task is None
+
+def test_cache_revalidates_by_etag(fake, client_kwargs):
+    url, comfy = fake
+    client = ComfyClient(url, **dict(client_kwargs, cache_max_bytes=1 << 20))
+    outputs = client.run_workflow(GRAPH, max_wait=10)["outputs"]
+    key = next(iter(comfy.files))
+
+    [art] = client.collect_artifacts(outputs)
+    assert client.cache.stats()["hits"] == 1  # 304 for the file just downloaded
+
+    old = comfy.files[key]
+    comfy.files[key] = bytes(b ^ 0xFF for b in old)  # overwritten in place, same size
+    [art] = client.collect_artifacts(outputs)
+    with open(art["path"], "rb") as f:
+        assert f.read() == comfy.files[key]
+    assert client.cache.stats()["hits"] == 1
+    client.close()
+
+def test_unchanged_needs_a_matching_validator():
+    cached = {"size": 10, "etag": None, "last_modified": None}
+    assert not _unchanged(cached, {"Content-Length": "10"})
+    cached["last_modified"] = "Thu, 15 Oct 2026 10:00:00 GMT"
+    assert _unchanged(cached, {"Last-Modified": "Thu, 15 Oct 2026 10:00:00 GMT"})
+    assert not _unchanged(cached, {"Last-Modified": "Fri, 16 Oct 2026 10:00:00 GMT"})
+    cached["etag"] = '"a"'
+    assert _unchanged(cached, {"ETag": '"a"'})
+    assert not _unchanged(cached, {"ETag": '"b"', "Last-Modified": "Thu, 15 Oct 2026 10:00:00 GMT"})
+
+@pytest.mark.parametrize("use_websocket", [True, False])
+def test_external_interrupt_fails_and_is_not_memoized(fake, client_kwargs, use_websocket):
+    url, comfy = fake
+    comfy.delay = 1.0
+    client = ComfyClient(url, use_websocket=use_websocket, **dict(client_kwargs, memo_entries=8))
+    timer = threading.Timer(0.3, comfy.interrupt)
+    timer.start()
+    with pytest.raises(JobCancelled):
+        client.run_workflow(GRAPH, poll_interval=0.05, max_wait=10)
+    timer.join()
+    comfy.delay = 0.1
+    result = client.run_workflow(GRAPH, poll_interval=0.05, max_wait=10)
+    assert result["completion"]["mode"] != "memo"
+    assert len(result["artifacts"]) == 1
+    assert comfy.requests["POST /prompt"] == 2
+    client.close()
+
+def test_memo_hit_is_served_from_the_cache(fake, client_kwargs):
+    url, comfy = fake
+    client = ComfyClient(url, **dict(client_kwargs, memo_entries=8, cache_max_bytes=1 << 20))
+    first = client.run_workflow(GRAPH, max_wait=10)
+    views = comfy.requests["GET /view"]
+    again = client.run_workflow(GRAPH, max_wait=10)
+    assert again["completion"]["mode"] == "memo"
+    assert again["prompt_id"] == first["prompt_id"]
+    [art] = again["artifacts"]
+    with open(art["path"], "rb") as f:
+        assert f.read() == comfy.files[(art["filename"], "", "output")]
+    assert comfy.requests["POST /prompt"] == 1
+    assert comfy.requests["GET /view"] == views  # no server round trip
+    fresh = client.run_workflow(GRAPH, max_wait=10, use_memo=False)
+    assert fresh["completion"]["mode"] == "websocket"
+    assert comfy.requests["POST /prompt"] == 2
+    client.close()
+
+def test_memo_entry_survives_a_transport_error(fake, client_kwargs):
+    url, comfy = fake
+    client = ComfyClient(url, **dict(client_kwargs, memo_entries=8))
+    first = client.run_workflow(GRAPH, max_wait=10)
+    real, calls = client.aclient._download_file, []
+
+    async def flaky(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise aiohttp.ServerDisconnectedError()
+        return await real(*args)
+
+    client.aclient._download_file = flaky
+    invalidated = []
+    real_invalidate = client.memo.invalidate
+    client.memo.invalidate = lambda key=None: (invalidated.append(key), real_invalidate(key))
+    rerun = client.run_workflow(GRAPH, max_wait=10)
+    assert rerun["completion"]["mode"] == "websocket"
+    assert "unavailable" in rerun["completion"]["memo"]
+    assert invalidated == []
+    again = client.run_workflow(GRAPH, max_wait=10)
+    assert again["completion"]["mode"] == "memo" and again["prompt_id"] == rerun["prompt_id"] != first["prompt_id"]
+    client.close()
+
+def test_memo_entry_dropped_when_outputs_are_gone(fake, client_kwargs):
+    url, comfy = fake
+    client = ComfyClient(url, **dict(client_kwargs, memo_entries=8))
+    first = client.run_workflow(GRAPH, max_wait=10)
+    comfy.files.clear()
+    invalidated = []
+    real = client.memo.invalidate
+    client.memo.invalidate = lambda key=None: (invalidated.append(key), real(key))
+    rerun = client.run_workflow(GRAPH, max_wait=10)
+    assert "gone" in rerun["completion"]["memo"]
+    assert invalidated and rerun["prompt_id"] != first["prompt_id"]
+    client.close()
+
+def test_cancel_removes_queued_prompt(fake, client_kwargs):
+    url, comfy = fake
+    comfy.delay = 2.0
+    client = ComfyClient(url, **client_kwargs)
+    running = threading.Event()
+
+    def occupy():  # keeps the server busy so the next prompt stays queued
+        with pytest.raises(JobCancelled):
+            client.run_workflow({"2": GRAPH["1"]}, max_wait=10, on_submit=lambda pid: running.set())
+
+    blocker = threading.Thread(target=occupy, daemon=True)
+    blocker.start()
+    running.wait(5)
+    cancel = threading.Event()
+    with pytest.raises(JobCancelled):
+        client.run_workflow(GRAPH, max_wait=10, cancel=cancel, on_submit=lambda pid: cancel.set())
+    assert comfy.queue_state()["queue_pending"] == []
+    comfy.interrupt()
+    blocker.join(5)
+    client.close()
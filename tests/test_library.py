@@ -0,0 +1,31 @@
+import json, os
+
+from core.library import WorkflowIndex
+from core.workflow_cache import WorkflowCache
+from conftest import GRAPH
+
+
+def test_changed_workflow_is_invalidated_in_the_cache(tmp_path):
+    root = tmp_path / "workflows"
+    root.mkdir()
+    path = root / "a.json"
+    path.write_text(json.dumps(GRAPH))
+    cache = WorkflowCache()
+    seen = []
+
+    def on_change(paths):
+        seen.extend(paths)
+        for p in paths:
+            cache.invalidate(p)
+
+    index = WorkflowIndex(str(root), index_path=str(tmp_path / "index.json"), watch=False, on_change=on_change)
+    index.refresh()
+    assert "2" not in cache.load(str(path))[0]
+
+    st = os.stat(path)
+    path.write_text(json.dumps({**GRAPH, "2": GRAPH["1"]}))
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    seen.clear()
+    assert index.refresh() == 1
+    assert seen == [str(path)]
+    assert "2" in cache.load(str(path))[0]
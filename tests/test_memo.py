@@ -0,0 +1,21 @@
+from core.memo import RunMemo, canonical_graph, graph_hash
+
+def test_canonical_graph_ignores_key_order_meta_and_integral_floats():
+    a = {"3": {"class_type": "KSampler", "inputs": {"cfg": 8.0, "steps": 20}, "_meta": {"title": "A"}}}
+    b = {"3": {"inputs": {"steps": 20.0, "cfg": 8}, "class_type": "KSampler", "_meta": {"title": "B"}}}
+    assert canonical_graph(a) == canonical_graph(b)
+    assert graph_hash(a) == graph_hash(b)
+
+def test_canonical_graph_keeps_real_differences():
+    a = {"3": {"inputs": {"cfg": 7.5, "links": ["4", 0]}}}
+    assert graph_hash(a) != graph_hash({"3": {"inputs": {"cfg": 7.0, "links": ["4", 0]}}})
+    assert graph_hash(a) != graph_hash({"3": {"inputs": {"cfg": 7.5, "links": ["4", 1]}}})
+    assert graph_hash({"1": {"inputs": {"v": True}}}) != graph_hash({"1": {"inputs": {"v": 1}}})
+
+def test_run_memo_is_bounded_and_persisted(tmp_path):
+    path = str(tmp_path / "memo.json")
+    memo = RunMemo(path, max_entries=2)
+    for k in "abc":
+        memo.put(k, {"prompt_id": k})
+    assert memo.get("a") is None and memo.get("c") == {"prompt_id": "c"}
+    assert list(RunMemo(path, 2).entries) == ["b", "c"]
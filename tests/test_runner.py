@@ -0,0 +1,22 @@
+import time
+
+from app.runner import Runner
+from core.comfy_client import ComfyClient
+from tests.conftest import GRAPH
+
+def test_priorities_cancellation_and_take(fake, client_kwargs):
+    url, comfy = fake
+    runner = Runner(max_in_flight=1, client=ComfyClient(url, **client_kwargs))
+    first = runner.run_async(GRAPH)
+    time.sleep(0.1)  # first is running; the rest queue behind it
+    low = runner.run_async({"2": GRAPH["1"]})
+    high = runner.run_async({"3": GRAPH["1"]}, priority=1)
+    doomed = runner.run_async({"4": GRAPH["1"]})
+    assert runner.cancel(doomed)
+    order = [runner.q.get(timeout=10)[0] for _ in range(4)]
+    assert order[0] == doomed  # reported as soon as it was cancelled
+    assert order[1:] == [first, high, low]
+    assert runner.take(doomed).status == "cancelled"
+    assert all(runner.take(j).status == "done" for j in (first, high, low))
+    assert runner.jobs == {} and runner.take(first) is None
+    runner.client.close()
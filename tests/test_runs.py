@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+from core.runs import RunStore
+
+@pytest.fixture
+def store(tmp_path):
+    s = RunStore(str(tmp_path / "runs"))
+    s.record(None, [], workflow="portraits/base.json", tokens={"PROMPT": "cat 5", "STEPS": 30}, seed=7)
+    s.record(None, [], workflow="landscapes/wide.json", tokens={"PROMPT": "a cat", "STEPS": 20}, seed=8)
+    s.record(None, [], "failed", workflow="portraits/base.json", tokens={"PROMPT": "dog"}, seed=9)
+    yield s
+    s.close()
+
+@pytest.mark.parametrize("query, expected", [
+    ("", 3),
+    ("portraits", 2),
+    ("%PROMPT=dog", 1),
+    ("%prompt=dog", 1),                  # token names are case-insensitive
+    ("%STEPS=30", 1),
+    ('%PROMPT="cat 5"', 1),
+    ('"%PROMPT=cat 5"', 1),
+    ("%PROMPT=cat 5", 0),                # unquoted: "5" is a separate workflow term
+    ("%PROMPT~cat", 2),
+    ('%PROMPT~"a cat"', 1),
+    ("%STEPS", 2),
+    ("seed=8", 1),
+    ("portraits seed=9", 1),
+    ('%PROMPT="cat', 0),                 # unbalanced quote falls back to a plain split
+    ("100%_done", 0),                    # LIKE wildcards are literal
+])
+def test_search_terms(store, query, expected):
+    assert store.count(query) == expected
+    assert len(store.search(query)) == expected
+
+def test_date_bounds_and_workflow_scope(store):
+    today = time.strftime("%Y-%m-%d")
+    assert store.count(f">{today}") == 3
+    assert store.count(f"<{today}") == 0
+    assert store.count("", workflow="portraits/base.json") == 2
+    assert store.count("%PROMPT=dog", workflow="landscapes/wide.json") == 0
+
+def test_search_pages_newest_first(store):
+    ids = [r["id"] for r in store.search("", 0, 2)] + [r["id"] for r in store.search("", 2, 2)]
+    assert ids == sorted(ids, reverse=True) and len(ids) == 3
+
+def test_oldest_runs_are_deleted_over_the_byte_budget(tmp_path):
+    s = RunStore(str(tmp_path / "runs"), max_bytes=250)
+    empty = s.record(None, [], "failed")
+    runs = [s.record(None, [{"kind": "file", "filename": f"{i}.bin", "bytes": b"x" * 100}]) for i in range(3)]
+    assert s.get(runs[0]) is None and s.get(runs[1]) and s.get(runs[2])
+    assert s.get(empty) is not None        # runs without files cost nothing and stay
+    assert s.total == 200
+    assert sorted(p.name[-5:] for p in (tmp_path / "runs" / "files").rglob("*.bin")) == ["1.bin", "2.bin"]
+    s.close()
+    s = RunStore(str(tmp_path / "runs"))
+    assert s.total == 200
+    s.close()
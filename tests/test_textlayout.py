@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+pygame = pytest.importorskip("pygame")
+
+from ui.textlayout import TextBuffer, WrapLayout
+
+@pytest.fixture(scope="module")
+def font():
+    pygame.font.init()
+    return pygame.font.Font(None, 20)
+
+TEXT = "\n".join(["short", "a much longer line of words that has to wrap across several rows " * 4, "", "end"])
+
+def _rows(layout, buf):
+    return [text for _, text in layout.visible(buf, 0, layout.row_count)]
+
+def test_rows_cover_every_line_within_width(font):
+    buf = TextBuffer(TEXT)
+    layout = WrapLayout(font, width=200)
+    layout.sync(buf)
+    rows = _rows(layout, buf)
+    assert len(rows) == layout.row_count > len(buf.lines)
+    assert "".join(rows) == TEXT.replace("\n", "")
+    assert all(font.size(r)[0] <= 200 for r in rows if len(r) > 1)
+
+@pytest.mark.parametrize("edit", [
+    lambda b: b.insert("inserted words "),
+    lambda b: [b.backspace() for _ in range(12)],
+    lambda b: b.insert("\nnew line\n"),
+    lambda b: (b.home(), b.backspace()),
+])
+def test_incremental_sync_matches_fresh_layout(font, edit):
+    buf = TextBuffer(TEXT)
+    layout = WrapLayout(font, width=200)
+    layout.sync(buf)
+    buf.row, buf.col = 1, 40
+    edit(buf)
+    layout.sync(buf)
+    fresh = WrapLayout(font, width=200)
+    fresh.sync(TextBuffer(buf.text()))
+    assert layout.starts == fresh.starts
+    assert layout.row_start == fresh.row_start
+    assert layout.row_count == fresh.row_count
+
+def test_locate_and_hit_round_trip(font):
+    buf = TextBuffer(TEXT)
+    layout = WrapLayout(font, width=200)
+    layout.sync(buf)
+    for col in (0, 10, 70, len(buf.lines[1])):
+        vrow, x = layout.locate(buf, 1, col)
+        assert layout.hit(buf, vrow, x) == (1, col)
+
+def test_set_width_rewraps(font):
+    buf = TextBuffer(TEXT)
+    layout = WrapLayout(font, width=200)
+    layout.sync(buf)
+    narrow = layout.row_count
+    layout.set_width(800)
+    layout.sync(buf)
+    assert layout.row_count < narrow
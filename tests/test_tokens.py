@@ -0,0 +1,36 @@
+import copy
+
+from core.tokens import apply_token_values, compile_template
+
+GRAPH = {
+    "3": {"class_type": "KSampler", "inputs": {"seed": 1, "steps": "%%STEPS:int%%", "cfg": "%%CFG:float%%"}},
+    "6": {"class_type": "CLIPTextEncode", "inputs": {"text": "a %%STYLE%% photo of %%PROMPT:ml%%, %%MISSING%%"}},
+    "7": {"class_type": "CLIPTextEncode", "inputs": {"text": "plain"}},
+    "9": {"class_type": "SaveImage", "inputs": {"filename_prefix": "%%PROMPT%%"}},
+}
+
+def test_template_indexes_tokens():
+    t = compile_template(GRAPH)
+    assert t.names == ["CFG", "MISSING", "PROMPT", "STEPS", "STYLE"]
+    assert t.kinds["STEPS"] == "int" and "PROMPT" in t and "SEED" not in t
+    assert t.writable_nodes == {"3", "6", "9"}
+
+def test_template_apply_matches_scan():
+    values = {"STEPS": "30", "CFG": 7.5, "STYLE": "watercolor", "PROMPT": "a cat"}
+    expected, got = copy.deepcopy(GRAPH), copy.deepcopy(GRAPH)
+    apply_token_values(expected, values)
+    compile_template(GRAPH).apply(got, values)
+    assert got == expected
+    assert got["3"]["inputs"]["steps"] == 30
+    assert got["6"]["inputs"]["text"] == "a watercolor photo of a cat, %%MISSING%%"
+    assert got["9"]["inputs"]["filename_prefix"] == "a cat"
+
+def test_template_leaves_source_graph_untouched():
+    before = copy.deepcopy(GRAPH)
+    compile_template(GRAPH).apply(copy.deepcopy(GRAPH), {"PROMPT": "x"})
+    assert GRAPH == before
+
+def test_uncoercible_value_stays_a_string():
+    g = copy.deepcopy(GRAPH)
+    compile_template(GRAPH).apply(g, {"STEPS": "many"})
+    assert g["3"]["inputs"]["steps"] == "many"
@@ -0,0 +1,242 @@
+"""
+Offline benchmarks against the in-process fake ComfyUI server (tools.fake_comfy).
+
+    python -m tools.bench --out bench.json
+    python -m tools.bench --quick --only latency,tokens
+
+Measures end-to-end job latency (socket and polling completion), jobs/min with
+N jobs in flight, download throughput and peak RSS while collecting artifacts,
+and token scanning/substitution on synthetic graphs of 10 to 10k nodes. Results
+are written as JSON (with a short summary on stdout) so two releases can be
+diffed. The artifact cache and run memo are disabled so every run downloads.
+"""
+import argparse, copy, json, os, platform, shutil, statistics, subprocess, sys, tempfile, threading, time
+
+from app.runner import Runner
+from core.comfy_client import ComfyClient
+from core.prepare import prepare_graph
+from core.tokens import apply_token_values, compile_template, find_specs
+from tools.fake_comfy import serve
+
+try:
+    import psutil  # optional; /proc/self/statm is read without it
+except ImportError:
+    psutil = None
+
+SECTIONS = ("latency", "throughput", "download", "tokens")
+
+def synthetic_graph(nodes: int) -> dict:
+    """API-format graph of nodes nodes: samplers, prompts with embedded and exact tokens, one SaveImage."""
+    g = {}
+    for i in range(1, nodes):
+        nid = str(i)
+        if i % 4 == 0:
+            g[nid] = {"class_type": "KSampler", "inputs": {
+                "seed": 0, "steps": "%%STEPS:int%%", "cfg": "%%CFG:float%%", "sampler_name": "euler",
+                "model": [str(max(1, i - 3)), 0], "positive": [str(max(1, i - 2)), 0]}}
+        elif i % 4 == 1:
+            g[nid] = {"class_type": "CLIPTextEncode", "inputs": {
+                "text": f"a photo of %%SUBJECT%% in the style of %%STYLE_{i % 16}%%, detailed", "clip": ["1", 1]}}
+        else:
+            g[nid] = {"class_type": "LoraLoader", "inputs": {
+                "lora_name": f"lora_{i}.safetensors", "strength_model": 0.8, "model": [str(max(1, i - 1)), 0]}}
+    g[str(nodes)] = {"class_type": "SaveImage", "inputs": {"filename_prefix": "bench", "images": [str(nodes - 1), 0]}}
+    return g
+
+def bench_latency(url: str, spool: str, jobs: int) -> dict:
+    out = {}
+    for mode in ("websocket", "poll"):
+        client = _client(url, spool, use_websocket=mode == "websocket")
+        graph = synthetic_graph(8)
+        client.run_workflow(graph, poll_interval=0.05)  # warm-up: connections, first spool dir
+        ms = []
+        for _ in range(jobs):
+            t0 = time.perf_counter()
+            res = client.run_workflow(graph, poll_interval=0.05)
+            ms.append((time.perf_counter() - t0) * 1000)
+            _drop(res["artifacts"])
+        client.close()
+        out[mode] = _stats(ms)
+    return out
+
+def bench_throughput(url: str, spool: str, jobs: int, in_flight=(1, 2, 4)) -> dict:
+    out = {}
+    graph = synthetic_graph(8)
+    for n in in_flight:
+        runner = Runner(max_in_flight=n, client=_client(url, spool))
+        t0 = time.perf_counter()
+        ids = {runner.run_async(graph, poll_interval=0.05) for _ in range(jobs)}
+        failed = 0
+        while ids:
+            job_id, arts = runner.q.get()
+            ids.discard(job_id)
+            failed += runner.take(job_id).status != "done"
+            _drop(arts)
+        elapsed = time.perf_counter() - t0
+        runner.client.close()
+        out[str(n)] = {"jobs": jobs, "failed": failed, "seconds": round(elapsed, 3),
+                       "jobs_per_min": round(jobs * 60 / elapsed, 1)}
+    return out
+
+def bench_download(comfy, url: str, spool: str, sizes, files: int) -> list:
+    out = []
+    client = _client(url, spool)
+    for size in sizes:
+        comfy.files.clear()
+        comfy.file_bytes, comfy.images = size, files
+        outputs = comfy._render_outputs({"9": {"class_type": "SaveImage", "inputs": {}}})
+        client.collect_artifacts(outputs)  # warm-up
+        with _PeakRSS() as rss:
+            t0 = time.perf_counter()
+            arts = client.collect_artifacts(outputs)
+            elapsed = time.perf_counter() - t0
+        total = sum(os.path.getsize(a["path"]) for a in arts)
+        _drop(arts)
+        out.append({"file_bytes": size, "files": files, "bytes": total, "seconds": round(elapsed, 4),
+                    "mb_per_s": round(total / elapsed / 1e6, 1), "peak_rss_delta_mb": rss.delta_mb})
+    client.close()
+    comfy.files.clear()
+    return out
+
+def bench_tokens(sizes) -> dict:
+    out = {}
+    values = {"SUBJECT": "a cat", "STEPS": "30", "CFG": "7.5", **{f"STYLE_{i}": f"style {i}" for i in range(16)}}
+    for n in sizes:
+        g = synthetic_graph(n)
+        template = compile_template(g)
+        out[str(n)] = {
+            "find_specs_ms": _timeit(lambda: find_specs(g)),
+            "compile_template_ms": _timeit(lambda: compile_template(g)),
+            "prepare_graph_ms": _timeit(lambda: prepare_graph(g, values, template)),
+            "apply_token_values_ms": _timeit(lambda: apply_token_values(copy.deepcopy(g), values),
+                                             baseline=lambda: copy.deepcopy(g)),
+        }
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Offline benchmarks against an in-process fake ComfyUI server.")
+    ap.add_argument("--out", default="bench.json", help="JSON results file")
+    ap.add_argument("--only", default=",".join(SECTIONS), help=f"comma-separated sections ({', '.join(SECTIONS)})")
+    ap.add_argument("--quick", action="store_true", help="fewer jobs and smaller sizes (smoke run)")
+    ap.add_argument("--jobs", type=int, default=None, help="jobs per latency/throughput measurement")
+    ap.add_argument("--delay", type=float, default=0.05, help="fake execution seconds per job")
+    args = ap.parse_args(argv)
+    only = [s.strip() for s in args.only.split(",") if s.strip()]
+    unknown = set(only) - set(SECTIONS)
+    if unknown:
+        raise SystemExit(f"unknown sections: {', '.join(sorted(unknown))}")
+    jobs = args.jobs or (5 if args.quick else 30)
+    sizes = (1 << 20, 8 << 20) if args.quick else (256 << 10, 4 << 20, 32 << 20)
+    graph_sizes = (10, 100, 1000) if args.quick else (10, 100, 1000, 10000)
+
+    httpd, comfy = serve(delay=args.delay, images=1, width=64, height=64, previews=False)
+    url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    spool = tempfile.mkdtemp(prefix="pg_comfy_bench_")
+    results = {}
+    try:
+        if "latency" in only:
+            results["latency"] = bench_latency(url, spool, jobs)
+        if "throughput" in only:
+            results["throughput"] = bench_throughput(url, spool, jobs)
+        if "download" in only:
+            results["download"] = bench_download(comfy, url, spool, sizes, files=4)
+        if "tokens" in only:
+            results["tokens"] = bench_tokens(graph_sizes)
+    finally:
+        httpd.shutdown()
+        shutil.rmtree(spool, ignore_errors=True)
+
+    report = {"meta": _meta(args), "results": results}
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    _summary(results)
+    print(f"wrote {args.out}")
+    return 0
+
+# ---- internals ----
+
+def _client(url: str, spool: str, **kwargs) -> ComfyClient:
+    return ComfyClient(url, spool_dir=spool, cache_max_bytes=0, memo_entries=0, **kwargs)
+
+def _drop(arts: list):
+    for a in arts:
+        if a.get("path"):
+            try: os.remove(a["path"])
+            except OSError: pass
+
+def _stats(ms: list) -> dict:
+    ms = sorted(ms)
+    return {"n": len(ms), "mean_ms": round(statistics.fmean(ms), 2), "p50_ms": round(ms[len(ms) // 2], 2),
+            "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 2),
+            "min_ms": round(ms[0], 2), "max_ms": round(ms[-1], 2)}
+
+def _timeit(fn, baseline=None, min_time: float = 0.2, max_runs: int = 1000) -> float:
+    """Median ms per call of fn over at least min_time seconds, minus baseline's median (setup cost)."""
+    def median(f):
+        runs, t_end = [], time.perf_counter() + min_time
+        while len(runs) < 3 or (time.perf_counter() < t_end and len(runs) < max_runs):
+            t0 = time.perf_counter()
+            f()
+            runs.append(time.perf_counter() - t0)
+        return statistics.median(runs) * 1000
+    ms = median(fn) - (median(baseline) if baseline else 0.0)
+    return round(max(0.0, ms), 4)
+
+def _rss() -> int | None:
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class _PeakRSS:
+    """Samples RSS on a thread while the block runs; delta_mb is the peak above the starting RSS."""
+    def __init__(self, interval: float = 0.002):
+        self.interval = interval
+        self.delta_mb = None
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self.start = self.peak = _rss()
+        if self.start is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss())
+        self.delta_mb = round((self.peak - self.start) / 1e6, 2)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss())
+
+def _meta(args) -> dict:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        rev = None
+    return {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "git": rev, "python": platform.python_version(),
+            "platform": platform.platform(), "cpus": os.cpu_count(), "quick": args.quick, "delay": args.delay}
+
+def _summary(results: dict):
+    for mode, s in results.get("latency", {}).items():
+        print(f"latency   {mode:<10} p50 {s['p50_ms']:8.1f} ms  p95 {s['p95_ms']:8.1f} ms")
+    for n, t in results.get("throughput", {}).items():
+        print(f"in flight {n:<10} {t['jobs_per_min']:8.1f} jobs/min")
+    for d in results.get("download", []):
+        print(f"download  {d['files']}x{d['file_bytes'] >> 10:<7}KB {d['mb_per_s']:8.1f} MB/s  "
+              f"peak RSS +{d['peak_rss_delta_mb']} MB")
+    for n, t in results.get("tokens", {}).items():
+        print(f"tokens    {n:<10} find_specs {t['find_specs_ms']:.3f} ms  prepare_graph {t['prepare_graph_ms']:.3f} ms  "
+              f"apply_token_values {t['apply_token_values_ms']:.3f} ms")
+
+if __name__ == "__main__":
+    sys.exit(main())
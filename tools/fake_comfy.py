@@ -0,0 +1,379 @@
+"""
+Minimal in-process fake of the ComfyUI HTTP/WebSocket API for offline runs.
+
+    python -m tools.fake_comfy --port 8188 --delay 2 --images 4
+
+Jobs run one at a time on a worker thread; every run "renders" solid-colour PNGs
+for each Save* node (or one image if the graph has none), optionally padded to
+file_bytes so downloads have a realistic size. Implements /prompt,
+/history, /view, /queue, /interrupt, /system_stats and /ws with the executing/executed message flow;
+nodes with a "steps" input also stream progress messages and binary PNG preview frames.
+"""
+import argparse
+import base64
+from collections import Counter
+import hashlib
+import json
+import os
+import random
+import socket
+import struct
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+_WS_MAGIC = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+def make_png(width: int, height: int, rgb=(90, 120, 200), size: int = 0) -> bytes:
+    """Solid-colour PNG; with size, padded up to about that many bytes by a private ancillary chunk."""
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+    row = b"\x00" + bytes(rgb) * width
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    png = b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(row * height))
+    if size > len(png) + 24:
+        png += chunk(b"fkPd", os.urandom(size - len(png) - 24))  # decoders skip unknown ancillary chunks
+    return png + chunk(b"IEND", b"")
+
+def _ws_frame(payload: bytes, opcode: int) -> bytes:
+    n = len(payload)
+    if n < 126:
+        head = struct.pack(">BB", 0x80 | opcode, n)
+    elif n < 65536:
+        head = struct.pack(">BBH", 0x80 | opcode, 126, n)
+    else:
+        head = struct.pack(">BBQ", 0x80 | opcode, 127, n)
+    return head + payload
+
+class _WsConn:
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.lock = threading.Lock()
+        self.alive = True
+
+    def send_json(self, obj: dict):
+        self._send(json.dumps(obj).encode("utf-8"), 0x1)
+
+    def send_bytes(self, data: bytes):
+        self._send(data, 0x2)
+
+    def _send(self, payload: bytes, opcode: int):
+        with self.lock:
+            if not self.alive:
+                return
+            try:
+                self.sock.sendall(_ws_frame(payload, opcode))
+            except OSError:
+                self.alive = False
+
+    def _read_exact(self, n: int) -> bytes:
+        buf = b""
+        while len(buf) < n:
+            part = self.sock.recv(n - len(buf))
+            if not part:
+                raise ConnectionError("closed")
+            buf += part
+        return buf
+
+    def serve(self):
+        """Read client frames until close; answers pings, ignores everything else."""
+        try:
+            while self.alive:
+                b0, b1 = self._read_exact(2)
+                opcode, n = b0 & 0x0F, b1 & 0x7F
+                if n == 126: n = struct.unpack(">H", self._read_exact(2))[0]
+                elif n == 127: n = struct.unpack(">Q", self._read_exact(8))[0]
+                mask = self._read_exact(4) if b1 & 0x80 else b"\x00" * 4
+                data = bytes(c ^ mask[i % 4] for i, c in enumerate(self._read_exact(n)))
+                if opcode == 0x8:
+                    self._send(data[:2], 0x8)
+                    break
+                if opcode == 0x9:
+                    self._send(data, 0xA)
+        except (OSError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.alive = False
+
+class FakeComfy:
+    """Server state: pending queue, history, stored files and connected sockets."""
+    def __init__(self, delay: float = 0.5, images: int = 1, width: int = 64, height: int = 64,
+                 previews: bool = True, file_bytes: int = 0):
+        self.delay = delay
+        self.file_bytes = file_bytes
+        self.previews = previews
+        self.images = images
+        self.width = width
+        self.height = height
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.pending: list[tuple[int, str, str, dict]] = []  # (number, prompt_id, client_id, graph)
+        self.running: tuple[int, str, str, dict] | None = None
+        self.interrupted = threading.Event()
+        self.history: dict[str, dict] = {}
+        self.files: dict[tuple[str, str, str], bytes] = {}
+        self.sockets: dict[str, list[_WsConn]] = {}
+        self.counter = 0
+        self.requests = Counter()     # HTTP requests served, by path (/history/<id> counted as /history/{id})
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    # ---- API ----
+
+    def submit(self, graph: dict, client_id: str) -> dict:
+        prompt_id = str(uuid.uuid4())
+        with self.lock:
+            self.counter += 1
+            number = self.counter
+            self.pending.append((number, prompt_id, client_id, graph))
+            self.wakeup.notify()
+        return {"prompt_id": prompt_id, "number": number, "node_errors": {}}
+
+    def history_for(self, prompt_id: str) -> dict:
+        with self.lock:
+            entry = self.history.get(prompt_id)
+        return {prompt_id: entry} if entry else {}
+
+    def recent_history(self, max_items: int | None = None) -> dict:
+        with self.lock:
+            items = list(self.history.items())
+        return dict(items[-max_items:] if max_items else items)
+
+    def queue_state(self) -> dict:
+        with self.lock:
+            running = [list(self.running[:3]) + [{}, []]] if self.running else []
+            pending = [list(item[:3]) + [{}, []] for item in self.pending]
+        return {"queue_running": running, "queue_pending": pending}
+
+    def delete(self, prompt_ids: list[str]):
+        with self.lock:
+            self.pending = [item for item in self.pending if item[1] not in prompt_ids]
+
+    def interrupt(self, prompt_id: str | None = None):
+        with self.lock:
+            if self.running and (prompt_id is None or self.running[1] == prompt_id):
+                self.interrupted.set()
+
+    def attach(self, client_id: str, conn: _WsConn):
+        with self.lock:
+            self.sockets.setdefault(client_id, []).append(conn)
+            remaining = len(self.pending)
+        conn.send_json({"type": "status", "data": {"status": {"exec_info": {"queue_remaining": remaining}}, "sid": client_id}})
+
+    def detach(self, client_id: str, conn: _WsConn):
+        with self.lock:
+            conns = self.sockets.get(client_id, [])
+            if conn in conns:
+                conns.remove(conn)
+
+    def _send(self, client_id: str, mtype: str, data: dict):
+        with self.lock:
+            conns = list(self.sockets.get(client_id, []))
+        for c in conns:
+            c.send_json({"type": mtype, "data": data})
+
+    def _send_preview(self, client_id: str, png: bytes):
+        with self.lock:
+            conns = list(self.sockets.get(client_id, []))
+        for c in conns:
+            c.send_bytes(struct.pack(">II", 1, 2) + png)  # PREVIEW_IMAGE, PNG
+
+    # ---- execution ----
+
+    def _worker(self):
+        while True:
+            with self.lock:
+                while not self.pending:
+                    self.wakeup.wait()
+                self.running = self.pending.pop(0)
+                self.interrupted.clear()
+            _, prompt_id, client_id, graph = self.running
+            try:
+                self._execute(prompt_id, client_id, graph)
+            finally:
+                with self.lock:
+                    self.running = None
+
+    def _execute(self, prompt_id: str, client_id: str, graph: dict):
+        self._send(client_id, "execution_start", {"prompt_id": prompt_id})
+        node_ids = [nid for nid in graph if isinstance(graph[nid], dict)]
+        for nid in node_ids:
+            self._send(client_id, "executing", {"node": nid, "prompt_id": prompt_id})
+            steps = (graph[nid].get("inputs") or {}).get("steps")
+            steps = steps if isinstance(steps, int) and steps > 0 else 1
+            if self._run_node(prompt_id, client_id, nid, steps, self.delay / max(1, len(node_ids))):
+                with self.lock:
+                    self.history[prompt_id] = {
+                        "prompt": [0, prompt_id, graph, {}, []], "outputs": {},
+                        "status": {"status_str": "error", "completed": False, "messages": [
+                            ["execution_interrupted", {"prompt_id": prompt_id, "node_id": nid}]]},
+                    }
+                self._send(client_id, "execution_interrupted", {"prompt_id": prompt_id, "node_id": nid})
+                self._send(client_id, "executing", {"node": None, "prompt_id": prompt_id})
+                return
+        outputs = self._render_outputs(graph)
+        for nid, out in outputs.items():
+            self._send(client_id, "executed", {"node": nid, "output": out, "prompt_id": prompt_id})
+        with self.lock:
+            self.history[prompt_id] = {
+                "prompt": [0, prompt_id, graph, {}, list(outputs)],
+                "outputs": outputs,
+                "status": {"status_str": "success", "completed": True, "messages": []},
+            }
+        self._send(client_id, "execution_success", {"prompt_id": prompt_id})
+        self._send(client_id, "executing", {"node": None, "prompt_id": prompt_id})
+
+    def _run_node(self, prompt_id: str, client_id: str, nid: str, steps: int, duration: float) -> bool:
+        """Sleep through one node, reporting per-step progress; True if interrupted."""
+        if steps == 1:
+            return self.interrupted.wait(duration)
+        for step in range(1, steps + 1):
+            if self.interrupted.wait(duration / steps):
+                return True
+            self._send(client_id, "progress", {"value": step, "max": steps, "prompt_id": prompt_id, "node": nid})
+            if self.previews:
+                shade = 40 + 180 * step // steps
+                self._send_preview(client_id, make_png(64, 64, (shade, shade, shade)))
+        return False
+
+    def _render_outputs(self, graph: dict) -> dict:
+        savers = [nid for nid, n in graph.items() if isinstance(n, dict) and "Save" in str(n.get("class_type", ""))]
+        outputs = {}
+        for nid in savers or ["9"]:
+            items = []
+            for _ in range(self.images):
+                with self.lock:
+                    self.counter += 1
+                    fn = f"fake_{self.counter:05d}_.png"
+                rgb = tuple(random.randrange(40, 220) for _ in range(3))
+                self.files[(fn, "", "output")] = make_png(self.width, self.height, rgb, self.file_bytes)
+                items.append({"filename": fn, "subfolder": "", "type": "output"})
+            outputs[nid] = {"images": items}
+        return outputs
+
+def make_handler(comfy: FakeComfy):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            # headers and body go out in separate writes; don't let Nagle hold the body back
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _json(self, obj, code=200):
+            body = json.dumps(obj).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self) -> dict:
+            n = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(n) or b"{}")
+
+        def do_POST(self):
+            path = urlparse(self.path).path
+            comfy.requests["POST " + path] += 1
+            if path == "/prompt":
+                body = self._read_json()
+                self._json(comfy.submit(body.get("prompt") or {}, body.get("client_id") or ""))
+            elif path == "/queue":
+                body = self._read_json()
+                if body.get("clear"):
+                    comfy.delete([item[1] for item in comfy.pending])
+                comfy.delete(body.get("delete") or [])
+                self._json({})
+            elif path == "/interrupt":
+                comfy.interrupt(self._read_json().get("prompt_id"))
+                self._json({})
+            else:
+                self._json({"error": "not found"}, 404)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            q = {k: v[0] for k, v in parse_qs(url.query).items()}
+            comfy.requests["GET " + ("/history/{id}" if url.path.startswith("/history/") else url.path)] += 1
+            if url.path == "/ws":
+                return self._websocket(q.get("clientId") or str(uuid.uuid4()))
+            if url.path == "/queue":
+                return self._json(comfy.queue_state())
+            if url.path == "/system_stats":
+                return self._json({"system": {"os": "fake", "comfyui_version": "fake"},
+                                   "devices": [{"name": "fake", "type": "cpu", "vram_total": 1 << 33, "vram_free": 1 << 32}]})
+            if url.path.startswith("/history/"):
+                return self._json(comfy.history_for(url.path[len("/history/"):]))
+            if url.path == "/history":
+                return self._json(comfy.recent_history(int(q.get("max_items") or 0) or None))
+            if url.path == "/view":
+                data = comfy.files.get((q.get("filename", ""), q.get("subfolder", ""), q.get("type", "output")))
+                if data is None:
+                    return self._json({"error": "not found"}, 404)
+                etag = '"%s"' % hashlib.sha1(data).hexdigest()
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                return
+            self._json({"error": "not found"}, 404)
+
+        def _websocket(self, client_id: str):
+            key = self.headers.get("Sec-WebSocket-Key", "")
+            accept = base64.b64encode(hashlib.sha1((key + _WS_MAGIC).encode("ascii")).digest()).decode("ascii")
+            self.send_response(101)
+            self.send_header("Upgrade", "websocket")
+            self.send_header("Connection", "Upgrade")
+            self.send_header("Sec-WebSocket-Accept", accept)
+            self.end_headers()
+            self.wfile.flush()
+            conn = _WsConn(self.connection)
+            comfy.attach(client_id, conn)
+            try:
+                conn.serve()
+            finally:
+                comfy.detach(client_id, conn)
+                self.close_connection = True
+
+    return Handler
+
+def serve(host: str = "127.0.0.1", port: int = 0, **kwargs) -> tuple[ThreadingHTTPServer, FakeComfy]:
+    """Start a fake server on a background thread; port 0 picks a free port."""
+    comfy = FakeComfy(**kwargs)
+    httpd = ThreadingHTTPServer((host, port), make_handler(comfy))
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, comfy
+
+def main():
+    ap = argparse.ArgumentParser(description="Fake ComfyUI server for offline runs.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8188)
+    ap.add_argument("--delay", type=float, default=0.5, help="seconds of fake execution per job")
+    ap.add_argument("--images", type=int, default=1, help="images per Save node")
+    ap.add_argument("--size", type=int, nargs=2, default=(512, 512), metavar=("W", "H"))
+    ap.add_argument("--file-bytes", type=int, default=0, help="pad each image file to about this many bytes")
+    args = ap.parse_args()
+    httpd, _ = serve(args.host, args.port, delay=args.delay, images=args.images, width=args.size[0], height=args.size[1],
+                     file_bytes=args.file_bytes)
+    print(f"fake ComfyUI on http://{args.host}:{httpd.server_address[1]}  (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        httpd.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import os, pygame
+from collections import deque
+from io import BytesIO
+
+STREAM_BYTES = 4 << 20  # clips bigger than this stream through mixer.music instead of a Sound
+
+class AudioPlayer:
+    """
+    Plays a job's audio artifacts back to back, straight from their spooled file or
+    inline bytes (nothing is copied to a temp file). Short clips are decoded into a
+    mixer Sound; long ones stream through pygame.mixer.music. When a clip ends the
+    mixer posts end_event and the main loop calls on_end() to start the next one.
+    """
+    def __init__(self, end_event: int, stream_bytes: int = STREAM_BYTES):
+        self.end_event = end_event
+        self.stream_bytes = stream_bytes
+        self.queue: "deque[dict]" = deque()
+        self.current = None           # artifact playing now
+        self._sound = None
+        self._channel = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(pygame.mixer.get_init())
+
+    def play_all(self, auds: list[dict]):
+        self.stop()
+        self.queue.extend(a for a in auds if a.get("path") or a.get("bytes"))
+        self.next()
+
+    def next(self) -> dict | None:
+        """Skip to the next queued clip (clips the mixer can't play are skipped). Returns it."""
+        self._halt()
+        while self.enabled and self.queue:
+            a = self.queue.popleft()
+            try:
+                self._start(a)
+                self.current = a
+                return a
+            except Exception as e:
+                print("Audio could not be played by mixer:", e, "->", a.get("path") or a["filename"])
+        return None
+
+    def on_end(self):
+        # end events can arrive late; ignore them while a newer clip is still playing
+        if self.current is not None and not self._busy():
+            self.next()
+
+    def stop(self):
+        self.queue.clear()
+        self._halt()
+
+    # ---- internals ----
+
+    def _start(self, a: dict):
+        path, data = a.get("path"), a.get("bytes")
+        size = os.path.getsize(path) if path else len(data)
+        src = path if path else BytesIO(data)
+        if size > self.stream_bytes:
+            pygame.mixer.music.load(src, os.path.splitext(a["filename"])[1].lstrip(".") or None)
+            pygame.mixer.music.set_endevent(self.end_event)
+            pygame.mixer.music.play()
+        else:
+            self._sound = pygame.mixer.Sound(file=src)
+            self._channel = self._sound.play()
+            if self._channel is None:
+                raise RuntimeError("no free mixer channel")
+            self._channel.set_endevent(self.end_event)
+
+    def _busy(self) -> bool:
+        if self._channel is not None and self._channel.get_busy():
+            return True
+        return bool(self.enabled and pygame.mixer.music.get_busy())
+
+    def _halt(self):
+        self.current = None
+        if not self.enabled:
+            return
+        if self._channel is not None:
+            self._channel.set_endevent()
+            self._channel.stop()
+        pygame.mixer.music.set_endevent()
+        pygame.mixer.music.stop()
+        pygame.mixer.music.unload()  # release the spooled file before it gets removed
+        self._sound = self._channel = None
@@ -1,6 +1,6 @@
 
 import pygame, pyperclip
-from core.tokens import find_specs
+from ui.textlayout import TextBuffer, WrapLayout
 
 class InputsForm:
     """
@@ -13,7 +13,9 @@ class InputsForm:
       - Ctrl+V while editing: paste
       - Enter while editing: inserts newline if multiline; else ends edit
       - Ctrl+Enter: end edit (multiline)
-      - PgUp/PgDn/Home/End: navigate fields
+      - PgUp/PgDn/Home/End: navigate fields (while editing: scroll/caret to line start/end)
+    The edited value lives in a TextBuffer and is drawn through a WrapLayout, so
+    long prompts only re-wrap the edited line and only visible rows are rendered.
     """
     def __init__(self, font=None, font_bold=None, font_mono=None, rows=12):
         self.font = font or pygame.font.SysFont(None, 24)
@@ -26,8 +28,10 @@ class InputsForm:
         self.index = 0
         self.scroll = 0
         self.editing = False
-        self.caret = 0            # caret position inside current text
-        self.view_offset = 0      # horizontal scroll for single-line
+        self.buffer = None        # TextBuffer of the field being edited
+        self.layout = WrapLayout(self.font_mono)
+        self.edit_scroll = 0      # first visible wrapped row in the editor
+        self.edit_rows = 1        # wrapped rows that fit in the editor (from the last draw)
         self.multiline = False    # current field mode
 
     def _is_multiline_kind(self, kind: str, name: str):
@@ -36,19 +40,28 @@ class InputsForm:
         # heuristic: prompt-like names default to multiline
         return name.lower() in ("prompt", "prompt_1", "prompt_2", "negative_prompt", "neg_prompt", "system", "memory", "notes")
 
-    def open_form(self, graph: dict):
-        specs = find_specs(graph)
+    def open_form(self, template):
+        """template: core.tokens.CompiledTemplate of the loaded workflow."""
+        specs = template.specs
         self.fields = [{"name": s["name"], "kind": s["kind"]} for s in specs]
         # keep existing values when possible
         self.values = {f["name"]: self.values.get(f["name"], "") for f in self.fields}
-        self.index = 0; self.scroll = 0; self.editing = False; self.caret = 0; self.view_offset = 0
+        self.index = 0; self.scroll = 0; self.editing = False; self.buffer = None
         self.multiline = self._is_multiline_kind(self.fields[0]["kind"] if self.fields else "str", self.fields[0]["name"] if self.fields else "")
         self.open = True
         return f"inputs: {len(self.fields)} token(s)"
 
     def close(self):
+        self.end_edit()
         self.open = False
+
+    def end_edit(self):
+        """Write the edited buffer back to values."""
+        name, _ = self._current_name_kind()
+        if self.editing and self.buffer is not None and name is not None:
+            self.values[name] = self.buffer.text()
         self.editing = False
+        self.buffer = None
 
     def _current_name_kind(self):
         if not self.fields: return None, "str"
@@ -61,79 +74,59 @@ class InputsForm:
             return False, None
 
         if self.editing:
-            name, kind = self._current_name_kind()
-            if name is None: return True, None
-            txt = self.values.get(name, "")
+            buf = self.buffer
+            if buf is None: return True, None
             # paste
             if (mods & pygame.KMOD_CTRL) and event.key == pygame.K_v:
                 try:
                     clip = pyperclip.paste()
                     if clip:
-                        before = txt[:self.caret]; after = txt[self.caret:]
-                        txt = before + clip + after
-                        self.caret += len(clip)
-                        self.values[name] = txt
+                        buf.insert(clip.replace("\r\n", "\n").replace("\r", "\n"))
                         return True, None
                 except Exception:
                     pass
             # end edit (ctrl+enter)
             if (mods & pygame.KMOD_CTRL) and event.key == pygame.K_RETURN:
-                self.editing = False; return True, None
+                self.end_edit(); return True, None
 
             if event.key == pygame.K_ESCAPE:
-                self.editing = False; return True, None
+                self.end_edit(); return True, None
 
             if event.key == pygame.K_RETURN:
                 if self.multiline:
-                    before = txt[:self.caret]; after = txt[self.caret:]
-                    txt = before + "\n" + after
-                    self.caret += 1
-                    self.values[name] = txt
+                    buf.insert("\n")
                 else:
-                    self.editing = False
+                    self.end_edit()
                 return True, None
 
             if event.key == pygame.K_BACKSPACE:
-                if self.caret > 0:
-                    self.values[name] = txt[:self.caret-1] + txt[self.caret:]
-                    self.caret -= 1
-                return True, None
-
+                buf.backspace(); return True, None
             if event.key == pygame.K_DELETE:
-                if self.caret < len(txt):
-                    self.values[name] = txt[:self.caret] + txt[self.caret+1:]
-                return True, None
-
+                buf.delete(); return True, None
             if event.key == pygame.K_LEFT:
-                if self.caret > 0: self.caret -= 1
-                return True, None
+                buf.left(); return True, None
             if event.key == pygame.K_RIGHT:
-                if self.caret < len(txt): self.caret += 1
-                return True, None
+                buf.right(); return True, None
             if event.key == pygame.K_HOME:
-                # move to start of line for multiline, else start
-                if self.multiline:
-                    line_start = txt.rfind("\n", 0, self.caret) + 1
-                    self.caret = line_start
-                else:
-                    self.caret = 0
-                return True, None
+                # start of line for multiline, else start of text
+                if not self.multiline: buf.row = 0
+                buf.home(); return True, None
             if event.key == pygame.K_END:
-                if self.multiline:
-                    line_end = txt.find("\n", self.caret)
-                    if line_end == -1: line_end = len(txt)
-                    self.caret = line_end
-                else:
-                    self.caret = len(txt)
+                if not self.multiline: buf.row = len(buf.lines) - 1
+                buf.end(); return True, None
+            if event.key in (pygame.K_UP, pygame.K_DOWN, pygame.K_PAGEUP, pygame.K_PAGEDOWN):
+                # move by wrapped rows, keeping the caret's x position
+                step = {pygame.K_UP: -1, pygame.K_DOWN: 1,
+                        pygame.K_PAGEUP: -self.edit_rows, pygame.K_PAGEDOWN: self.edit_rows}[event.key]
+                self.layout.sync(buf)
+                vrow, x = self.layout.locate(buf, buf.row, buf.col)
+                buf.row, buf.col = self.layout.hit(buf, vrow + step, x)
                 return True, None
 
             # typing
             ch = event.unicode
             if ch and ch.isprintable():
-                before = txt[:self.caret]; after = txt[self.caret:]
-                txt = before + ch + after
-                self.caret += len(ch)
-                self.values[name] = txt
+                buf.insert(ch)
                 return True, None
 
             return True, None
@@ -142,11 +135,12 @@ class InputsForm:
         if event.key == pygame.K_F2 or event.key == pygame.K_ESCAPE:
             self.close(); return True, "inputs closed"
         elif event.key == pygame.K_RETURN:
-            self.editing = True
             name, kind = self._current_name_kind()
-            self.multiline = self._is_multiline_kind(kind, name or "")
             if name is not None:
-                self.caret = len(self.values.get(name, ""))
+                self.editing = True
+                self.multiline = self._is_multiline_kind(kind, name)
+                self.buffer = TextBuffer(self.values.get(name, ""))  # caret at the end
+                self.edit_scroll = 0
             return True, None
         elif event.key == pygame.K_UP:
             self.index = max(0, self.index - 1); return True, None
@@ -174,7 +168,7 @@ class InputsForm:
         R.draw_panel(screen, (panel_x, panel_y, panel_w, panel_h))
 
         title = "Workflow Inputs (F2=close  ↑/↓ select  Enter=edit/save  Ctrl+V=paste)"
-        screen.blit(self.font_bold.render(title, True, (240,240,255)), (panel_x + 14, panel_y + 12))
+        screen.blit(R.render_text(self.font_bold, title, (240,240,255)), (panel_x + 14, panel_y + 12))
 
         list_x = panel_x + 14
         list_y = panel_y + 50
@@ -194,30 +188,32 @@ class InputsForm:
 
             # Label
             label = f"{name} ({kind})"
-            screen.blit(self.font.render(label, True, (220,230,245)), (list_x, y))
+            screen.blit(R.render_text(self.font, label, (220,230,245)), (list_x, y))
 
             # Box
             box_x = list_x + 300
             box_w = panel_w - (box_x - panel_x) - 30
-            # Single-line preview (first line only)
-            preview = val.split("\n", 1)[0]
+            # Single-line preview (first line only; the live buffer while editing)
+            if is_sel and self.buffer is not None:
+                preview = self.buffer.lines[0]
+            else:
+                preview = val.split("\n", 1)[0]
             pygame.draw.rect(screen, (35,38,48), (box_x, y-2, box_w, row_h), border_radius=6)
             if is_sel:
                 pygame.draw.rect(screen, (80,130,200), (box_x, y-2, box_w, row_h), width=2, border_radius=6)
-            screen.blit(self.font.render(preview[:120] + ("…" if len(preview) > 120 else ""), True, (240,240,255)), (box_x + 8, y))
+            screen.blit(R.render_text(self.font, preview[:120] + ("…" if len(preview) > 120 else ""), (240,240,255)), (box_x + 8, y))
 
         # If editing, draw an expanded multiline editor panel below list
-        if self.editing and self.fields:
+        if self.editing and self.fields and self.buffer is not None:
             name = self.fields[self.index]["name"]
             kind = self.fields[self.index]["kind"]
-            val  = self.values.get(name, "")
             ml   = self._is_multiline_kind(kind, name)
             edit_h = int(panel_h * 0.38)
             edit_y = panel_y + panel_h - edit_h - 12
             R.draw_panel(screen, (panel_x+12, edit_y, panel_w-24, edit_h), bg=(28,32,44))
 
             cap = f"Editing: {name}  ({'multiline' if ml else 'single-line'})   Enter={'newline' if ml else 'save'}   Ctrl+Enter=save   Ctrl+V=paste"
-            screen.blit(self.font_bold.render(cap, True, (230,235,255)), (panel_x + 20, edit_y + 8))
+            screen.blit(R.render_text(self.font_bold, cap, (230,235,255)), (panel_x + 20, edit_y + 8))
 
             # text area
             area_x = panel_x + 20
@@ -227,32 +223,23 @@ class InputsForm:
             pygame.draw.rect(screen, (20,22,30), (area_x, area_y, area_w, area_h), border_radius=6)
             pygame.draw.rect(screen, (70,90,120), (area_x, area_y, area_w, area_h), width=2, border_radius=6)
 
-            # render lines with soft wrap
-            lines = []
-            space_w = self.font_mono.size(" ")[0]
-            current = ""
-            for ch in val.replace("\t", "    "):
-                trial = current + ch
-                if self.font_mono.size(trial)[0] <= area_w - 16 or ch == "\n":
-                    current = trial
-                else:
-                    lines.append(current)
-                    current = ch
-                if ch == "\n":
-                    lines.append(current[:-1])
-                    current = ""
-            lines.append(current)
-
-            # draw lines
-            y = area_y + 8
-            for i, line in enumerate(lines):
-                screen.blit(self.font_mono.render(line, True, (235,235,245)), (area_x + 8, y))
-                y += self.font_mono.get_height() + 4
-
-            # simple caret at end (approx)
-            if True:
-                caret_txt = val[:self.caret]
-                caret_line = caret_txt.split("\n")[-1]
-                caret_x = area_x + 8 + self.font_mono.size(caret_line)[0]
-                caret_y = area_y + 8 + (len(caret_txt.split("\n")) - 1) * (self.font_mono.get_height() + 4)
-                pygame.draw.line(screen, (200,220,255), (caret_x, caret_y), (caret_x, caret_y + self.font_mono.get_height()), 2)
+            # soft-wrapped rows: only the edited lines re-wrap, only visible rows render
+            buf = self.buffer
+            line_h = self.font_mono.get_height() + 4
+            self.layout.set_width(area_w - 16)
+            self.layout.sync(buf)
+            self.edit_rows = rows = max(1, (area_h - 16) // line_h)
+            caret_row, caret_x = self.layout.locate(buf, buf.row, buf.col)
+            if caret_row < self.edit_scroll: self.edit_scroll = caret_row
+            if caret_row >= self.edit_scroll + rows: self.edit_scroll = caret_row - rows + 1
+
+            for vrow, line in self.layout.visible(buf, self.edit_scroll, rows):
+                y = area_y + 8 + (vrow - self.edit_scroll) * line_h
+                screen.blit(R.render_text(self.font_mono, line, (235,235,245)), (area_x + 8, y))
+
+            caret_y = area_y + 8 + (caret_row - self.edit_scroll) * line_h
+            pygame.draw.line(screen, (200,220,255), (area_x + 8 + caret_x, caret_y),
+                             (area_x + 8 + caret_x, caret_y + self.font_mono.get_height()), 2)
+            if self.layout.row_count > rows:
+                pos = f"{caret_row + 1}/{self.layout.row_count}"
+                screen.blit(R.render_text(self.font, pos, (150,160,180)), (area_x + area_w - 90, edit_y + 8))
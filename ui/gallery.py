@@ -0,0 +1,142 @@
+import pygame
+from collections import OrderedDict
+import ui.renderer as R
+
+class Gallery:
+    """
+    Every image of the last job. Thumbnails are packed into a single atlas strip, so
+    drawing the gallery is one blit however many images there are. They are made
+    lazily: only cells scrolled into view are thumbnailed, on pool (on_thumb is
+    called from the pool thread when one is ready; the owner then redraws), and
+    blitted into the atlas on the next draw. Only the selected image is decoded at
+    full size, and at most max_full images keep their decoded originals (LRU);
+    older ones are released back to thumbnail-only and decode again if selected.
+    """
+    def __init__(self, thumb=96, pad=8, max_full=6, font=None, pool=None, on_thumb=None):
+        self.thumb = thumb
+        self.pad = pad
+        self.max_full = max_full
+        self.font = font or pygame.font.SysFont(None, 24)
+        self.pool = pool
+        self.on_thumb = on_thumb
+        self.open = False
+        self.items = []               # ui.images.DecodedImage, in artifact order
+        self.index = 0
+        self.atlas = None
+        self._full: "OrderedDict[int, None]" = OrderedDict()
+        self._placed: set[int] = set()   # cells already blitted into the atlas
+        self._queued: set[int] = set()   # cells whose thumbnail is being made on pool
+
+    @property
+    def cell(self) -> int:
+        return self.thumb + self.pad
+
+    @property
+    def current(self):
+        return self.items[self.index] if self.items else None
+
+    def set_images(self, items):
+        self.items = list(items)
+        self.index = 0
+        self._full.clear()
+        self._placed.clear()
+        self._queued.clear()
+        self.atlas = self._blank_atlas() if self.items else None
+        self.open = len(self.items) > 1
+
+    def clear(self):
+        self.set_images([])
+
+    def touch(self, i: int):
+        """Image i is being shown at full size; release the least recently shown beyond max_full."""
+        self._full[i] = None
+        self._full.move_to_end(i)
+        while len(self._full) > self.max_full:
+            old, _ = self._full.popitem(last=False)
+            self.items[old].release()
+
+    def nudge(self, delta):
+        self.index = max(0, min(len(self.items)-1, self.index + delta))
+
+    def handle_key(self, event):
+        if not self.items:
+            return False, None
+        if event.key == pygame.K_g:
+            self.open = not self.open
+            return True, "gallery " + ("shown" if self.open else "hidden")
+        if not self.open:
+            return False, None
+        before = self.index
+        if event.key == pygame.K_ESCAPE:
+            self.open = False; return True, "gallery hidden"
+        elif event.key == pygame.K_LEFT:
+            self.nudge(-1)
+        elif event.key == pygame.K_RIGHT:
+            self.nudge(+1)
+        elif event.key == pygame.K_HOME:
+            self.index = 0
+        elif event.key == pygame.K_END:
+            self.index = len(self.items) - 1
+        else:
+            return False, None
+        return True, ("select" if self.index != before else None)
+
+    def draw(self, screen):
+        if not self.open or self.atlas is None:
+            return
+        SCREEN_W, SCREEN_H = screen.get_size()
+        pad, cell, n = self.pad, self.cell, len(self.items)
+        panel = pygame.Rect(pad, SCREEN_H - self.thumb - 3*pad, SCREEN_W - 2*pad, self.thumb + 2*pad)
+        R.draw_panel(screen, panel)
+
+        # window of the atlas around the selection
+        visible = max(1, (panel.width - pad) // cell)
+        first = max(0, min(n - visible, self.index - visible // 2))
+        self._fill(first, first + visible)
+        x0, y0 = panel.x + pad, panel.y + pad
+        screen.blit(self.atlas, (x0, y0), pygame.Rect(first * cell, 0, visible * cell - pad, self.thumb))
+        sel = pygame.Rect(x0 + (self.index - first) * cell - 3, y0 - 3, self.thumb + 6, self.thumb + 6)
+        pygame.draw.rect(screen, (90,150,230), sel, width=3, border_radius=4)
+
+        label = f"image {self.index + 1}/{n}   ←/→ Home/End browse, G/Esc hide"
+        screen.blit(R.render_text(self.font, label, (230,230,235)), (panel.x + 4, panel.y - self.font.get_height() - 4))
+
+    # ---- internals ----
+
+    def _blank_atlas(self):
+        atlas = pygame.Surface((len(self.items) * self.cell, self.thumb))
+        atlas.fill((24,28,36))
+        for i in range(len(self.items)):
+            pygame.draw.rect(atlas, (50,55,65), (i * self.cell, 0, self.thumb, self.thumb), border_radius=4)
+        return atlas
+
+    def _fill(self, lo: int, hi: int):
+        """Blit the ready thumbnails of cells lo..hi-1 into the atlas; queue the missing ones on pool."""
+        for i in range(lo, min(hi, len(self.items))):
+            if i in self._placed:
+                continue
+            img = self.items[i]
+            if img.thumb is not None:
+                box = pygame.Rect(i * self.cell, 0, self.thumb, self.thumb)
+                self.atlas.fill((24,28,36), box)
+                surf = pygame.image.frombuffer(*img.thumb)
+                self.atlas.blit(surf, surf.get_rect(center=box.center))
+                self._placed.add(i)
+            elif img.failed:
+                self._placed.add(i)  # keeps its placeholder
+            elif i not in self._queued:
+                self._queued.add(i)
+                self._queue_thumb(i, img)
+
+    def _queue_thumb(self, i: int, img):
+        def work():
+            if i >= len(self.items) or self.items[i] is not img:
+                return  # a newer result replaced the gallery
+            img.make_thumb(self.thumb, keep=False)
+            if self.on_thumb is not None:
+                self.on_thumb()
+
+        if self.pool is not None:
+            self.pool.submit(work)
+        else:
+            work()
@@ -1,29 +1,100 @@
-
 import pygame, os
-from ui.renderer import wrap_text
-
-def draw_hud(screen, font, status, current_graph_path, form_tokens, last_seed, saved_video_paths, overlay_text_lines):
-    y = 16
-    ui_lines = []
-    ui_lines.append("F1: pick workflow    F2: inputs form    F5: run    R: refresh (in picker)")
-    ui_lines.append(f"Status: {status}")
-    if current_graph_path:
-        ui_lines.append(f"Workflow: {current_graph_path}")
-    if form_tokens:
-        ui_lines.append(f"Inputs: {', '.join(form_tokens)}")
-    if last_seed is not None:
-        ui_lines.append(f"Last seed: {last_seed}")
-    if saved_video_paths:
-        ui_lines.append("Saved video(s):")
-        for p in saved_video_paths[:3]:
-            ui_lines.append(f"  {p}")
-
-    for line in ui_lines:
-        screen.blit(font.render(line, True, (230,230,235)), (16, y))
-        y += font.get_height() + 6
-
-    if overlay_text_lines:
-        y += 8
-        for line in overlay_text_lines[:15]:
-            screen.blit(font.render(line, True, (220,220,230)), (16, y))
-            y += font.get_height() + 2
+from ui.renderer import wrap_text, render_text, draw_panel
+
+class HudLayer:
+    """
+    The HUD pre-rendered onto one transparent surface. prepare() only re-renders when
+    one of its inputs (status, seed, paths, overlay lines...) changes and returns the
+    screen rect the layer covers; blit() is then a single blit.
+    """
+    def __init__(self):
+        self.key = None
+        self.surface = None
+        self.rect = pygame.Rect(16, 16, 0, 0)
+
+    def prepare(self, font, status, current_graph_path, form_tokens, last_seed, saved_video_paths, overlay_text_lines) -> pygame.Rect:
+        key = (font, status, current_graph_path, tuple(form_tokens or ()), last_seed,
+               tuple(saved_video_paths[:3]), tuple(overlay_text_lines[:15]))
+        if key != self.key:
+            self.key = key
+            self.surface = self._build(font, status, current_graph_path, form_tokens, last_seed,
+                                       saved_video_paths, overlay_text_lines)
+            self.rect = self.surface.get_rect(topleft=(16, 16))
+        return self.rect
+
+    def blit(self, screen):
+        if self.surface is not None:
+            screen.blit(self.surface, self.rect)
+
+    def _build(self, font, status, current_graph_path, form_tokens, last_seed, saved_video_paths, overlay_text_lines):
+        ui_lines = []
+        ui_lines.append("F1: pick workflow    F2: inputs form    F5: run (Ctrl: next)    F6: cancel    F3: timings    F4: run history    G: gallery    T: text    A: next audio    Ctrl+R: refresh (in picker)")
+        ui_lines.append(f"Status: {status}")
+        if current_graph_path:
+            ui_lines.append(f"Workflow: {current_graph_path}")
+        if form_tokens:
+            ui_lines.append(f"Inputs: {', '.join(form_tokens)}")
+        if last_seed is not None:
+            ui_lines.append(f"Last seed: {last_seed}")
+        if saved_video_paths:
+            ui_lines.append("Saved video(s):")
+            for p in saved_video_paths[:3]:
+                ui_lines.append(f"  {p}")
+
+        blits, y = [], 0
+        for line in ui_lines:
+            blits.append((render_text(font, line, (230,230,235)), y))
+            y += font.get_height() + 6
+
+        if overlay_text_lines:
+            y += 8
+            for line in overlay_text_lines[:15]:
+                blits.append((render_text(font, line, (220,220,230)), y))
+                y += font.get_height() + 2
+
+        w = max((s.get_width() for s, _ in blits), default=1)
+        surf = pygame.Surface((max(1, w), max(1, y)), pygame.SRCALPHA)
+        for s, sy in blits:
+            surf.blit(s, (0, sy))
+        return surf
+
+def draw_progress(screen, font, progress: dict, preview=None, width=280) -> pygame.Rect:
+    """Top-right panel: executing node, step progress bar and the latest preview frame."""
+    pad = 10
+    label = progress.get("label") or progress.get("job_id", "")
+    value, total = progress.get("value"), progress.get("max")
+    if value is not None and total:
+        label += f"  {value}/{total}"
+    text = render_text(font, label, (230,230,235))
+    w = max(width, text.get_width() + 2*pad, (preview.get_width() + 2*pad) if preview else 0)
+    h = pad + text.get_height() + 6 + 10 + pad + ((preview.get_height() + pad) if preview else 0)
+    rect = pygame.Rect(screen.get_width() - w - 16, 16, w, h)
+    draw_panel(screen, rect)
+    y = rect.y + pad
+    screen.blit(text, (rect.x + pad, y))
+    y += text.get_height() + 6
+    bar = pygame.Rect(rect.x + pad, y, w - 2*pad, 10)
+    pygame.draw.rect(screen, (50,55,65), bar, border_radius=4)
+    if value is not None and total:
+        fill = bar.copy()
+        fill.width = max(1, int(bar.width * min(1.0, value / total)))
+        pygame.draw.rect(screen, (90,150,230), fill, border_radius=4)
+    if preview:
+        screen.blit(preview, preview.get_rect(midtop=(rect.centerx, bar.bottom + pad)))
+    return rect
+
+def draw_timings(screen, font, rows, top=16) -> pygame.Rect:
+    """Right-hand panel of (phase, p50 ms, p95 ms, samples) rows from Tracer.percentiles()."""
+    pad = 10
+    lines = [f"{'phase':<9}{'p50':>9}{'p95':>9}{'n':>5}"]
+    lines += [f"{phase:<9}{p50:>9.1f}{p95:>9.1f}{n:>5}" for phase, p50, p95, n in rows] or ["no spans yet"]
+    texts = [render_text(font, line, (230,230,235)) for line in lines]
+    w = max(t.get_width() for t in texts) + 2*pad
+    h = sum(t.get_height() + 2 for t in texts) + 2*pad
+    rect = pygame.Rect(screen.get_width() - w - 16, top, w, h)
+    draw_panel(screen, rect)
+    y = rect.y + pad
+    for t in texts:
+        screen.blit(t, (rect.x + pad, y))
+        y += t.get_height() + 2
+    return rect
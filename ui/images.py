@@ -0,0 +1,105 @@
+import threading, pygame
+from collections import OrderedDict
+from io import BytesIO
+
+def fit_size(w: int, h: int, max_w: int, max_h: int) -> tuple[int, int]:
+    """Largest size with w:h aspect inside max_w x max_h; never upscales."""
+    if w <= max_w and h <= max_h:
+        return (w, h)
+    scale = min(max_w / w, max_h / h)
+    return (max(1, int(w * scale)), max(1, int(h * scale)))
+
+class DecodedImage:
+    """
+    An image artifact decoded off the main thread. prepare() and make_thumb() are the
+    heavy, thread-safe steps (file decode, smoothscale to a target box) and keep the
+    results as raw pixel buffers; surface() runs on the main thread and only wraps a
+    prepared buffer with pygame.image.frombuffer. The decoded original is kept, so
+    scaling to a new window size never decodes the file again, until release()
+    drops it (the thumbnail survives; the next prepare() decodes again).
+    """
+    def __init__(self, path: str | None = None, data: bytes | None = None, max_variants: int = 4):
+        self.path = path
+        self.data = data              # inline bytes; kept so a released image can decode again
+        self.max_variants = max_variants
+        self.lock = threading.Lock()
+        self.original = None          # off-screen 24/32-bit Surface, not display-converted
+        self.failed = False
+        self.thumb = None             # (buf, size, fmt) from make_thumb()
+        self._variants: "OrderedDict[tuple[int, int], tuple[bytes, tuple[int, int], str]]" = OrderedDict()
+        self._surfaces: dict = {}     # (w, h) -> wrapped Surface (main thread only)
+
+    def prepare(self, max_w: int, max_h: int) -> tuple[int, int] | None:
+        """Decode if needed and build the pixel buffer fitted to max_w x max_h. Returns its size."""
+        with self.lock:
+            key = (max_w, max_h)
+            if key in self._variants:
+                self._variants.move_to_end(key)
+                return self._variants[key][1]
+            if not self._load():
+                return None
+            self._variants[key] = _scaled(self.original, max_w, max_h)
+            while len(self._variants) > self.max_variants:
+                old, _ = self._variants.popitem(last=False)
+                self._surfaces.pop(old, None)
+            return self._variants[key][1]
+
+    def make_thumb(self, box: int, keep: bool = True) -> bool:
+        """Build the box x box thumbnail buffer (decodes if needed; keep=False drops a decode made just for it)."""
+        with self.lock:
+            if self.thumb is None:
+                loaded = self.original is not None
+                if not self._load():
+                    return False
+                self.thumb = _scaled(self.original, box, box)
+                if not keep and not loaded:
+                    self.original = None
+            return True
+
+    def release(self):
+        """Drop the decoded original and scaled buffers; keeps path/data and the thumbnail."""
+        with self.lock:
+            self.original = None
+            self._variants.clear()
+            self._surfaces.clear()
+
+    def surface(self, max_w: int, max_h: int):
+        """Main thread: Surface for a prepared size, or None if prepare() hasn't run for it."""
+        key = (max_w, max_h)
+        surf = self._surfaces.get(key)
+        if surf is not None:
+            return surf
+        with self.lock:
+            variant = self._variants.get(key)
+        if variant is None:
+            return None
+        buf, size, fmt = variant
+        surf = pygame.image.frombuffer(buf, size, fmt)
+        self._surfaces[key] = surf
+        return surf
+
+    # ---- internals ----
+
+    def _load(self) -> bool:
+        # caller holds self.lock
+        if self.original is not None or self.failed:
+            return not self.failed
+        try:
+            img = pygame.image.load(self.path if self.path else BytesIO(self.data))
+            if img.get_bitsize() < 24:  # paletted/grey: smoothscale needs 24/32-bit
+                full = pygame.Surface(img.get_size(), pygame.SRCALPHA, 32)
+                full.blit(img, (0, 0))
+                img = full
+            self.original = img
+            return True
+        except Exception as e:
+            print("image decode failed:", e)
+            self.failed = True
+            return False
+
+def _scaled(img, max_w: int, max_h: int) -> tuple[bytes, tuple[int, int], str]:
+    size = fit_size(img.get_width(), img.get_height(), max_w, max_h)
+    if size != img.get_size():
+        img = pygame.transform.smoothscale(img, size)
+    fmt = "RGBA" if img.get_flags() & pygame.SRCALPHA else "RGB"
+    return (pygame.image.tobytes(img, fmt), size, fmt)
@@ -1,30 +1,67 @@
 
 import os, pygame
-from core.workflow_io import scan_workflows
+from core.library import WorkflowIndex
 
 class WorkflowPicker:
-    def __init__(self, workdir: str, rows=18, font=None, font_bold=None):
+    """
+    F1 picker over a WorkflowIndex. Opening lists the indexed workflows at once and
+    refreshes the index in the background (on_refresh is called from that thread;
+    the owner then calls sync()). Typing filters with fuzzy search. With a
+    WorkflowCache, the highlighted entry and its neighbours are parsed ahead.
+    """
+    def __init__(self, workdir: str, rows=18, font=None, font_bold=None, library=None, on_refresh=None,
+                 cache=None, preload_radius=2):
         self.workdir = workdir
         self.rows = rows
         self.font = font or pygame.font.SysFont(None, 24)
         self.font_bold = font_bold or pygame.font.SysFont(None, 24, bold=True)
+        self.library = library or WorkflowIndex(workdir)
+        self.on_refresh = on_refresh
+        self.cache = cache
+        self.preload_radius = preload_radius
         self.open = False
         self.items = []
+        self.query = ""
         self.index = 0
         self.scroll = 0
+        self._version = None
 
     def open_picker(self):
-        self.items = scan_workflows(self.workdir)
+        self.query = ""
         self.index = 0; self.scroll = 0
         self.open = True
+        self.sync()
+        self.refresh()
         return f"picker: {len(self.items)} file(s)"
 
+    def refresh(self):
+        self.library.refresh_async(lambda changed: self.on_refresh and self.on_refresh())
+
+    def sync(self):
+        """Re-run the filter if the query or the index changed; keeps the selected entry."""
+        key = (self.query, self.library.version)
+        if key == self._version:
+            return
+        self._version = key
+        current = self.items[self.index] if self.items else None
+        self.items = self.library.search(self.query)
+        self.index = self.items.index(current) if current in self.items else 0
+        self.preload()
+
+    def preload(self):
+        if self.cache is None or not self.items:
+            return
+        # highlighted entry first, then outwards
+        order = [self.index] + [self.index + d * s for d in range(1, self.preload_radius + 1) for s in (1, -1)]
+        self.cache.preload(os.path.join(self.workdir, self.items[i]) for i in order if 0 <= i < len(self.items))
+
     def close(self):
         self.open = False
 
     def nudge(self, delta):
         if not self.items: self.index = 0; return
         self.index = max(0, min(len(self.items)-1, self.index + delta))
+        self.preload()
 
     def handle_key(self, event):
         if event.key == pygame.K_ESCAPE or event.key == pygame.K_F1:
@@ -40,11 +77,15 @@ class WorkflowPicker:
         elif event.key == pygame.K_PAGEDOWN:
             self.nudge(+self.rows); return True, None
         elif event.key == pygame.K_HOME:
-            self.index = 0; return True, None
+            self.index = 0; self.preload(); return True, None
         elif event.key == pygame.K_END:
-            self.index = max(0, len(self.items)-1); return True, None
-        elif event.key == pygame.K_r:
-            return True, self.open_picker()
+            self.index = max(0, len(self.items)-1); self.preload(); return True, None
+        elif event.key == pygame.K_r and event.mod & pygame.KMOD_CTRL:
+            self.refresh(); return True, "refreshing workflow index"
+        elif event.key == pygame.K_BACKSPACE:
+            self.query = self.query[:-1]; self.sync(); return True, None
+        elif event.unicode and event.unicode.isprintable():
+            self.query += event.unicode; self.sync(); return True, None
         return False, None
 
     def draw(self, screen):
@@ -57,10 +98,12 @@ class WorkflowPicker:
         panel_y = (SCREEN_H - panel_h)//2
         R.draw_panel(screen, (panel_x, panel_y, panel_w, panel_h))
 
-        title = f"Select workflow (↑/↓ PgUp/PgDn Home/End, Enter=select, R=refresh, F1=close)"
-        screen.blit(self.font_bold.render(title, True, (240,240,255)), (panel_x + 14, panel_y + 12))
+        title = f"Select workflow (type to filter, %TOKEN @Class, ↑/↓ PgUp/PgDn, Enter=select, Ctrl+R=refresh, F1=close)"
+        screen.blit(R.render_text(self.font_bold, title, (240,240,255)), (panel_x + 14, panel_y + 12))
+        search = f"> {self.query}_   {len(self.items)}/{len(self.library.items)}"
+        screen.blit(R.render_text(self.font, search, (200,220,255)), (panel_x + 14, panel_y + 40))
 
-        list_x = panel_x + 14; list_y = panel_y + 46
+        list_x = panel_x + 14; list_y = panel_y + 72
         row_h  = self.font.get_height() + 6
 
         if self.index < self.scroll: self.scroll = self.index
@@ -73,4 +116,4 @@ class WorkflowPicker:
             if is_sel:
                 pygame.draw.rect(screen, (55,100,160), (list_x-6, y-2, panel_w-28, row_h), border_radius=6)
             color = (250,250,250) if is_sel else (220,220,230)
-            screen.blit(self.font.render(rel, True, color), (list_x, y))
+            screen.blit(R.render_text(self.font, rel, color), (list_x, y))
@@ -1,6 +1,37 @@
 
 import pygame
-from io import BytesIO
+from collections import OrderedDict
+
+class TextCache:
+    """Bounded LRU of rendered text surfaces keyed by (font, text, color, antialias)."""
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._surfs: "OrderedDict[tuple, pygame.Surface]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text: str, color, antialias: bool = True) -> "pygame.Surface":
+        key = (font, text, tuple(color), antialias)
+        surf = self._surfs.get(key)
+        if surf is not None:
+            self._surfs.move_to_end(key)
+            self.hits += 1
+            return surf
+        self.misses += 1
+        surf = font.render(text, antialias, color)
+        self._surfs[key] = surf
+        if len(self._surfs) > self.max_entries:
+            self._surfs.popitem(last=False)
+        return surf
+
+    def clear(self):
+        self._surfs.clear()
+
+text_cache = TextCache()
+
+def render_text(font, text: str, color, antialias: bool = True) -> "pygame.Surface":
+    """font.render through the shared text_cache; callers must not draw onto the result."""
+    return text_cache.render(font, text, color, antialias)
 
 def draw_panel(surf, rect, bg=(24,28,36), border=(100,110,130), radius=12, border_w=2):
     pygame.draw.rect(surf, bg, rect, border_radius=radius)
@@ -18,14 +49,3 @@ def wrap_text(text: str, font, max_width: int) -> list[str]:
             line = w
     if line: lines.append(line)
     return lines
-
-def image_from_bytes(data: bytes, max_w: int, max_h: int):
-    try:
-        img = pygame.image.load(BytesIO(data))
-        rect = img.get_rect()
-        if rect.w > max_w or rect.h > max_h:
-            img = pygame.transform.smoothscale(img, img.get_rect().fit(pygame.Rect(0,0,max_w,max_h)).size)
-        return img
-    except Exception as e:
-        print("image_from_bytes failed:", e)
-        return None
@@ -0,0 +1,176 @@
+import time, pygame
+from collections import OrderedDict
+
+import ui.renderer as R
+from ui.images import DecodedImage
+
+class RunBrowser:
+    """
+    F4 browser over a core.runs.RunStore, newest first. Only the rows on screen are
+    queried (one LIMIT/OFFSET page plus a count), and each row's thumbnail is
+    decoded lazily on pool into a bounded LRU (on_thumb is called from the pool
+    thread when one is ready; the owner then redraws). Typing filters (workflow
+    text, %NAME=value, %NAME~text, seed=N, >YYYY-MM-DD, <YYYY-MM-DD); Tab limits the
+    list to the loaded workflow. Enter recalls a run's outputs, Ctrl+Enter also
+    its workflow and token values; Delete forgets it.
+    """
+    def __init__(self, store, font=None, font_bold=None, thumb=48, pool=None, on_thumb=None, max_thumbs=256):
+        self.store = store
+        self.font = font or pygame.font.SysFont(None, 24)
+        self.font_bold = font_bold or pygame.font.SysFont(None, 24, bold=True)
+        self.thumb = thumb
+        self.pool = pool
+        self.on_thumb = on_thumb
+        self.max_thumbs = max_thumbs
+        self.open = False
+        self.query = ""
+        self.workflow = None          # Tab filter: only runs of this workflow
+        self.rows = 10                # rows per page, set from the panel height when drawn
+        self.index = 0
+        self.scroll = 0
+        self.total = 0
+        self.page = []                # run dicts for rows scroll .. scroll+rows-1
+        self._count_key = self._page_key = None
+        self._thumbs: "OrderedDict[str, tuple | None]" = OrderedDict()  # path -> (buf, size, fmt), None while decoding
+
+    @property
+    def current(self) -> dict | None:
+        i = self.index - self.scroll
+        return self.page[i] if 0 <= i < len(self.page) else None
+
+    def open_browser(self):
+        self.query = ""
+        self.index = self.scroll = 0
+        self.open = True
+        self.sync(force=True)
+        return f"run history: {self.total} run(s)"
+
+    def close(self):
+        self.open = False
+
+    def sync(self, force: bool = False):
+        """Re-count if the filter or the store changed; re-query the page if it scrolled too."""
+        key = (self.query, self.workflow, self.store.version)
+        if force or key != self._count_key:
+            self._count_key = key
+            self.total = self.store.count(self.query, self.workflow)
+            self.index = max(0, min(self.index, self.total - 1))
+        if self.index < self.scroll:
+            self.scroll = self.index
+        if self.index >= self.scroll + self.rows:
+            self.scroll = self.index - self.rows + 1
+        key += (self.scroll, self.rows)
+        if force or key != self._page_key:
+            self._page_key = key
+            self.page = self.store.search(self.query, self.scroll, self.rows, self.workflow)
+
+    def nudge(self, delta):
+        self.index = max(0, min(self.total - 1, self.index + delta))
+        self.sync()
+
+    def handle_key(self, event, mods, workflow: str | None = None):
+        """workflow is the loaded workflow, for the Tab filter."""
+        if event.key in (pygame.K_ESCAPE, pygame.K_F4):
+            self.close(); return True, "run history closed"
+        elif event.key == pygame.K_RETURN:
+            return (True, "restore" if mods & pygame.KMOD_CTRL else "select") if self.current else (True, None)
+        elif event.key == pygame.K_UP:
+            self.nudge(-1)
+        elif event.key == pygame.K_DOWN:
+            self.nudge(+1)
+        elif event.key == pygame.K_PAGEUP:
+            self.nudge(-self.rows)
+        elif event.key == pygame.K_PAGEDOWN:
+            self.nudge(+self.rows)
+        elif event.key == pygame.K_HOME:
+            self.nudge(-self.total)
+        elif event.key == pygame.K_END:
+            self.nudge(+self.total)
+        elif event.key == pygame.K_TAB:
+            self.workflow = None if self.workflow or not workflow else workflow
+            self.index = 0; self.sync()
+            return True, f"runs of {self.workflow}" if self.workflow else "runs of all workflows"
+        elif event.key == pygame.K_DELETE:
+            run = self.current
+            if run is None:
+                return True, None
+            self.store.delete(run["id"]); self.sync()
+            return True, f"run #{run['id']} deleted"
+        elif event.key == pygame.K_BACKSPACE:
+            self.query = self.query[:-1]; self.index = 0; self.sync()
+        elif event.unicode and event.unicode.isprintable():
+            self.query += event.unicode; self.index = 0; self.sync()
+        else:
+            return False, None
+        return True, None
+
+    def draw(self, screen):
+        SCREEN_W, SCREEN_H = screen.get_size()
+        pad = 12
+        panel = pygame.Rect(pad, int(SCREEN_H * 0.08), SCREEN_W - 2*pad, int(SCREEN_H * 0.84))
+        R.draw_panel(screen, panel)
+
+        title = "Run history (type to filter, %TOKEN=value seed=N >YYYY-MM-DD, Tab=this workflow, Enter=recall, Ctrl+Enter=+settings, Del, F4=close)"
+        screen.blit(R.render_text(self.font_bold, title, (240,240,255)), (panel.x + 14, panel.y + 12))
+        scope = f"   [{self.workflow}]" if self.workflow else ""
+        search = f"> {self.query}_   {min(self.index + 1, self.total)}/{self.total}{scope}"
+        screen.blit(R.render_text(self.font, search, (200,220,255)), (panel.x + 14, panel.y + 40))
+
+        list_x, list_y = panel.x + 14, panel.y + 72
+        row_h = max(self.thumb, 2 * self.font.get_height()) + 8
+        rows = max(1, (panel.bottom - 12 - list_y) // row_h)
+        if rows != self.rows:
+            self.rows = rows
+            self.sync()
+
+        for i, run in enumerate(self.page):
+            y = list_y + i * row_h
+            is_sel = (self.scroll + i == self.index)
+            if is_sel:
+                pygame.draw.rect(screen, (55,100,160), (list_x - 6, y - 4, panel.width - 28, row_h), border_radius=6)
+            box = pygame.Rect(list_x, y, self.thumb, self.thumb)
+            surf = self._thumb(run.get("thumb"))
+            if surf is not None:
+                screen.blit(surf, surf.get_rect(center=box.center))
+            else:
+                pygame.draw.rect(screen, (50,55,65), box, border_radius=4)
+            color = (250,250,250) if is_sel else (220,220,230)
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(run["created"]))
+            secs = run["finished"] - run["created"]
+            head = f"#{run['id']}  {when}  {run['workflow'] or '(unsaved graph)'}"
+            info = f"{run['status']}  seed {run['seed']}  {secs:.1f} s  {run['files']} file(s)"
+            if run.get("error"):
+                info += f"  {run['error']}"
+            x = box.right + 10
+            screen.blit(R.render_text(self.font, head, color), (x, y))
+            screen.blit(R.render_text(self.font, info, (170,180,200)), (x, y + self.font.get_height()))
+
+    # ---- internals ----
+
+    def _thumb(self, path: str | None):
+        """Thumbnail Surface for path, or None while it is decoded on the pool (or has no image)."""
+        if not path:
+            return None
+        if path in self._thumbs:
+            self._thumbs.move_to_end(path)
+            thumb = self._thumbs[path]
+            return pygame.image.frombuffer(*thumb) if thumb else None
+        self._thumbs[path] = None
+        while len(self._thumbs) > self.max_thumbs:
+            self._thumbs.popitem(last=False)
+
+        def work():
+            if path not in self._thumbs:
+                return  # scrolled past and evicted before its turn
+            img = DecodedImage(path)
+            if img.make_thumb(self.thumb) and path in self._thumbs:
+                self._thumbs[path] = img.thumb
+                if self.on_thumb is not None:
+                    self.on_thumb()
+            img.release()
+
+        if self.pool is not None:
+            self.pool.submit(work)
+        else:
+            work()
+        return None
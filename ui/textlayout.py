@@ -0,0 +1,262 @@
+from bisect import bisect_left, bisect_right
+from typing import Iterator, List, Tuple
+
+class TextBuffer:
+    """
+    Editable text kept as a list of lines with a (row, col) caret. An edit only
+    rewrites the caret's line (plus a split or join at line ends), and records the
+    first touched row in dirty_from so a WrapLayout re-wraps from there on. While
+    every edit since the last sync stayed inside one line, line_edit also holds
+    (row, first edited col, unchanged suffix length, length change) so a long
+    line re-wraps only around the edit.
+    """
+    def __init__(self, text: str = ""):
+        self.lines: List[str] = text.split("\n")
+        self.row = len(self.lines) - 1
+        self.col = len(self.lines[-1])
+        self.version = 0
+        self.dirty_from = 0
+        self.line_edit = None
+        self._pending = False
+
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+    def insert(self, s: str):
+        parts = s.split("\n")
+        line = self.lines[self.row]
+        before, after = line[:self.col], line[self.col:]
+        if len(parts) == 1:
+            self.lines[self.row] = before + s + after
+            self._touch(self.row, self.col, len(after), len(s))
+            self.col += len(s)
+            return
+        new = [before + parts[0]] + parts[1:-1] + [parts[-1] + after]
+        self.lines[self.row:self.row + 1] = new
+        self._touch(self.row)
+        self.row += len(new) - 1
+        self.col = len(parts[-1])
+
+    def backspace(self):
+        if self.col > 0:
+            line = self.lines[self.row]
+            self.lines[self.row] = line[:self.col - 1] + line[self.col:]
+            self.col -= 1
+            self._touch(self.row, self.col, len(line) - self.col - 1, -1)
+        elif self.row > 0:
+            prev = self.lines[self.row - 1]
+            self.lines[self.row - 1] = prev + self.lines.pop(self.row)
+            self.row -= 1
+            self.col = len(prev)
+            self._touch(self.row)
+
+    def delete(self):
+        line = self.lines[self.row]
+        if self.col < len(line):
+            self.lines[self.row] = line[:self.col] + line[self.col + 1:]
+            self._touch(self.row, self.col, len(line) - self.col - 1, -1)
+        elif self.row < len(self.lines) - 1:
+            self.lines[self.row] = line + self.lines.pop(self.row + 1)
+            self._touch(self.row)
+
+    def left(self):
+        if self.col > 0:
+            self.col -= 1
+        elif self.row > 0:
+            self.row -= 1
+            self.col = len(self.lines[self.row])
+
+    def right(self):
+        if self.col < len(self.lines[self.row]):
+            self.col += 1
+        elif self.row < len(self.lines) - 1:
+            self.row += 1
+            self.col = 0
+
+    def home(self):
+        self.col = 0
+
+    def end(self):
+        self.col = len(self.lines[self.row])
+
+    def synced(self):
+        """Called by the layout once it has caught up with every edit."""
+        self.dirty_from = len(self.lines)
+        self.line_edit = None
+        self._pending = False
+
+    def _touch(self, row: int, col: int | None = None, suffix: int = 0, delta: int = 0):
+        # col is None for edits that split or join lines
+        prev = self.line_edit
+        if col is not None and not self._pending:
+            self.line_edit = (row, col, suffix, delta)
+        elif col is not None and prev is not None and prev[0] == row:
+            self.line_edit = (row, min(prev[1], col), min(prev[2], suffix), prev[3] + delta)
+        else:
+            self.line_edit = None
+        self._pending = True
+        self.dirty_from = min(self.dirty_from, row)
+        self.version += 1
+
+class WrapLayout:
+    """
+    Soft-wrap layout of a TextBuffer for one font and width. Each line's wrap points
+    are cached by its text, so sync() only re-wraps lines from the buffer's
+    dirty_from onward and reuses every unchanged line. Glyph advances come from a
+    per-character table; with a fixed-width font, plain-ASCII lines are split
+    arithmetically. Rows are looked up by bisecting per-line row offsets, so only
+    the visible rows are ever measured or rendered.
+    """
+    TAB = 4
+
+    def __init__(self, font, width: int = 400):
+        self.font = font
+        self.width = max(1, width)
+        self._adv = {}
+        self.cell = self._measure("M")
+        # glyphs exactly one cell wide; lines made only of them wrap arithmetically
+        plain = frozenset(ch for ch in map(chr, range(32, 127)) if self._measure(ch) == self.cell)
+        self.fixed = len(plain) > 80 and self.font.size("M" * 64)[0] == round(64 * self.cell)
+        self._plain = plain if self.fixed else frozenset()
+        self._cache = {}              # line text -> wrap starts (for self.width)
+        self.starts: List[List[int]] = []   # per line: offsets where its visual rows begin
+        self.row_start: List[int] = []      # per line: index of its first visual row
+        self.row_count = 0
+        self._synced = (None, -1)
+
+    def set_width(self, width: int):
+        width = max(1, width)
+        if width != self.width:
+            self.width = width
+            self._cache.clear()
+            self._synced = (None, -1)
+
+    def sync(self, buf: TextBuffer):
+        if self._synced == (id(buf), buf.version):
+            return
+        same = self._synced[0] == id(buf)
+        first = min(buf.dirty_from if same else 0, len(self.starts))
+        edit = buf.line_edit if same and first < len(self.starts) else None
+        old = self.starts[first] if edit is not None and edit[0] == first else None
+        if len(self._cache) > 4 * len(buf.lines) + 256:
+            self._cache.clear()
+        del self.starts[first:]
+        del self.row_start[first:]
+        row = self.row_start[-1] + len(self.starts[-1]) if self.starts else 0
+        for i, line in enumerate(buf.lines[first:], first):
+            starts = self._cache.get(line)
+            if starts is None:
+                if i == first and old is not None:
+                    starts = self._rewrap(line, old, *edit[1:])  # not cached: one-off versions of the line
+                else:
+                    starts = self._cache[line] = self._wrap(line)
+            self.starts.append(starts)
+            self.row_start.append(row)
+            row += len(starts)
+        self.row_count = row
+        buf.synced()
+        self._synced = (id(buf), buf.version)
+
+    def wrap_line(self, line: str) -> List[int]:
+        """Row start offsets of one line at the current width (not cached)."""
+        return self._wrap(line)
+
+    def locate(self, buf: TextBuffer, row: int, col: int) -> Tuple[int, int]:
+        """(visual row, x offset) of a caret position."""
+        starts = self.starts[row]
+        seg = bisect_right(starts, col) - 1
+        return self.row_start[row] + seg, round(self._x(buf.lines[row], starts[seg], col))
+
+    def hit(self, buf: TextBuffer, vrow: int, x: int) -> Tuple[int, int]:
+        """Caret (row, col) closest to x on visual row vrow."""
+        vrow = max(0, min(self.row_count - 1, vrow))
+        row = bisect_right(self.row_start, vrow) - 1
+        starts, line = self.starts[row], buf.lines[row]
+        seg = vrow - self.row_start[row]
+        start = starts[seg]
+        end = starts[seg + 1] if seg + 1 < len(starts) else len(line)
+        lo, hi = start, end  # last col whose x <= target, then the nearer neighbour
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self._x(line, start, mid) <= x:
+                lo = mid
+            else:
+                hi = mid - 1
+        if lo < end and self._x(line, start, lo + 1) - x < x - self._x(line, start, lo):
+            lo += 1
+        return row, lo
+
+    def visible(self, buf: TextBuffer, first: int, count: int) -> Iterator[Tuple[int, str]]:
+        """(visual row, text) for rows first .. first+count-1."""
+        if not self.row_start:
+            return
+        row = bisect_right(self.row_start, first) - 1
+        vrow = first
+        while row < len(buf.lines) and vrow < first + count:
+            starts, line = self.starts[row], buf.lines[row]
+            for seg in range(vrow - self.row_start[row], len(starts)):
+                if vrow >= first + count:
+                    return
+                end = starts[seg + 1] if seg + 1 < len(starts) else len(line)
+                yield vrow, line[starts[seg]:end].replace("\t", " " * self.TAB)
+                vrow += 1
+            row += 1
+
+    # ---- internals ----
+
+    def _measure(self, ch: str) -> float:
+        # measured over 8 copies: single-glyph sizes are rounded and undercount long lines
+        w = self.font.size((" " * self.TAB if ch == "\t" else ch) * 8)[0] / 8
+        self._adv[ch] = w
+        return w
+
+    def _rewrap(self, line: str, old: List[int], col: int, suffix: int, delta: int) -> List[int]:
+        """Wrap a line edited at col..len-suffix, reusing old's rows before and after the edit."""
+        if not line or (self.fixed and self._plain.issuperset(line)):
+            return self._wrap(line)
+        seg = bisect_right(old, col) - 1
+        # restart one row early: text removed at a row start can let the previous row take more
+        return self._wrap(line, old[:max(0, seg - 1) + 1], (old, delta, len(line) - suffix))
+
+    def _wrap(self, line: str, starts: List[int] | None = None, resume=None) -> List[int]:
+        """Greedy wrap from starts[-1]; with resume=(old, delta, stable), once a break at or
+        past stable lands on a shifted old break, the remaining old breaks are reused."""
+        if not line:
+            return [0]
+        if starts is None:
+            if self.fixed and self._plain.issuperset(line):
+                return list(range(0, len(line), max(1, int(self.width // self.cell))))
+            starts = [0]
+        start, n, adv = starts[-1], len(line), self._adv
+        while True:
+            end, x = start, 0.0
+            while end < n:
+                w = adv.get(line[end])
+                if w is None:
+                    w = self._measure(line[end])
+                if x + w > self.width and end > start:
+                    break
+                x += w
+                end += 1
+            # advances ignore kerning: trim the row against its real rendered width
+            while end > start + 1 and self._width(line[start:end]) > self.width:
+                end -= 1
+            if end >= n:
+                return starts
+            if resume is not None and end >= resume[2]:
+                old, delta = resume[0], resume[1]
+                i = bisect_left(old, end - delta)
+                if i < len(old) and old[i] == end - delta:
+                    starts.extend(o + delta for o in old[i:])
+                    return starts
+            starts.append(end)
+            start = end
+
+    def _width(self, seg: str) -> int:
+        return self.font.size(seg.replace("\t", " " * self.TAB))[0]
+
+    def _x(self, line: str, start: int, col: int) -> float:
+        seg = line[start:col]
+        if self.fixed and self._plain.issuperset(seg):
+            return len(seg) * self.cell
+        return self._width(seg)
@@ -0,0 +1,247 @@
+import os, pygame
+from collections import OrderedDict
+from typing import List, Tuple
+
+import ui.renderer as R
+from core.artifacts import artifact_bytes
+from ui.textlayout import WrapLayout
+
+class TextSource:
+    """
+    Lines of one text artifact, read lazily from its memory map (or inline bytes).
+    Newlines are indexed chunk by chunk only as far as someone has asked for, and
+    decoded lines are kept in a small LRU.
+    """
+    CHUNK = 1 << 20
+
+    def __init__(self, artifact: dict, max_lines: int = 256):
+        self.name = os.path.basename(artifact.get("filename") or "text")
+        self.data = artifact_bytes(artifact)
+        self.size = len(self.data)
+        self.starts = [0]             # byte offset of each indexed line
+        self.scanned = 0              # bytes searched for newlines so far
+        self.max_lines = max_lines
+        self._lines: "OrderedDict[int, str]" = OrderedDict()
+
+    @property
+    def complete(self) -> bool:
+        return self.scanned >= self.size
+
+    def has_line(self, i: int) -> bool:
+        while i >= len(self.starts) and not self.complete:
+            self._scan()
+        return i < len(self.starts)
+
+    def line_count(self) -> int:
+        """Total lines; indexes the rest of the file."""
+        while not self.complete:
+            self._scan()
+        return len(self.starts)
+
+    def line(self, i: int) -> str:
+        text = self._lines.get(i)
+        if text is not None:
+            self._lines.move_to_end(i)
+            return text
+        if not self.has_line(i):
+            return ""
+        while i + 1 >= len(self.starts) and not self.complete:
+            self._scan()  # the line's end may lie past the indexed part
+        end = self.starts[i + 1] - 1 if i + 1 < len(self.starts) else self.size
+        text = str(bytes(self.data[self.starts[i]:end]), "utf-8", "replace").rstrip("\r")
+        self._lines[i] = text
+        if len(self._lines) > self.max_lines:
+            self._lines.popitem(last=False)
+        return text
+
+    def close(self):
+        self._lines.clear()
+        if isinstance(self.data, memoryview):
+            obj = self.data.obj
+            self.data.release()
+            obj.close()
+        self.data = b""
+
+    def _scan(self):
+        end = min(self.size, self.scanned + self.CHUNK)
+        chunk = bytes(self.data[self.scanned:end])
+        pos = chunk.find(b"\n")
+        while pos >= 0:
+            self.starts.append(self.scanned + pos + 1)
+            pos = chunk.find(b"\n", pos + 1)
+        self.scanned = end
+        if self.starts[-1] >= self.size and len(self.starts) > 1:
+            self.starts.pop()  # trailing newline: no empty last line
+
+class TextViewer:
+    """
+    Scrollable viewer for text artifacts. The page is laid out from its top row
+    only: each line's wrap points are computed on demand (long lines chunk by
+    chunk) and kept in a bounded per-line cache, so multi-megabyte outputs open
+    instantly. Only the current page's rendered rows are kept.
+    Keys: ↑/↓ PgUp/PgDn Home/End scroll, Tab next artifact, T/Esc close.
+    """
+    WRAP_CHUNK = 8192   # chars wrapped at a time inside very long lines
+
+    def __init__(self, font=None, font_bold=None, max_wrapped: int = 512):
+        self.font = font or pygame.font.SysFont("monospace", 20)
+        self.font_bold = font_bold or pygame.font.SysFont(None, 24, bold=True)
+        self.layout = WrapLayout(self.font)
+        self.max_wrapped = max_wrapped
+        self.open = False
+        self.sources: List[TextSource] = []
+        self.index = 0
+        self.top = (0, 0)             # (line, wrapped row within the line)
+        self.page_rows = 1
+        self._rows: "OrderedDict[int, tuple[List[int], bool]]" = OrderedDict()
+        self._page: dict = {}         # (line, start) -> Surface of the rows on screen
+
+    @property
+    def current(self) -> TextSource | None:
+        return self.sources[self.index] if self.sources else None
+
+    def set_artifacts(self, txts: list[dict]):
+        self.clear()
+        self.sources = [TextSource(a) for a in txts]
+
+    def clear(self):
+        for s in self.sources:
+            s.close()
+        self.sources = []
+        self.index = 0
+        self.open = False
+        self._reset()
+
+    def show(self, index: int = 0):
+        if self.sources:
+            self.index = index % len(self.sources)
+            self._reset()
+            self.open = True
+
+    def handle_key(self, event):
+        if not self.sources:
+            return False, None
+        if event.key == pygame.K_t:
+            if self.open:
+                self.open = False; return True, "text viewer closed"
+            self.show(self.index); return True, f"text: {self.current.name}"
+        if not self.open:
+            return False, None
+        if event.key == pygame.K_ESCAPE:
+            self.open = False; return True, "text viewer closed"
+        elif event.key == pygame.K_TAB:
+            self.show(self.index + 1); return True, f"text: {self.current.name}"
+        elif event.key == pygame.K_DOWN:
+            self.scroll(1)
+        elif event.key == pygame.K_UP:
+            self.scroll(-1)
+        elif event.key == pygame.K_PAGEDOWN:
+            self.scroll(self.page_rows - 1)
+        elif event.key == pygame.K_PAGEUP:
+            self.scroll(-(self.page_rows - 1))
+        elif event.key == pygame.K_HOME:
+            self.top = (0, 0)
+        elif event.key == pygame.K_END:
+            last = self.current.line_count() - 1
+            self.top = (last, len(self._wrapped(last, None)[0]) - 1)
+            self.scroll(-(self.page_rows - 1))
+        else:
+            return False, None
+        return True, None
+
+    def scroll(self, rows: int):
+        line, row = self.top
+        src = self.current
+        while rows > 0:
+            starts, done = self._wrapped(line, row + 2)
+            if row + 1 < len(starts):
+                row += 1
+            elif src.has_line(line + 1):
+                line, row = line + 1, 0
+            else:
+                break
+            rows -= 1
+        while rows < 0:
+            if row > 0:
+                row -= 1
+            elif line > 0:
+                line -= 1
+                row = len(self._wrapped(line, None)[0]) - 1
+            else:
+                break
+            rows += 1
+        self.top = (line, row)
+
+    def page(self, count: int) -> List[Tuple[int, int, str]]:
+        """(line, row start offset, text) for the count rows from the top."""
+        out, (line, row) = [], self.top
+        src = self.current
+        while len(out) < count and src.has_line(line):
+            starts, done = self._wrapped(line, row + count - len(out) + 1)
+            text = src.line(line)
+            while row < len(starts) and len(out) < count:
+                end = starts[row + 1] if row + 1 < len(starts) else len(text)
+                out.append((line, starts[row], text[starts[row]:end]))
+                row += 1
+            if row < len(starts) or not done:
+                continue
+            line, row = line + 1, 0
+        return out
+
+    def draw(self, screen):
+        if not self.open or not self.sources:
+            return
+        SCREEN_W, SCREEN_H = screen.get_size()
+        pad = 12
+        panel = pygame.Rect(pad, int(SCREEN_H * 0.1), SCREEN_W - 2*pad, int(SCREEN_H * 0.8))
+        R.draw_panel(screen, panel)
+        src = self.current
+        total = f"{len(src.starts)}{'' if src.complete else '+'} lines"
+        title = f"{src.name}  ({self.index + 1}/{len(self.sources)}, {total}, line {self.top[0] + 1})   ↑/↓ PgUp/PgDn Home/End, Tab=next, T/Esc=close"
+        screen.blit(R.render_text(self.font_bold, title, (240,240,255)), (panel.x + 14, panel.y + 12))
+
+        area = pygame.Rect(panel.x + 14, panel.y + 44, panel.width - 28, panel.height - 56)
+        if area.width - 8 != self.layout.width:
+            self.layout.set_width(area.width - 8)
+            self._reset(keep_top=True)
+        line_h = self.font.get_height() + 2
+        self.page_rows = max(1, area.height // line_h)
+        page, rows = {}, self.page(self.page_rows)
+        for i, (line, start, text) in enumerate(rows):
+            key = (line, start, len(text))
+            surf = self._page.get(key)
+            if surf is None:
+                surf = self.font.render(text.replace("\t", " " * WrapLayout.TAB), True, (230,230,235))
+            page[key] = surf
+            screen.blit(surf, (area.x, area.y + i * line_h))
+        self._page = page  # rows that scrolled off are dropped
+
+    # ---- internals ----
+
+    def _reset(self, keep_top: bool = False):
+        self._rows.clear()
+        self._page = {}
+        self.top = (self.top[0], 0) if keep_top else (0, 0)
+
+    def _wrapped(self, line: int, need: int | None) -> tuple[List[int], bool]:
+        """Row starts of a line, wrapped at least up to need rows (all rows if None)."""
+        entry = self._rows.get(line)
+        if entry is None:
+            entry = ([0], False)
+        else:
+            self._rows.move_to_end(line)
+        starts, done = entry
+        text = self.current.line(line)
+        while not done and (need is None or len(starts) < need):
+            s = starts[-1]
+            chunk = text[s:s + self.WRAP_CHUNK]
+            sub = self.layout.wrap_line(chunk)
+            starts.extend(s + x for x in sub[1:])
+            # the chunk's last row may have been cut short; it is re-wrapped next round
+            done = s + self.WRAP_CHUNK >= len(text)
+            if not done and len(sub) == 1:
+                starts.append(s + len(chunk))  # a single row wider than the chunk: force a break
+        self._rows[line] = (starts, done)
+        if len(self._rows) > self.max_wrapped:
+            self._rows.popitem(last=False)
+        return starts, done